@@ -0,0 +1,142 @@
+"""
+Batch geo benchmark - scalar haversine_distance() loop vs numpy.
+
+Times distance-to-destination for N rooms x M members:
+- the scalar haversine_distance() in a Python loop vs the raw
+  haversine_m kernel over preassembled arrays
+- the full per-tick job (distance, bearing, smoothed speed, ETA, writing
+  member.geo) done with scalar math vs GeoEngine, refreshed room by room
+  (rooms under GeoEngine.batch_threshold members take its scalar path)
+  and batched across all rooms
+Every member gets a fresh fix before each engine run (otherwise the
+engine would skip them as unchanged).
+
+    cd backend
+    python -m benchmarks.bench_geo --rooms 1000 --members 8
+"""
+
+import argparse
+import math
+import random
+import time
+
+import numpy as np
+
+from services.geo import GeoEngine, haversine_distance, haversine_m
+from storage.memory import Room, Member
+from utils.time import now_ts
+
+def make_rooms(rooms: int, members: int) -> list:
+    now = now_ts()
+    rng = random.Random(1)
+    result = []
+    for r in range(rooms):
+        room = Room(
+            room_id=f"R{r:06d}",
+            destination_name=f"Destination {r}",
+            destination_lat=40.0 + rng.random(),
+            destination_lng=-74.0 + rng.random(),
+            created_at=now,
+            expires_at=now + 3 * 3600
+        )
+        for m in range(members):
+            member_id = f"m_{r:06d}{m:06d}"
+            room.members[member_id] = Member(
+                member_id=member_id,
+                name=f"Rider {m}",
+                token="x",
+                lat=40.0 + rng.random(),
+                lng=-74.0 + rng.random(),
+                last_updated=now
+            )
+        result.append(room)
+    return result
+
+def new_fixes(rooms: list):
+    for room in rooms:
+        for member in room.members.values():
+            member.lat += 1e-4
+            member.last_updated += 1
+
+def best_of(fn, repeat: int, setup=None) -> float:
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rooms", type=int, default=1000)
+    parser.add_argument("--members", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rooms = make_rooms(args.rooms, args.members)
+    total = args.rooms * args.members
+
+    def scalar():
+        for room in rooms:
+            for member in room.members.values():
+                haversine_distance(member.lat, member.lng, room.destination_lat, room.destination_lng)
+
+    rows = [(room.destination_lat, room.destination_lng, member.lat, member.lng)
+            for room in rooms for member in room.members.values()]
+    dest_lat, dest_lng, lat, lng = np.array(rows).T
+
+    def scalar_tick():
+        # Same outputs as GeoEngine.update, one member at a time
+        for room in rooms:
+            dest_lat, dest_lng = room.destination_lat, room.destination_lng
+            for member in room.members.values():
+                lat, lng = member.lat, member.lng
+                ts = member.last_updated
+                distance = haversine_distance(lat, lng, dest_lat, dest_lng) * 1000
+                phi1, phi2 = math.radians(lat), math.radians(dest_lat)
+                d_lambda = math.radians(dest_lng - lng)
+                bearing = math.degrees(math.atan2(
+                    math.sin(d_lambda) * math.cos(phi2),
+                    math.cos(phi1) * math.sin(phi2) - math.sin(phi1) * math.cos(phi2) * math.cos(d_lambda)
+                )) % 360
+                prev = member.motion
+                speed = prev[3] if prev else 0.0
+                if prev and ts > prev[2]:
+                    step = haversine_distance(prev[0], prev[1], lat, lng) * 1000 / (ts - prev[2])
+                    if step <= 70:
+                        speed = 0.3 * step + 0.7 * speed
+                member.motion = (lat, lng, ts, speed)
+                member.geo = {
+                    "distance_m": round(distance, 1),
+                    "bearing_deg": round(bearing, 1),
+                    "speed_mps": round(speed, 2),
+                    "eta_secs": round(distance / speed) if speed >= 0.5 else None
+                }
+
+    engine = GeoEngine()
+
+    def per_room():
+        for room in rooms:
+            engine.refresh(room)
+
+    def batched():
+        for room in rooms:
+            engine.mark(room)
+        engine.refresh(rooms[0])
+
+    results = [
+        ("scalar loop", best_of(scalar, args.repeat)),
+        ("numpy kernel only", best_of(lambda: haversine_m(lat, lng, dest_lat, dest_lng), args.repeat)),
+        ("scalar full tick", best_of(scalar_tick, args.repeat, lambda: new_fixes(rooms))),
+        ("GeoEngine per room", best_of(per_room, args.repeat, lambda: new_fixes(rooms))),
+        ("GeoEngine batched", best_of(batched, args.repeat, lambda: new_fixes(rooms))),
+    ]
+
+    print(f"rooms={args.rooms} members/room={args.members} ({total} members)")
+    for name, elapsed in results:
+        print(f"{name:20} {elapsed * 1000:8.2f} ms  {elapsed / total * 1e9:7.0f} ns/member")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Event room fan-out benchmark - does per-socket cost stay flat as rooms grow?
+
+Builds event rooms of increasing size at the same crowd density (area
+grows with the member count), connects every member to a fake socket,
+moves everyone and times one InterestFanout.broadcast tick. Prints the
+tick time, time per socket, and how many members each socket was sent -
+compared with what a standard-room broadcast would push (everyone).
+
+    cd backend
+    python -m benchmarks.bench_interest --sizes 250 1000 5000
+"""
+
+import argparse
+import asyncio
+import math
+import random
+import time
+
+from services.interest import InterestFanout
+from services.room_service import RoomService
+from services.snapshot import RoomSnapshotCache
+from services.ws_manager import ConnectionManager
+from storage.memory import MemoryStore, Member
+from utils.time import now_ts
+
+METERS_PER_DEGREE = 111_320
+
+class FakeSocket:
+    async def send_text(self, message: str):
+        pass
+
+    async def send_bytes(self, message: bytes):
+        pass
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        pass
+
+async def run_size(size: int, density_per_km2: float, radius_m: float, max_visible: int) -> dict:
+    rng = random.Random(size)
+    service = RoomService(MemoryStore(), ttl_seconds=3600)
+    room = service.create_room(f"EVT{size}", "Festival", 40.0, -74.0, 60, mode="event")
+    manager = ConnectionManager(max_queue_size=4)
+    fanout = InterestFanout(RoomSnapshotCache(service), manager, view_radius_m=radius_m, max_visible=max_visible)
+
+    side_deg = math.sqrt(size / density_per_km2) * 1000 / METERS_PER_DEGREE
+    now = now_ts()
+    for i in range(size):
+        member = Member(f"m_{i:012d}", f"P{i}", "token", 40.0 + rng.random() * side_deg,
+                        -74.0 + rng.random() * side_deg, now, True, i)
+        room.members[member.member_id] = member
+        await manager.connect(room.room_id, member.member_id, FakeSocket())
+    room.host_member_id = "m_000000000000"
+
+    fanout.broadcast(room)  # first tick - everyone new to everyone
+    for member in room.members.values():
+        member.lat += 1e-4
+    sent_before = fanout.members_sent
+
+    started = time.perf_counter()
+    fanout.broadcast(room)
+    elapsed = time.perf_counter() - started
+
+    await manager.stop()
+    return {
+        "members": size,
+        "tick_ms": elapsed * 1000,
+        "per_socket_us": elapsed / size * 1e6,
+        "sent_per_socket": (fanout.members_sent - sent_before) / size
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Event room interest fan-out benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[250, 1000, 5000])
+    parser.add_argument("--density", type=float, default=50, help="members per km^2")
+    parser.add_argument("--radius", type=float, default=2000, help="default view radius (m)")
+    parser.add_argument("--max-visible", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'members':>8}{'tick ms':>10}{'us/socket':>11}{'sent/socket':>13}{'standard':>10}")
+    for size in args.sizes:
+        row = asyncio.run(run_size(size, args.density, args.radius, args.max_visible))
+        print(f"{row['members']:>8}{row['tick_ms']:>10.1f}{row['per_socket_us']:>11.1f}"
+              f"{row['sent_per_socket']:>13.1f}{size:>10}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Journal/snapshot recovery benchmark.
+
+Writes N rooms x M members through a RoomJournal, shuts it down (which
+compacts into a snapshot), appends a journal tail of location updates,
+then times what a restart pays before it serves anything: MemoryStore.recover(),
+as in main.startup_event. Also shows what comes after that: handing every
+room to the expiry reaper (right after startup), each room's statuses and
+liveness timers (on_load, the first time the room is fetched) and the first
+compaction, which builds the journal's shadow copy on the writer thread.
+
+    cd backend
+    python -m benchmarks.bench_journal --rooms 100000 --members 4
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from services.expiry import ExpiryReaper
+from services.room_service import RoomService
+from services.timer_wheel import TimerWheel
+from storage.journal import RoomJournal
+from storage.memory import MemoryStore, Room, Member
+from utils.time import now_ts
+
+def write_rooms(journal: RoomJournal, rooms: int, members: int):
+    now = now_ts()
+    for r in range(rooms):
+        room = Room(
+            room_id=f"R{r:06d}",
+            destination_name=f"Destination {r}",
+            destination_lat=40.0 + r * 1e-5,
+            destination_lng=-73.0,
+            created_at=now,
+            expires_at=now + 3 * 3600
+        )
+        journal.log_room(room)
+        for m in range(members):
+            journal.log_member(room.room_id, Member(
+                member_id=f"m_{r:06d}{m:06d}",
+                name=f"Rider {m}",
+                token="x" * 32,
+                lat=room.destination_lat,
+                lng=room.destination_lng,
+                last_updated=now
+            ))
+        journal.log_host(room.room_id, f"m_{r:06d}{0:06d}")
+
+def write_tail(journal: RoomJournal, rooms: int, records: int):
+    now = now_ts()
+    for i in range(records):
+        r = i % rooms
+        journal.log_member(f"R{r:06d}", Member(
+            member_id=f"m_{r:06d}{0:06d}",
+            name="Rider 0",
+            token="x" * 32,
+            lat=41.0,
+            lng=-74.0,
+            last_updated=now
+        ))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rooms", type=int, default=100_000)
+    parser.add_argument("--members", type=int, default=4)
+    parser.add_argument("--tail", type=int, default=100_000, help="journal records written after the snapshot")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="tether-journal-")
+    try:
+        # Phase 1: populate, clean shutdown -> snapshot
+        journal = RoomJournal(directory, compact_records=10 ** 12)
+        journal.recover()
+        journal.start()
+        write_rooms(journal, args.rooms, args.members)
+        journal.stop()
+
+        # Phase 2: tail that only lives in the journal (like after a crash - no final snapshot)
+        journal = RoomJournal(directory, compact_records=10 ** 12, compact_on_stop=False)
+        journal.recover()
+        journal.start()
+        write_tail(journal, args.rooms, args.tail)
+        journal.stop()
+
+        sizes = {name: os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)}
+
+        store = MemoryStore(journal=RoomJournal(directory), on_load=lambda room: room_service.track_room(room))
+        room_service = RoomService(store, status_wheel=TimerWheel())
+        expiry_reaper = ExpiryReaper(lambda room_id: None)
+        started = time.perf_counter()
+        count = store.recover()
+        recovered = time.perf_counter()
+        expiry_reaper.track_many((room.expires_at, room.room_id) for room in list(store.rooms.values()))
+        expiries = time.perf_counter()
+        slowest_load = 0.0
+        for room_id in list(store.rooms):
+            load_started = time.perf_counter()
+            store.get_room(room_id)
+            slowest_load = max(slowest_load, time.perf_counter() - load_started)
+        loaded = time.perf_counter()
+
+        # The writer's shadow copy is built at the first compaction, off the loop
+        store.journal.start()
+        compact_started = time.perf_counter()
+        store.journal.stop()
+        compacted = time.perf_counter()
+
+        members = sum(len(room.members) for room in store.rooms.values())
+        print(f"rooms={count} members={members} tail_records={args.tail}")
+        print("files: " + ", ".join(f"{name}={size / 1e6:.1f} MB" for name, size in sorted(sizes.items())))
+        print(f"startup (recover): {(recovered - started) * 1000:.0f} ms")
+        print(f"after startup: expiries {(expiries - recovered) * 1000:.0f} ms ({expiry_reaper.pending()} rooms), "
+              f"first fetch of every room {(loaded - expiries) * 1000:.0f} ms "
+              f"({(loaded - expiries) / max(count, 1) * 1e6:.1f} us/room avg, slowest {slowest_load * 1e6:.0f} us, "
+              f"{len(room_service.status_wheel)} timers)")
+        print(f"first compaction (writer thread): {(compacted - compact_started) * 1000:.0f} ms")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
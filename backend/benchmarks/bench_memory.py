@@ -0,0 +1,62 @@
+"""
+Room/Member memory footprint benchmark.
+
+Fills a MemoryStore with N rooms x M members (every member has a
+location and a last-update time, like during a ride) and reports what
+tracemalloc says the store costs - total, per room and per member.
+IDs and tokens are shaped like the real ones (see utils.ids).
+
+    cd backend
+    python -m benchmarks.bench_memory --rooms 100000 --members 10
+"""
+
+import argparse
+import gc
+import tracemalloc
+
+from storage.memory import MemoryStore, Room, Member
+from utils.time import now_ts
+
+def fill(store: MemoryStore, rooms: int, members: int):
+    now = now_ts()
+    for r in range(rooms):
+        room = Room(
+            room_id=f"{r:06X}",
+            destination_name=f"Destination {r}",
+            destination_lat=40.0 + r * 1e-6,
+            destination_lng=-73.0,
+            created_at=now,
+            expires_at=now + 3 * 3600
+        )
+        store.create_room(room)
+        for m in range(members):
+            store.add_member(room.room_id, Member(
+                member_id=f"m_{r:06x}{m:06x}",
+                name=f"Rider {m}",
+                token=f"{r:016x}{m:016x}",
+                lat=40.0 + m * 1e-6,
+                lng=-73.0 + r * 1e-6,
+                last_updated=now_ts()
+            ))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rooms", type=int, default=100_000)
+    parser.add_argument("--members", type=int, default=10)
+    args = parser.parse_args()
+
+    store = MemoryStore()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    fill(store, args.rooms, args.members)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    print(f"rooms={args.rooms} members/room={args.members}")
+    print(f"total: {used / 1e6:.1f} MB")
+    print(f"per room (incl. members): {used / args.rooms:.0f} B")
+    print(f"per member (approx): {used / (args.rooms * args.members):.0f} B")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+JSON vs binary wire format benchmark.
+
+Encodes/decodes a typical delta (N members moved) and a client location
+fix both ways and prints bytes per frame and time per encode/decode.
+
+    cd backend
+    python -m benchmarks.bench_wire --members 10
+"""
+
+import argparse
+import json
+import time
+
+from services.wire import decode_client_frame, decode_delta, delta_frame, encode_location, BINARY_PROTOCOL
+
+def member_views(count: int) -> list:
+    return [{
+        "member_id": f"m_{i:012d}",
+        "idx": i,
+        "name": f"Rider {i}",
+        "initials": "R",
+        "last_location": {"lat": 40.7128 + i * 1e-4, "lng": -74.0060 - i * 1e-4},
+        "status": "Live"
+    } for i in range(count)]
+
+def per_call_us(fn, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--members", type=int, default=10)
+    parser.add_argument("--iterations", type=int, default=50_000)
+    args = parser.parse_args()
+
+    views = member_views(args.members)
+    json_delta = delta_frame("ABC123", 42, 41, views, []).payload(None)
+    binary_delta = delta_frame("ABC123", 42, 41, views, []).payload(BINARY_PROTOCOL)
+    json_fix = json.dumps({"type": "location", "lat": 40.7128, "lng": -74.0060})
+    binary_fix = encode_location(40.7128, -74.0060)
+
+    n = args.iterations
+    rows = [
+        ("delta encode", len(json_delta), len(binary_delta),
+         per_call_us(lambda: delta_frame("ABC123", 42, 41, views, []).payload(None), n),
+         per_call_us(lambda: delta_frame("ABC123", 42, 41, views, []).payload(BINARY_PROTOCOL), n)),
+        ("delta decode", len(json_delta), len(binary_delta),
+         per_call_us(lambda: json.loads(json_delta), n),
+         per_call_us(lambda: decode_delta(binary_delta), n)),
+        ("location decode", len(json_fix), len(binary_fix),
+         per_call_us(lambda: json.loads(json_fix), n),
+         per_call_us(lambda: decode_client_frame(binary_fix), n)),
+    ]
+
+    print(f"members per delta: {args.members}")
+    print(f"{'':16} {'json B':>8} {'bin B':>8} {'json us':>9} {'bin us':>9}")
+    for name, json_size, bin_size, json_us, bin_us in rows:
+        print(f"{name:16} {json_size:>8} {bin_size:>8} {json_us:>9.2f} {bin_us:>9.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Microbenchmarks for the backend hot paths, with regression gating.
+
+Each case times one hot path in isolation (auto-calibrated loop counts)
+and reports ns per operation:
+
+    state_frame_for        RoomSnapshotCache.state_frame_for for a 10-member room
+                           (member views + encoding, no cache)
+    json_dumps_state       json.dumps of the state message alone
+    state_frame_uncached   RoomSnapshotCache.state_frame after a change (cache miss)
+    room_document_uncached RoomSnapshotCache.room_document after a change (GET /rooms body)
+    delta_next_frame       DeltaEncoder.next_frame with one member moved
+    get_member_status      RoomService.get_member_status
+    now_ts / get_utc_now   clock reads (epoch float vs aware datetime)
+    haversine_distance     scalar great-circle distance
+    broadcast_to_room      ConnectionManager.broadcast_to_room to 10 fake sockets,
+                           until every writer task has sent the frame
+
+    cd backend
+    python -m benchmarks.micro
+    python -m benchmarks.micro --save benchmarks/baselines/micro.json
+    python -m benchmarks.micro --compare benchmarks/baselines/micro.json
+
+Timing is noisy on shared boxes - a single run can be off by 2x on an
+otherwise idle VM. So every case runs in --rounds rounds, interleaved with
+the other cases so a slow patch of the machine hits all of them, each
+round taking the best of --repeat runs. The median round is what's
+reported, saved and compared, alongside its spread (how far the slowest
+round was off the median).
+
+--compare exits non-zero when any case is slower than its baseline by
+more than --threshold. The default 35% is what medians of unchanged
+code drift between runs on a 1-vCPU VM; lower it on a quiet machine.
+Baselines are per machine - re-record them with --save on the box you
+compare on.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import timeit
+from typing import Callable, Dict, List, Tuple
+
+from services.delta import DeltaEncoder
+from services.geo import haversine_distance
+from services.room_service import RoomService
+from services.snapshot import RoomSnapshotCache
+from services.ws_manager import ConnectionManager
+from storage.memory import MemoryStore, Room, Member
+from utils.time import get_utc_now, now_ts
+
+MEMBERS = 10
+
+# name -> factory returning (fn, operations per fn call[, teardown])
+CASES: Dict[str, Callable[[], tuple]] = {}
+
+def case(name: str):
+    def register(factory):
+        CASES[name] = factory
+        return factory
+    return register
+
+def make_room() -> Tuple[RoomService, Room]:
+    service = RoomService(MemoryStore(), ttl_seconds=3600)
+    now = now_ts()
+    room = service.create_room("BENCH1", "Destination", 40.75, -73.98, 60)
+    for i in range(MEMBERS):
+        member = Member(f"m_{i:012d}", f"Rider {i}", "token", 40.7 + i * 1e-3, -74.0 + i * 1e-3, now - i, True, i)
+        room.members[member.member_id] = member
+    return service, room
+
+@case("state_frame_for")
+def bench_state_frame_for():
+    service, room = make_room()
+    snapshot_cache = RoomSnapshotCache(service)
+    return lambda: snapshot_cache.state_frame_for(room, room.members.values(), room.seq, now_ts()), 1
+
+@case("json_dumps_state")
+def bench_json_dumps_state():
+    service, room = make_room()
+    # The real message, decoded back - so the dict always has the shape we actually send
+    state = json.loads(RoomSnapshotCache(service).state_frame_for(room, room.members.values(), room.seq, now_ts()))
+    return lambda: json.dumps(state), 1
+
+@case("state_frame_uncached")
+def bench_state_frame_uncached():
+    service, room = make_room()
+    snapshot_cache = RoomSnapshotCache(service)
+
+    def run():
+        room.version += 1  # invalidate, as any change would
+        snapshot_cache.state_frame(room)
+    return run, 1
+
+@case("room_document_uncached")
+def bench_room_document_uncached():
+    service, room = make_room()
+    snapshot_cache = RoomSnapshotCache(service)
+
+    def run():
+        room.version += 1
+        snapshot_cache.room_document(room)
+    return run, 1
+
+@case("delta_next_frame")
+def bench_delta_next_frame():
+    service, room = make_room()
+    encoder = DeltaEncoder(RoomSnapshotCache(service), keyframe_interval=1_000_000_000)
+    encoder.next_frame(room)
+    member = next(iter(room.members.values()))
+
+    def run():
+        member.lat += 1e-5
+        encoder.next_frame(room)
+    return run, 1
+
+@case("get_member_status")
+def bench_get_member_status():
+    service, _ = make_room()
+    now = now_ts()
+    last_updated = now - 12
+    return lambda: service.get_member_status(last_updated, now), 1
+
+@case("now_ts")
+def bench_now_ts():
+    return now_ts, 1
+
+@case("get_utc_now")
+def bench_get_utc_now():
+    return get_utc_now, 1
+
+@case("haversine_distance")
+def bench_haversine_distance():
+    return lambda: haversine_distance(40.7128, -74.0060, 40.7580, -73.9855), 1
+
+class FakeSocket:
+    def __init__(self):
+        self.received = 0
+
+    async def send_text(self, message: str):
+        self.received += 1
+
+    async def send_bytes(self, message: bytes):
+        self.received += 1
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        pass
+
+@case("broadcast_to_room")
+def bench_broadcast_to_room():
+    burst = 1000  # frames per timed call, so loop overhead doesn't dominate
+    loop = asyncio.new_event_loop()
+    manager = ConnectionManager(max_queue_size=burst + 1)
+    sockets = [FakeSocket() for _ in range(MEMBERS)]
+
+    async def setup():
+        for i, socket in enumerate(sockets):
+            await manager.connect("BENCH1", f"m_{i:012d}", socket)
+    loop.run_until_complete(setup())
+    frame = json.dumps({"type": "delta", "members": [{"member_id": "m_000000000000", "status": "Live"}]})
+
+    async def run():
+        target = sockets[-1].received + burst
+        for _ in range(burst):
+            await manager.broadcast_to_room("BENCH1", frame)
+        while sockets[-1].received < target:
+            await asyncio.sleep(0)
+
+    def teardown():
+        loop.run_until_complete(manager.stop())
+        loop.close()
+    return lambda: loop.run_until_complete(run()), burst, teardown
+
+# ---------- runner ----------
+
+def measure(name: str, repeat: int) -> Tuple[Callable[[], float], list]:
+    """Set up a case - returns (one round of it: best of repeat runs in ns/op, teardowns)"""
+    fn, ops, *teardown = CASES[name]()
+    timer = timeit.Timer(fn)
+    loops, _ = timer.autorange()
+    return lambda: min(timer.repeat(repeat=repeat, number=loops)) / (loops * ops) * 1e9, teardown
+
+def run(names: List[str], repeat: int, rounds: int) -> dict:
+    cases = {name: measure(name, repeat) for name in names}
+    samples: Dict[str, List[float]] = {name: [] for name in names}
+    try:
+        for _ in range(rounds):
+            for name, (one_round, _) in cases.items():
+                samples[name].append(one_round())
+    finally:
+        for _, teardown in cases.values():
+            for cleanup in teardown:
+                cleanup()
+
+    medians = {name: statistics.median(values) for name, values in samples.items()}
+    return {
+        "machine": {
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "platform": platform.platform()
+        },
+        "rounds": rounds,
+        "ns_per_op": {name: round(medians[name], 1) for name in names},
+        # Slowest round vs the median - how much to trust the number
+        "spread": {name: round(max(samples[name]) / medians[name] - 1, 3) for name in names}
+    }
+
+def compare(result: dict, baseline: dict, threshold: float) -> List[str]:
+    """Print a comparison table and return the cases slower than threshold allows"""
+    slower = []
+    if result["machine"] != baseline.get("machine"):
+        print(f"warning: baseline was recorded on {baseline.get('machine')}")
+    print(f"{'case':<24}{'baseline ns':>14}{'now ns':>12}{'spread':>9}{'change':>10}")
+    for name, now in result["ns_per_op"].items():
+        then = baseline["ns_per_op"].get(name)
+        spread = f"{result['spread'][name]:.0%}"
+        if then is None:
+            print(f"{name:<24}{'-':>14}{now:>12.1f}{spread:>9}{'new':>10}")
+            continue
+        change = now / then - 1
+        flag = "  <-- SLOWER" if change > threshold else ""
+        print(f"{name:<24}{then:>14.1f}{now:>12.1f}{spread:>9}{change:>+10.1%}{flag}")
+        if change > threshold:
+            slower.append(name)
+    return slower
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend hot path microbenchmarks")
+    parser.add_argument("cases", nargs="*", help=f"cases to run (default all): {', '.join(CASES)}")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per round, best one counts")
+    parser.add_argument("--rounds", type=int, default=7, help="rounds over all cases, the median counts")
+    parser.add_argument("--save", help="write results as a baseline")
+    parser.add_argument("--compare", help="baseline to check against")
+    parser.add_argument("--threshold", type=float, default=0.35, help="allowed slowdown (0.35 = 35%%)")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.cases if name not in CASES]
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(unknown)}")
+
+    result = run(args.cases or list(CASES), args.repeat, args.rounds)
+
+    if args.compare:
+        with open(args.compare) as f:
+            slower = compare(result, json.load(f), args.threshold)
+    else:
+        slower = []
+        for name, ns in result["ns_per_op"].items():
+            print(f"{name:<24}{ns:>12.1f} ns/op  (spread {result['spread'][name]:.0%})")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(result, f, indent=2)
+            f.write("\n")
+
+    if slower:
+        print(f"Regressed beyond {args.threshold:.0%}: {', '.join(slower)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
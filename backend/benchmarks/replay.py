@@ -0,0 +1,341 @@
+"""
+Replay captured client traffic against a server - real traffic shapes
+(bursty joins, reconnects, GPS rates that follow speed) instead of
+swarm.py's steady random walk.
+
+Capture with RECORD_TRAFFIC=path on a running server (services/recorder.py,
+anonymized). Replay starts a backend (or attaches with --url/--pid),
+recreates every room around a made-up origin and plays each member's
+events in order, at the recorded pace divided by --speed. Each member is
+its own task, so one slow handshake only delays that member.
+
+Reports how far behind schedule events ran (the server pushing back on
+handshakes and REST calls shows up here), frames and bytes received, and
+the server process' CPU and peak RSS.
+
+    cd backend
+    RECORD_TRAFFIC=/tmp/convoy.bin uvicorn main:app       # capture
+    python -m benchmarks.replay /tmp/convoy.bin --info     # what's in it
+    python -m benchmarks.replay /tmp/convoy.bin            # 1x
+    python -m benchmarks.replay /tmp/convoy.bin --speed 10 --save /tmp/before.json
+
+Viewports come back as a radius around the member, waypoints as a ring
+around the destination - the log only keeps their size and count.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import time
+import urllib.request
+from collections import Counter
+from typing import Dict, List, Optional
+
+import numpy as np
+import websockets
+
+from benchmarks.swarm import cpu_seconds, post, rss_mb, start_server, wait_for_server
+from services.recorder import (
+    BATCH, CONNECTED, DISCONNECTED, ENDED, JOINED, KIND_NAMES, LOCATION, PING, POLL, PROTOCOLS, RESUMED,
+    RESYNC, ROOM_CREATED, VIEWPORT, from_offset, read_log
+)
+
+ROOMS_PER_ROW = 50
+ROOM_SPACING_DEGREES = 0.5  # rooms far enough apart that nobody's geofences overlap
+WAYPOINT_RING_M = 1_000
+
+class Stats:
+    def __init__(self):
+        self.events: Counter = Counter()
+        self.lags: List[float] = []
+        self.errors: Counter = Counter()
+        self.frames_received = 0
+        self.bytes_received = 0
+
+class ReplayRoom:
+    def __init__(self, alias: int):
+        self.alias = alias
+        self.room_id: Optional[str] = None
+        self.lat = 40.0 + (alias // ROOMS_PER_ROW) * ROOM_SPACING_DEGREES
+        self.lng = -74.0 + (alias % ROOMS_PER_ROW) * ROOM_SPACING_DEGREES
+        self.host: Optional["Member"] = None
+        self.created = asyncio.Lock()
+
+class Member:
+    """One recorded member - joins, connects and sends in recorded order"""
+
+    def __init__(self, alias: int, room: ReplayRoom, replay: "Replay"):
+        self.alias = alias
+        self.room = room
+        self.replay = replay
+        self.member_id: Optional[str] = None
+        self.token: Optional[str] = None
+        self.ws = None
+        self.receiver: Optional[asyncio.Task] = None
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        stats = self.replay.stats
+        while True:
+            target, kind, fields = await self.queue.get()
+            stats.lags.append(max(time.perf_counter() - target, 0.0))
+            try:
+                await self._handle(kind, fields)
+            except (OSError, websockets.WebSocketException, ValueError) as e:
+                stats.errors[f"{KIND_NAMES[kind]}: {type(e).__name__}"] += 1
+            finally:
+                self.queue.task_done()
+
+    async def _handle(self, kind: int, fields: tuple):
+        replay = self.replay
+        if self.member_id is None:
+            await self._join()  # recording started after this member joined
+            if kind == JOINED:
+                return
+
+        if kind == CONNECTED:
+            await self._close()
+            protocol = PROTOCOLS[fields[0] & ~RESUMED]
+            url = (f"{replay.ws_url}/ws/rooms/{self.room.room_id}"
+                   f"?member_id={self.member_id}&token={self.token}")
+            self.ws = await websockets.connect(url, max_size=None, subprotocols=[protocol] if protocol else None)
+            self.receiver = asyncio.create_task(self._receive(self.ws))
+        elif kind == DISCONNECTED:
+            await self._close()
+        elif kind == BATCH:
+            now_ms = time.time() * 1000
+            fixes = []
+            for age_ms, east, north in fields:
+                lat, lng = from_offset(self.room.lat, self.room.lng, east, north)
+                fixes.append({"ts": now_ms - age_ms, "lat": lat, "lng": lng})
+            await asyncio.to_thread(post, f"{replay.base_url}/rooms/{self.room.room_id}/locations",
+                                    {"member_id": self.member_id, "token": self.token, "fixes": fixes})
+        elif kind == ENDED:
+            await asyncio.to_thread(post, f"{replay.base_url}/rooms/{self.room.room_id}/end",
+                                    {"member_id": self.member_id, "token": self.token})
+        elif kind in (LOCATION, PING, RESYNC, VIEWPORT):
+            if self.ws is None:
+                replay.stats.errors[f"{KIND_NAMES[kind]}: not connected"] += 1
+                return
+            await self.ws.send(json.dumps(self._message(kind, fields)))
+
+    def _message(self, kind: int, fields: tuple) -> dict:
+        if kind == LOCATION:
+            lat, lng = from_offset(self.room.lat, self.room.lng, *fields)
+            return {"type": "location", "lat": lat, "lng": lng}
+        if kind == VIEWPORT:
+            return {"type": "viewport", "radius_m": fields[0]} if fields[0] else {"type": "viewport"}
+        return {"type": KIND_NAMES[kind]}
+
+    async def _join(self):
+        joined = await asyncio.to_thread(post, f"{self.replay.base_url}/rooms/{self.room.room_id}/join",
+                                         {"name": f"Rider {self.alias}"})
+        self.member_id, self.token = joined["member_id"], joined["token"]
+        if self.room.host is None:
+            self.room.host = self
+
+    async def _receive(self, ws):
+        stats = self.replay.stats
+        try:
+            async for frame in ws:
+                stats.frames_received += 1
+                stats.bytes_received += len(frame)
+        except websockets.WebSocketException:
+            pass
+        if self.ws is ws:
+            self.ws = None  # server closed it (room ended, rate limit, ...)
+
+    async def _close(self):
+        ws, self.ws = self.ws, None
+        if ws is not None:
+            await ws.close()
+        if self.receiver:
+            await asyncio.gather(self.receiver, return_exceptions=True)
+            self.receiver = None
+
+class Replay:
+    def __init__(self, base_url: str, speed: float):
+        self.base_url = base_url
+        self.ws_url = base_url.replace("http", "ws", 1)
+        self.speed = speed
+        self.stats = Stats()
+        self.rooms: Dict[int, ReplayRoom] = {}
+        self.members: Dict[int, Member] = {}
+
+    async def room(self, alias: int, mode: int = 0, waypoints: int = 0) -> ReplayRoom:
+        room = self.rooms.get(alias)
+        if room is None:
+            room = self.rooms[alias] = ReplayRoom(alias)
+        async with room.created:
+            if room.room_id is None:
+                ring = [from_offset(room.lat, room.lng,
+                                    WAYPOINT_RING_M * 10 * math.cos(2 * math.pi * i / waypoints),
+                                    WAYPOINT_RING_M * 10 * math.sin(2 * math.pi * i / waypoints))
+                        for i in range(waypoints)]
+                created = await asyncio.to_thread(post, f"{self.base_url}/rooms", {
+                    "destination_name": f"Replay {alias}",
+                    "destination_lat": room.lat,
+                    "destination_lng": room.lng,
+                    "mode": "event" if mode else "standard",
+                    "waypoints": [{"name": f"Waypoint {i}", "lat": lat, "lng": lng} for i, (lat, lng) in enumerate(ring)]
+                })
+                room.room_id = created["room_id"]
+        return room
+
+    async def member(self, alias: int, room_alias: int) -> Member:
+        member = self.members.get(alias)
+        if member is None:
+            member = self.members[alias] = Member(alias, await self.room(room_alias), self)
+        return member
+
+    async def poll(self, room: ReplayRoom):
+        try:
+            await asyncio.to_thread(lambda: urllib.request.urlopen(f"{self.base_url}/rooms/{room.room_id}",
+                                                                   timeout=10).read())
+        except OSError as e:
+            self.stats.errors[f"poll: {type(e).__name__}"] += 1
+
+    async def run(self, events: list):
+        started = time.perf_counter()
+        background = set()
+        for kind, at, room_alias, member_alias, fields in events:
+            target = started + at / self.speed
+            delay = target - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.stats.events[KIND_NAMES[kind]] += 1
+
+            if kind == ROOM_CREATED:
+                self.stats.lags.append(max(time.perf_counter() - target, 0.0))
+                await self.room(room_alias, *fields)
+            elif kind == POLL:
+                task = asyncio.create_task(self.poll(await self.room(room_alias)))
+                background.add(task)
+                task.add_done_callback(background.discard)
+            elif kind == ENDED:
+                room = await self.room(room_alias)
+                if room.host:  # in line behind the host's own events
+                    room.host.queue.put_nowait((target, kind, fields))
+            else:
+                member = await self.member(member_alias, room_alias)
+                member.queue.put_nowait((target, kind, fields))
+
+        for member in self.members.values():
+            await member.queue.join()
+        await asyncio.gather(*background, return_exceptions=True)
+        for member in self.members.values():
+            await member._close()
+            member.task.cancel()
+        return time.perf_counter() - started
+
+async def replay(args, events: list, base_url: str, pid: Optional[int]) -> dict:
+    runner = Replay(base_url, args.speed)
+    peak_rss = 0.0
+
+    async def sample_rss():
+        nonlocal peak_rss
+        while True:
+            peak_rss = max(peak_rss, rss_mb(pid) or 0.0)
+            await asyncio.sleep(1)
+
+    sampler = asyncio.create_task(sample_rss()) if pid else None
+    cpu_before = cpu_seconds(pid) if pid else None
+    elapsed = await runner.run(events)
+    cpu_after = cpu_seconds(pid) if pid else None
+    if sampler:
+        sampler.cancel()
+
+    stats = runner.stats
+    lags_ms = np.array(stats.lags) * 1000
+    lag = np.percentile(lags_ms, [50, 95, 99]) if len(lags_ms) else None
+    return {
+        "config": {"log": os.path.basename(args.log), "speed": args.speed, "duration": args.duration},
+        "events": sum(stats.events.values()),
+        "by_kind": dict(stats.events),
+        "errors": dict(stats.errors),
+        "elapsed_s": round(elapsed, 1),
+        "schedule_lag_ms": {
+            "p50": round(float(lag[0]), 1) if lag is not None else None,
+            "p95": round(float(lag[1]), 1) if lag is not None else None,
+            "p99": round(float(lag[2]), 1) if lag is not None else None,
+            "max": round(float(lags_ms.max()), 1) if lag is not None else None
+        },
+        "frames_per_sec": round(stats.frames_received / elapsed, 1) if elapsed else None,
+        "received_bytes": stats.bytes_received,
+        "server": {
+            "cpu_percent": round((cpu_after - cpu_before) / elapsed * 100, 1) if cpu_before is not None else None,
+            "rss_mb_peak": round(peak_rss, 1) if pid else None
+        }
+    }
+
+def describe(events: list) -> dict:
+    """What a capture holds, without replaying it"""
+    kinds = Counter(KIND_NAMES[kind] for kind, *_ in events)
+    connected, peak = set(), 0
+    for kind, _, _, member, _ in events:
+        if kind == CONNECTED:
+            connected.add(member)
+            peak = max(peak, len(connected))
+        elif kind == DISCONNECTED:
+            connected.discard(member)
+    duration = events[-1][1] if events else 0.0
+    return {
+        "duration_s": round(duration, 1),
+        "events": len(events),
+        "by_kind": dict(kinds),
+        "rooms": len({room for _, _, room, _, _ in events}),
+        "members": len({member for kind, _, _, member, _ in events if kind not in (ROOM_CREATED, POLL, ENDED)}),
+        "peak_sockets": peak,
+        "fixes_per_sec": round(kinds["location"] / duration, 1) if duration else None
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a RECORD_TRAFFIC capture against a server")
+    parser.add_argument("log", help="capture written by a server running with RECORD_TRAFFIC")
+    parser.add_argument("--speed", type=float, default=1.0, help="1 = recorded pace, 10 = ten times faster")
+    parser.add_argument("--duration", type=float, help="only replay the first N recorded seconds")
+    parser.add_argument("--info", action="store_true", help="summarize the capture and exit")
+    parser.add_argument("--url", help="attach to a running server instead of starting one")
+    parser.add_argument("--pid", type=int, help="server pid for CPU/RSS when using --url")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--server-log", action="store_true", help="show the spawned server's log output")
+    parser.add_argument("--save", help="write the result as JSON")
+    args = parser.parse_args()
+
+    events = list(read_log(args.log))
+    if args.duration is not None:
+        events = [event for event in events if event[1] <= args.duration]
+
+    if args.info:
+        print(json.dumps(describe(events), indent=2))
+        return
+
+    server = None
+    base_url = args.url
+    pid = args.pid
+    if not base_url:
+        # Same fixed settings as swarm.py, and don't capture the replay itself
+        server = start_server(args.port, {"STORAGE_BACKEND": "memory", "JOURNAL_DIR": "", "RECORD_TRAFFIC": ""},
+                              quiet=not args.server_log)
+        base_url = f"http://127.0.0.1:{args.port}"
+        pid = server.pid
+
+    try:
+        wait_for_server(base_url)
+        result = asyncio.run(replay(args, events, base_url, pid))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    print(json.dumps(result, indent=2))
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(result, f, indent=2)
+            f.write("\n")
+
+if __name__ == "__main__":
+    main()
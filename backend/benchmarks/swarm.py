@@ -0,0 +1,304 @@
+"""
+WebSocket swarm load test - how many rooms can one process carry?
+
+Starts a backend (or attaches to one with --url/--pid), creates N rooms
+through POST /rooms + /join, then opens --members sockets per room that
+walk around and stream location fixes at --rate per second. Every socket
+also listens, so each fix is measured as it lands on each room mate:
+
+    delivery latency = fix sent -> first frame carrying it received
+
+Latency includes the broadcast coalescing window (BROADCAST_INTERVAL_MS),
+so it's what a rider actually sees. Fixes superseded before a broadcast
+went out are never delivered and aren't counted.
+
+Reports p50/p95/p99 delivery latency, frames/s received, and the server
+process' CPU and peak RSS (read from /proc, Linux only).
+
+    cd backend
+    python -m benchmarks.swarm --rooms 20 --duration 30
+    python -m benchmarks.swarm --rooms 20 --duration 30 --save benchmarks/baselines/swarm.json
+    python -m benchmarks.swarm --rooms 20 --duration 30 --compare benchmarks/baselines/swarm.json
+
+The load generator shares the machine with the server, so compare runs
+from the same box. --compare exits non-zero when p95/p99 latency or
+throughput regress by more than --threshold.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import websockets
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STEP_DEGREES = 0.0002  # ~22 m per fix - well outside the default 10 m movement dead-band
+
+class Stats:
+    def __init__(self):
+        self.sent: Dict[Tuple[str, str, float, float], float] = {}  # (room, member, lat, lng) -> sent at
+        self.latencies: List[float] = []
+        self.fixes_sent = 0
+        self.frames_received = 0
+        self.errors = 0
+        self.measuring = False
+
+    def prune(self, older_than: float):
+        """Fixes that were coalesced away never arrive - forget them"""
+        self.sent = {key: sent_at for key, sent_at in self.sent.items() if sent_at >= older_than}
+
+# ---------- server process ----------
+
+def start_server(port: int, env: Dict[str, str], quiet: bool = True) -> subprocess.Popen:
+    # Per-connection INFO lines from 200+ sockets would drown the report
+    output = subprocess.DEVNULL if quiet else None
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env={**os.environ, **env},
+        stdout=output,
+        stderr=output
+    )
+
+def wait_for_server(url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} didn't come up")
+
+def cpu_seconds(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        # utime and stime are fields 14 and 15 (1-based), counting from after "(comm)"
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, IndexError, ValueError):
+        return None
+
+def rss_mb(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+# ---------- clients ----------
+
+def post(url: str, body: dict) -> dict:
+    request = urllib.request.Request(url, data=json.dumps(body).encode(), headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.loads(response.read())
+
+def create_room(base_url: str, members: int, rng: random.Random) -> Tuple[str, List[dict]]:
+    room = post(f"{base_url}/rooms", {
+        "destination_name": "Swarm",
+        "destination_lat": 40.0 + rng.random(),
+        "destination_lng": -74.0 + rng.random(),
+        "duration_minutes": 60
+    })
+    joined = [post(f"{base_url}/rooms/{room['room_id']}/join", {"name": f"Rider {i}"}) for i in range(members)]
+    return room["room_id"], joined
+
+async def run_client(ws_url: str, room_id: str, member: dict, rate: float, stats: Stats, stop: asyncio.Event,
+                     rng: random.Random):
+    url = f"{ws_url}/ws/rooms/{room_id}?member_id={member['member_id']}&token={member['token']}"
+    lat, lng = 40.0 + rng.random(), -74.0 + rng.random()
+    last_seen: Dict[str, Tuple[float, float]] = {}  # member_id -> last location matched (keyframes repeat it)
+
+    try:
+        async with websockets.connect(url, max_size=None) as ws:
+            async def receive():
+                async for raw in ws:
+                    if isinstance(raw, bytes):
+                        continue
+                    received_at = time.perf_counter()
+                    message = json.loads(raw)
+                    if stats.measuring:
+                        stats.frames_received += 1
+                    for view in message.get("members", ()):
+                        location = view.get("last_location")
+                        if not location:
+                            continue
+                        position = (round(location["lat"], 7), round(location["lng"], 7))
+                        if last_seen.get(view["member_id"]) == position:
+                            continue
+                        last_seen[view["member_id"]] = position
+                        sent_at = stats.sent.get((room_id, view["member_id"]) + position)
+                        if sent_at is not None and stats.measuring:
+                            stats.latencies.append(received_at - sent_at)
+
+            receiver = asyncio.create_task(receive())
+            # Spread clients over the interval so they don't all fire in lockstep
+            await asyncio.sleep(rng.random() / rate)
+            while not stop.is_set():
+                lat += STEP_DEGREES * rng.choice((-1, 1))
+                lng += STEP_DEGREES * rng.choice((-1, 1))
+                lat, lng = round(lat, 7), round(lng, 7)
+                stats.sent[(room_id, member["member_id"], lat, lng)] = time.perf_counter()
+                await ws.send(json.dumps({"type": "location", "lat": lat, "lng": lng}))
+                if stats.measuring:
+                    stats.fixes_sent += 1
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=1 / rate)
+                except asyncio.TimeoutError:
+                    pass
+            receiver.cancel()
+    except (OSError, websockets.WebSocketException):
+        stats.errors += 1
+
+# ---------- run ----------
+
+async def swarm(args, base_url: str, pid: Optional[int]) -> dict:
+    ws_url = base_url.replace("http", "ws", 1)
+    rng = random.Random(args.seed)
+    stats = Stats()
+    stop = asyncio.Event()
+
+    rooms = await asyncio.gather(*[
+        asyncio.to_thread(create_room, base_url, args.members, random.Random(rng.random()))
+        for _ in range(args.rooms)
+    ])
+
+    clients = []
+    for room_id, members in rooms:
+        for member in members:
+            clients.append(asyncio.create_task(
+                run_client(ws_url, room_id, member, args.rate, stats, stop, random.Random(rng.random()))
+            ))
+            await asyncio.sleep(args.ramp / max(1, args.rooms * args.members))
+
+    await asyncio.sleep(args.warmup)
+
+    stats.measuring = True
+    cpu_before = cpu_seconds(pid) if pid else None
+    started = time.perf_counter()
+    peak_rss = 0.0
+    while time.perf_counter() - started < args.duration:
+        await asyncio.sleep(1)
+        stats.prune(time.perf_counter() - 10)
+        if pid:
+            peak_rss = max(peak_rss, rss_mb(pid) or 0.0)
+    elapsed = time.perf_counter() - started
+    stats.measuring = False
+    cpu_after = cpu_seconds(pid) if pid else None
+
+    stop.set()
+    await asyncio.gather(*clients, return_exceptions=True)
+
+    latencies_ms = np.array(stats.latencies) * 1000
+    percentiles = np.percentile(latencies_ms, [50, 95, 99]) if len(latencies_ms) else [None] * 3
+    return {
+        "config": {
+            "rooms": args.rooms,
+            "members": args.members,
+            "rate": args.rate,
+            "duration": args.duration
+        },
+        "machine": {
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "platform": platform.platform()
+        },
+        "clients": args.rooms * args.members,
+        "errors": stats.errors,
+        "fixes_per_sec": round(stats.fixes_sent / elapsed, 1),
+        "frames_per_sec": round(stats.frames_received / elapsed, 1),
+        "deliveries": len(latencies_ms),
+        "latency_ms": {
+            "p50": round(float(percentiles[0]), 1) if len(latencies_ms) else None,
+            "p95": round(float(percentiles[1]), 1) if len(latencies_ms) else None,
+            "p99": round(float(percentiles[2]), 1) if len(latencies_ms) else None,
+            "max": round(float(latencies_ms.max()), 1) if len(latencies_ms) else None
+        },
+        "server": {
+            "cpu_percent": round((cpu_after - cpu_before) / elapsed * 100, 1) if cpu_before is not None else None,
+            "rss_mb_peak": round(peak_rss, 1) if pid else None
+        }
+    }
+
+def compare(result: dict, baseline: dict, threshold: float) -> List[str]:
+    """Regressions beyond threshold (0.25 = 25% worse)"""
+    problems = []
+    if result["config"] != baseline["config"]:
+        problems.append(f"config differs from baseline: {result['config']} vs {baseline['config']}")
+        return problems
+    for key in ("p95", "p99"):
+        now, then = result["latency_ms"][key], baseline["latency_ms"][key]
+        if now is not None and then and now > then * (1 + threshold):
+            problems.append(f"latency {key} {now} ms vs baseline {then} ms")
+    now, then = result["frames_per_sec"], baseline["frames_per_sec"]
+    if then and now < then * (1 - threshold):
+        problems.append(f"frames/s {now} vs baseline {then}")
+    if result["errors"] > baseline["errors"]:
+        problems.append(f"{result['errors']} client errors vs baseline {baseline['errors']}")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description="WebSocket swarm load test")
+    parser.add_argument("--rooms", type=int, default=20)
+    parser.add_argument("--members", type=int, default=10, help="sockets per room (rooms cap at 10)")
+    parser.add_argument("--rate", type=float, default=1.0, help="fixes per second per socket")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="seconds of load before measuring")
+    parser.add_argument("--ramp", type=float, default=5, help="seconds to open all sockets over")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--url", help="attach to a running server instead of starting one")
+    parser.add_argument("--pid", type=int, help="server pid for CPU/RSS when using --url")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--server-log", action="store_true", help="show the spawned server's log output")
+    parser.add_argument("--save", help="write the result as a baseline profile")
+    parser.add_argument("--compare", help="baseline profile to check against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed regression (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    pid = args.pid
+    if not base_url:
+        # Fixed server settings so runs are comparable
+        server = start_server(args.port, {"STORAGE_BACKEND": "memory", "JOURNAL_DIR": ""}, quiet=not args.server_log)
+        base_url = f"http://127.0.0.1:{args.port}"
+        pid = server.pid
+
+    try:
+        wait_for_server(base_url)
+        result = asyncio.run(swarm(args, base_url, pid))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    print(json.dumps(result, indent=2))
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(result, f, indent=2)
+            f.write("\n")
+
+    if args.compare:
+        with open(args.compare) as f:
+            problems = compare(result, json.load(f), args.threshold)
+        for problem in problems:
+            print(f"REGRESSION: {problem}")
+        if problems:
+            sys.exit(1)
+        print("No regressions against baseline")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Two-worker check over FakeRedis.
+
+Loads main.py twice as two "workers" sharing one FakeRedisServer (the
+Redis backend, minus the Redis), then checks the cross-worker paths:
+joining on one worker and connecting on the other, a fix on A reaching
+a socket on B, no member token on the bus, and ending a room clearing
+its keys. Also reports how long fixes take to cross over.
+
+    cd backend
+    python -m benchmarks.two_workers --fixes 50
+
+Exits 1 if any check fails.
+"""
+
+import argparse
+import importlib.util
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+import types
+
+from storage.fake_redis import FakeRedis, FakeRedisServer
+
+def load_worker(name: str, server: FakeRedisServer):
+    """main.py as a fresh module, with `import redis` handing out FakeRedis clients"""
+    fake = types.ModuleType("redis")
+    fake.Redis = types.SimpleNamespace(from_url=lambda url, **kwargs: FakeRedis(server))
+    sys.modules["redis"] = fake
+    spec = importlib.util.spec_from_file_location(name, os.path.join(os.path.dirname(__file__), "..", "main.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fixes", type=int, default=50, help="fixes sent on A and timed until B's socket sees them")
+    args = parser.parse_args()
+
+    os.environ["STORAGE_BACKEND"] = "redis"
+    os.environ.setdefault("BROADCAST_INTERVAL_MS", "20")
+    os.environ.setdefault("MOVEMENT_THRESHOLD_METERS", "0")
+    logging.disable(logging.INFO)
+    server = FakeRedisServer()
+    worker_a = load_worker("worker_a", server)
+    worker_b = load_worker("worker_b", server)
+
+    # Everything published on the bus, to make sure no token goes out
+    published = []
+    listener = FakeRedis(server).pubsub()
+    listener.subscribe(worker_a.RedisBus.CHANNEL)
+
+    from fastapi.testclient import TestClient
+
+    failures = []
+
+    def check(ok: bool, what: str):
+        print(f"{'ok  ' if ok else 'FAIL'} {what}")
+        if not ok:
+            failures.append(what)
+
+    with TestClient(worker_a.app) as a, TestClient(worker_b.app) as b:
+        room_id = a.post("/rooms", json={"destination_name": "X", "destination_lat": 40.0, "destination_lng": -73.0}).json()["room_id"]
+        alice = a.post(f"/rooms/{room_id}/join", json={"name": "alice"}).json()
+        bob = b.post(f"/rooms/{room_id}/join", json={"name": "bob"}).json()
+        check(b.get(f"/rooms/{room_id}").json()["host_member_id"] == alice["member_id"], "B loads a room created on A")
+
+        with b.websocket_connect(f"/ws/rooms/{room_id}?member_id={bob['member_id']}&token={bob['token']}") as socket_b, \
+                a.websocket_connect(f"/ws/rooms/{room_id}?member_id={alice['member_id']}&token={alice['token']}") as socket_a:
+            socket_a.receive_json()  # session
+            socket_b.receive_json()
+
+            # A already holds the room, so carol only reaches it over the bus (which leaves tokens out)
+            carol = b.post(f"/rooms/{room_id}/join", json={"name": "carol"}).json()
+            deadline = time.perf_counter() + 3
+            while carol["member_id"] not in worker_a.store.rooms[room_id].members and time.perf_counter() < deadline:
+                time.sleep(0.01)
+            with a.websocket_connect(f"/ws/rooms/{room_id}?member_id={carol['member_id']}&token={carol['token']}") as socket_c:
+                check(socket_c.receive_json().get("type") == "session", "member who joined on B connects on A")
+
+            latencies = []
+            for i in range(args.fixes):
+                lat = 40.0 + (i + 1) * 1e-3
+                sent = time.perf_counter()
+                socket_a.send_text(json.dumps({"type": "location", "lat": lat, "lng": -73.0}))
+                deadline = sent + 3
+                while time.perf_counter() < deadline:
+                    message = socket_b.receive_json()
+                    location = {m["name"]: m["last_location"] for m in message.get("members", [])}.get("alice")
+                    if location and location["lat"] == lat:
+                        latencies.append(time.perf_counter() - sent)
+                        break
+            check(len(latencies) == args.fixes, f"B's socket saw {len(latencies)}/{args.fixes} of A's fixes")
+
+            ended = a.post(f"/rooms/{room_id}/end", json={"member_id": alice["member_id"], "token": alice["token"]})
+            check(ended.status_code == 200, "host ends the room on A")
+            while True:
+                message = socket_b.receive_json()
+                if message.get("type") == "ended":
+                    break
+            print("ok   B's socket hears the room ended")
+
+        stats_a = a.get("/stats").json()
+
+    time.sleep(0.1)
+    check(not any(server.hashes), "room keys are gone from Redis")
+    while True:
+        message = listener.get_message()
+        if message is None:
+            break
+        if message["type"] == "message":
+            published.append(json.loads(message["data"]))
+    leaked = [event for event in published if "token" in event.get("member", {})]
+    check(published and not leaked, f"{len(published)} bus events, none carrying a member token")
+
+    if latencies:
+        latencies.sort()
+        print(f"A -> B fix latency: p50 {statistics.median(latencies) * 1000:.1f} ms, "
+              f"max {latencies[-1] * 1000:.1f} ms (broadcast window {os.environ['BROADCAST_INTERVAL_MS']} ms)")
+    print(f"redis writer on A: {stats_a['redis_writer']}")
+
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
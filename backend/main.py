@@ -6,26 +6,51 @@ Pretty straightforward - REST API for room management,
 WebSocket for live location updates.
 """
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Depends
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Depends, Request, Response, Query
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional, Dict, List
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, List, Literal
 import json
 import os
 from datetime import datetime, timedelta
 import asyncio
 import logging
+import time
 
 # Import custom modules
-from storage.memory import MemoryStore
+from storage.memory import MemoryStore, Member, Room
+from storage.redis_store import RedisStore, RedisWriter
+from storage.journal import RoomJournal
 from services.room_service import RoomService
-from services.ws_manager import ConnectionManager
+from services.ws_manager import Connection, ConnectionManager
+from services.broadcast_scheduler import BroadcastScheduler
+from services.snapshot import RoomSnapshotCache
+from services.delta import DeltaEncoder
+from services.expiry import ExpiryReaper
+from services.pubsub import LocalBus, RedisBus
+from services.wire import Deflater, decode_client_frame, negotiate
+from services.geo import GeoEngine, report_interval_ms, valid_coordinates
+from services.geofence import GeofenceEngine, MAX_FENCE_RADIUS_M
+from services.metrics import MetricsRegistry, LoopLagMonitor
+from services.interest import InterestFanout, parse_interest
+from services.longpoll import RoomWatchers
+from services.admission import AdmissionControl
+from services.timer_wheel import TimerWheel
+from services.ingest import IngestLimiter, INVALID, RATE, TOO_LARGE
+from services.recorder import TrafficRecorder
 from utils.ids import generate_room_id, generate_member_id, generate_token
-from utils.time import get_utc_now
+from utils.time import now_ts, to_iso
+from utils.logs import LogSampler, setup_logging
 
-# Basic logging setup
-logging.basicConfig(level=logging.INFO)
+# Logging goes through a queue - formatting and writes happen on a background thread
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))  # share of per-socket / per-fix lines logged (0..1)
+setup_logging(LOG_LEVEL)
 logger = logging.getLogger(__name__)
+# High-frequency lines, sampled separately so each keeps an even spread
+join_log_sampler = LogSampler(LOG_SAMPLE_RATE)
+socket_log_sampler = LogSampler(LOG_SAMPLE_RATE)
+fix_log_sampler = LogSampler(LOG_SAMPLE_RATE)
 
 # FastAPI app
 app = FastAPI(title="Tether", version="2.0.0")
@@ -33,9 +58,63 @@ app = FastAPI(title="Tether", version="2.0.0")
 # Environment variables
 FRONTEND_ORIGIN = os.getenv("FRONTEND_ORIGIN", "http://localhost:3000")
 ROOM_TTL_SECONDS = int(os.getenv("ROOM_TTL_SECONDS", "10800"))  # 3 hours default
+BROADCAST_INTERVAL_MS = int(os.getenv("BROADCAST_INTERVAL_MS", "500"))  # max one state frame per room per interval
+KEYFRAME_INTERVAL = int(os.getenv("KEYFRAME_INTERVAL", "20"))  # full state every N delta frames
+RESUME_HISTORY = int(os.getenv("RESUME_HISTORY", "64"))  # frames kept per room for reconnecting clients
+WS_ADMIT_RATE = float(os.getenv("WS_ADMIT_RATE", "50"))  # new sockets per second per worker, once the burst is used up
+WS_ADMIT_BURST = int(os.getenv("WS_ADMIT_BURST", "100"))
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "32"))  # outbound frames buffered per socket
+WS_OVERFLOW_POLICY = os.getenv("WS_OVERFLOW_POLICY", "drop_oldest")  # drop_oldest | latest_only | disconnect
+WS_DISCONNECT_THRESHOLD = int(os.getenv("WS_DISCONNECT_THRESHOLD", "100"))  # overflows before "disconnect" kicks in
+WS_INGEST_RATE = float(os.getenv("WS_INGEST_RATE", "20"))  # client frames per second per socket, after the burst
+WS_INGEST_BURST = int(os.getenv("WS_INGEST_BURST", "40"))
+WS_MAX_FRAME_BYTES = int(os.getenv("WS_MAX_FRAME_BYTES", "4096"))  # bigger client frames are refused unparsed
+WS_INGEST_MAX_VIOLATIONS = int(os.getenv("WS_INGEST_MAX_VIOLATIONS", "100"))  # refused frames (leaking 1/s) before a 1008 close
+WS_DEFLATE_MIN_BYTES = int(os.getenv("WS_DEFLATE_MIN_BYTES", "256"))  # tether.deflate: smaller frames go uncompressed
+WS_DEFLATE_LEVEL = int(os.getenv("WS_DEFLATE_LEVEL", "6"))  # zlib level 1 (fast) - 9 (small)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "memory")  # memory | redis (needed for multiple workers)
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+JOURNAL_DIR = os.getenv("JOURNAL_DIR", "")  # set to persist in-memory rooms across restarts
+JOURNAL_FSYNC_INTERVAL_MS = int(os.getenv("JOURNAL_FSYNC_INTERVAL_MS", "1000"))
+JOURNAL_COMPACT_RECORDS = int(os.getenv("JOURNAL_COMPACT_RECORDS", "200000"))  # snapshot after this many records
+LOCATION_BATCH_MAX = int(os.getenv("LOCATION_BATCH_MAX", "500"))  # max fixes per POST /rooms/{id}/locations
+TRAIL_CAPACITY = int(os.getenv("TRAIL_CAPACITY", "600"))  # fixes kept per member for the trail (24 bytes each)
+MOVEMENT_THRESHOLD_METERS = float(os.getenv("MOVEMENT_THRESHOLD_METERS", "10"))  # smaller moves = GPS jitter, not broadcast
+REPORT_INTERVAL_MIN_MS = int(os.getenv("REPORT_INTERVAL_MIN_MS", "1000"))  # advised client reporting interval range
+REPORT_INTERVAL_MAX_MS = int(os.getenv("REPORT_INTERVAL_MAX_MS", "8000"))  # keep below the 10s Live threshold
+STATUS_TICK_MS = int(os.getenv("STATUS_TICK_MS", "250"))  # resolution of the Live/Stale/Offline timers
+LOOP_LAG_INTERVAL_MS = int(os.getenv("LOOP_LAG_INTERVAL_MS", "500"))  # event loop lag sampling period (/metrics)
+STANDARD_ROOM_MAX_MEMBERS = 10
+EVENT_ROOM_MAX_MEMBERS = int(os.getenv("EVENT_ROOM_MAX_MEMBERS", "5000"))  # "event" rooms (festivals, marathons, convoys)
+EVENT_VIEW_RADIUS_METERS = float(os.getenv("EVENT_VIEW_RADIUS_METERS", "2000"))  # default interest area per socket
+EVENT_MAX_VISIBLE = int(os.getenv("EVENT_MAX_VISIBLE", "200"))  # most members one socket is sent (nearest first)
+EVENT_GRID_CELL_METERS = float(os.getenv("EVENT_GRID_CELL_METERS", "500"))
+LONG_POLL_MAX_SECONDS = float(os.getenv("LONG_POLL_MAX_SECONDS", "30"))  # longest GET /rooms/{id}?wait= hold
+ARRIVAL_RADIUS_METERS = float(os.getenv("ARRIVAL_RADIUS_METERS", "100"))  # inside this of the destination = arrived
+RECORD_TRAFFIC = os.getenv("RECORD_TRAFFIC", "")  # file to capture anonymized client traffic to (benchmarks/replay.py)
 
-logger.info(f"FRONTEND_ORIGIN: {FRONTEND_ORIGIN}")
-logger.info(f"ROOM_TTL_SECONDS: {ROOM_TTL_SECONDS}")
+logger.info("FRONTEND_ORIGIN: %s", FRONTEND_ORIGIN)
+logger.info("ROOM_TTL_SECONDS: %s", ROOM_TTL_SECONDS)
+logger.info("BROADCAST_INTERVAL_MS: %s", BROADCAST_INTERVAL_MS)
+logger.info("KEYFRAME_INTERVAL: %s (resume history %s)", KEYFRAME_INTERVAL, RESUME_HISTORY)
+logger.info("WS_ADMIT_RATE: %s/s (burst %s)", WS_ADMIT_RATE, WS_ADMIT_BURST)
+logger.info("WS_SEND_QUEUE_SIZE: %s (overflow: %s)", WS_SEND_QUEUE_SIZE, WS_OVERFLOW_POLICY)
+logger.info("WS_INGEST_RATE: %s/s (burst %s, max frame %s bytes)", WS_INGEST_RATE, WS_INGEST_BURST, WS_MAX_FRAME_BYTES)
+logger.info("WS_DEFLATE_MIN_BYTES: %s (level %s)", WS_DEFLATE_MIN_BYTES, WS_DEFLATE_LEVEL)
+logger.info("STORAGE_BACKEND: %s", STORAGE_BACKEND)
+logger.info("JOURNAL_DIR: %s", JOURNAL_DIR or '(disabled)')
+logger.info("LOCATION_BATCH_MAX: %s", LOCATION_BATCH_MAX)
+logger.info("TRAIL_CAPACITY: %s", TRAIL_CAPACITY)
+logger.info("MOVEMENT_THRESHOLD_METERS: %s", MOVEMENT_THRESHOLD_METERS)
+logger.info("REPORT_INTERVAL_MS: %s-%s", REPORT_INTERVAL_MIN_MS, REPORT_INTERVAL_MAX_MS)
+logger.info("STATUS_TICK_MS: %s", STATUS_TICK_MS)
+logger.info("LOOP_LAG_INTERVAL_MS: %s", LOOP_LAG_INTERVAL_MS)
+logger.info("LONG_POLL_MAX_SECONDS: %s", LONG_POLL_MAX_SECONDS)
+logger.info("ARRIVAL_RADIUS_METERS: %s", ARRIVAL_RADIUS_METERS)
+logger.info("EVENT_ROOM_MAX_MEMBERS: %s (radius %s m, max visible %s)",
+            EVENT_ROOM_MAX_MEMBERS, EVENT_VIEW_RADIUS_METERS, EVENT_MAX_VISIBLE)
+logger.info("RECORD_TRAFFIC: %s", RECORD_TRAFFIC or "(disabled)")
+logger.info("LOG_LEVEL: %s (sampling %s of per-socket / per-fix lines)", LOG_LEVEL, LOG_SAMPLE_RATE)
 
 # CORS - allow requests from frontend (including mobile access)
 app.add_middleware(
@@ -50,20 +129,128 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],  # so cross-origin pollers can read it for If-None-Match
 )
 
-# Initialize services - using in-memory storage for now
-store = MemoryStore()
-room_service = RoomService(store, ttl_seconds=ROOM_TTL_SECONDS)
-connection_manager = ConnectionManager()
+# Initialize services - in-memory storage by default, Redis + pub/sub to run several workers
+if STORAGE_BACKEND == "redis":
+    import redis  # only needed for multi-worker deployments
+    redis_client = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+    # One writer thread for store writes and bus events, so they reach Redis in order
+    redis_writer = RedisWriter(redis_client)
+    # Rooms created on other workers get pulled in lazily - track their expiry and member statuses too
+    store = RedisStore(redis_client, on_load=lambda room: track_room(room), writer=redis_writer)
+    event_bus = RedisBus(redis_client, writer=redis_writer)
+elif STORAGE_BACKEND == "memory":
+    journal = RoomJournal(
+        JOURNAL_DIR,
+        fsync_interval=JOURNAL_FSYNC_INTERVAL_MS / 1000,
+        compact_records=JOURNAL_COMPACT_RECORDS
+    ) if JOURNAL_DIR else None
+    # Rooms recovered from the journal get their member statuses and timers the first time they're fetched
+    store = MemoryStore(journal=journal, on_load=lambda room: room_service.track_room(room))
+    event_bus = LocalBus()
+    redis_writer = None
+else:
+    raise ValueError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND} (expected memory or redis)")
+
+metrics = MetricsRegistry()
+
+# Fires when a member crosses the Live/Stale/Offline thresholds - only that room gets a broadcast
+status_wheel = TimerWheel(tick_seconds=STATUS_TICK_MS / 1000)
+room_service = RoomService(
+    store,
+    ttl_seconds=ROOM_TTL_SECONDS,
+    bus=event_bus,
+    trail_capacity=TRAIL_CAPACITY,
+    movement_threshold_m=MOVEMENT_THRESHOLD_METERS,
+    status_wheel=status_wheel,
+    on_status_change=lambda room, member: broadcast_scheduler.mark_dirty(room.room_id)
+)
+connection_manager = ConnectionManager(
+    max_queue_size=WS_SEND_QUEUE_SIZE,
+    overflow_policy=WS_OVERFLOW_POLICY,
+    disconnect_threshold=WS_DISCONNECT_THRESHOLD,
+    metrics=metrics,
+    deflater=Deflater(level=WS_DEFLATE_LEVEL, min_bytes=WS_DEFLATE_MIN_BYTES)
+)
+snapshot_cache = RoomSnapshotCache(room_service)
+delta_encoder = DeltaEncoder(snapshot_cache, keyframe_interval=KEYFRAME_INTERVAL, history_size=RESUME_HISTORY)
+# Paces new sockets during reconnect storms
+admission = AdmissionControl(rate_per_sec=WS_ADMIT_RATE, burst=WS_ADMIT_BURST)
+# Event rooms: per-socket deltas, only members near each viewer
+interest_fanout = InterestFanout(
+    snapshot_cache,
+    connection_manager,
+    view_radius_m=EVENT_VIEW_RADIUS_METERS,
+    max_visible=EVENT_MAX_VISIBLE,
+    cell_m=EVENT_GRID_CELL_METERS
+)
+geo_engine = GeoEngine()
+# Long-polling GET /rooms/{id}?wait= requests, woken after each room broadcast
+room_watchers = RoomWatchers()
+# Arrived/left events for room destinations and waypoints, batched like geo_engine
+geofence_engine = GeofenceEngine(arrival_radius_m=ARRIVAL_RADIUS_METERS)
+# Flushes at most one state frame per room per interval (broadcast_room_state is defined below)
+broadcast_scheduler = BroadcastScheduler(
+    lambda room_id: broadcast_room_state(room_id),
+    interval_seconds=BROADCAST_INTERVAL_MS / 1000
+)
+# Evicts expired rooms in the background (expire_room is defined below)
+expiry_reaper = ExpiryReaper(lambda room_id: expire_room(room_id))
+# Opt-in capture of real traffic shapes for load testing - None unless RECORD_TRAFFIC is set
+recorder = TrafficRecorder(RECORD_TRAFFIC) if RECORD_TRAFFIC else None
+loop_lag_monitor = LoopLagMonitor(metrics, interval_seconds=LOOP_LAG_INTERVAL_MS / 1000)
+
+# Hot-path instruments - everything else is read from existing counters at scrape time
+inbound_messages = metrics.counter("tether_inbound_messages_total", "Client messages received, by type", ["type"])
+# Fixed label set - message types come from clients, so unknown ones all count as "other"
+inbound_by_type = {kind: inbound_messages.labels(kind)
+                   for kind in ("location", "ping", "resync", "viewport", "location_batch", "other")}
+inbound_rejected = metrics.counter("tether_inbound_rejected_total",
+                                   "Client frames refused (too big, over the rate, or unusable), by reason", ["reason"])
+inbound_rejected_by_reason = {reason: inbound_rejected.labels(reason) for reason in (RATE, TOO_LARGE, INVALID)}
+broadcast_build_seconds = metrics.histogram("tether_broadcast_build_seconds",
+                                            "Time to build one room broadcast (geo refresh + delta encode)")
+metrics.gauge("tether_rooms", "Rooms held by this worker", fn=store.room_count)
+metrics.gauge("tether_long_poll_waiting", "GET /rooms/{id}?wait= requests being held",
+              fn=lambda: room_watchers.waiting)
+metrics.gauge("tether_members", "Members in rooms held by this worker",
+              fn=lambda: sum(len(room.members) for room in store.rooms.values()))
+metrics.counter("tether_keyframes_sent_total", "Keyframes built", fn=lambda: delta_encoder.keyframes_sent)
+metrics.counter("tether_deltas_sent_total", "Delta frames built", fn=lambda: delta_encoder.deltas_sent)
+metrics.counter("tether_ws_resumes_total", "Reconnects served from the frame history", fn=lambda: delta_encoder.resumes)
+metrics.counter("tether_ws_resume_misses_total", "Resume tokens that needed a keyframe instead",
+                fn=lambda: delta_encoder.resume_misses)
+metrics.counter("tether_ws_admission_rejected_total", "Sockets turned away by admission control",
+                fn=lambda: admission.rejected)
+metrics.counter("tether_status_changes_total", "Member Live/Stale/Offline transitions",
+                fn=lambda: room_service.status_changes)
+metrics.counter("tether_log_lines_sampled_out_total", "High-frequency log lines skipped by LOG_SAMPLE_RATE",
+                fn=lambda: join_log_sampler.suppressed + socket_log_sampler.suppressed + fix_log_sampler.suppressed)
+metrics.counter("tether_fixes_applied_total", "Location fixes applied", fn=lambda: room_service.fixes_applied)
+metrics.counter("tether_geofence_arrivals_total", "Members arriving at a destination or waypoint",
+                fn=lambda: geofence_engine.arrivals)
+metrics.counter("tether_geofence_departures_total", "Members leaving a destination or waypoint",
+                fn=lambda: geofence_engine.departures)
+metrics.counter("tether_fixes_deadbanded_total", "Location fixes inside the movement dead-band",
+                fn=lambda: room_service.fixes_deadbanded)
 
 # ============= Pydantic Models =============
 
+class Waypoint(BaseModel):
+    name: str
+    lat: float = Field(ge=-90, le=90)
+    lng: float = Field(ge=-180, le=180)
+    radius_m: float = Field(default=100, gt=0, le=MAX_FENCE_RADIUS_M)
+
 class CreateRoomRequest(BaseModel):
     destination_name: str
     destination_lat: float
     destination_lng: float
     duration_minutes: Optional[int] = 180
+    mode: Literal["standard", "event"] = "standard"  # event = large room, members only see who's near them
+    waypoints: List[Waypoint] = Field(default_factory=list, max_length=20)  # extra arrived/left geofences
 
 class JoinRoomRequest(BaseModel):
     name: str
@@ -72,6 +259,18 @@ class EndRoomRequest(BaseModel):
     member_id: str
     token: str
 
+class LocationFix(BaseModel):
+    lat: float = Field(ge=-90, le=90)
+    lng: float = Field(ge=-180, le=180)
+    ts: float = Field(gt=0)  # epoch milliseconds (Date.now()) when the fix was taken
+
+class LocationBatchRequest(BaseModel):
+    member_id: str
+    token: str
+    # Every fix's bounds are checked while the body is parsed -
+    # one bad fix rejects the batch (422) before anything is applied
+    fixes: List[LocationFix] = Field(min_length=1, max_length=LOCATION_BATCH_MAX)
+
 # ============= REST Endpoints =============
 
 @app.get("/")
@@ -97,21 +296,28 @@ async def create_room(req: CreateRoomRequest):
             destination_name=req.destination_name,
             destination_lat=req.destination_lat,
             destination_lng=req.destination_lng,
-            duration_minutes=req.duration_minutes
+            duration_minutes=req.duration_minutes,
+            mode=req.mode,
+            waypoints=tuple((wp.name, wp.lat, wp.lng, wp.radius_m) for wp in req.waypoints)
         )
         
+        expiry_reaper.track(room_id, room.expires_at)
+        if recorder:
+            recorder.room_created(room)
+        
         invite_link = f"{FRONTEND_ORIGIN}?room={room_id}"
         
-        logger.info(f"Room created: {room_id}")
+        logger.info("Room created: %s", room_id)
         
         return {
             "room_id": room_id,
             "destination_name": req.destination_name,
             "invite_link": invite_link,
-            "expires_at": room.expires_at.isoformat()
+            "mode": room.mode,
+            "expires_at": to_iso(room.expires_at)
         }
     except Exception as e:
-        logger.error(f"Error creating room: {e}")
+        logger.error("Error creating room: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/rooms/{room_id}/join")
@@ -132,8 +338,9 @@ async def join_room(room_id: str, req: JoinRoomRequest):
             raise HTTPException(status_code=410, detail="Room has expired")
         
         # Check member cap
-        if len(room.members) >= 10:
-            raise HTTPException(status_code=409, detail="Room is full (max 10 members)")
+        max_members = EVENT_ROOM_MAX_MEMBERS if room.mode == "event" else STANDARD_ROOM_MAX_MEMBERS
+        if len(room.members) >= max_members:
+            raise HTTPException(status_code=409, detail=f"Room is full (max {max_members} members)")
         
         # Create member
         member_id = generate_member_id()
@@ -148,9 +355,13 @@ async def join_room(room_id: str, req: JoinRoomRequest):
         
         # Set host if first member
         if len(room.members) == 1:
-            room.host_member_id = member_id
+            room_service.set_host(room, member_id)
+        room_watchers.notify(room_id)  # a new member changes the REST doc - wake long-pollers
+        if recorder:
+            recorder.joined(room, room.members[member_id])
         
-        logger.info(f"Member {member_id} ({req.name}) joined room {room_id}")
+        if join_log_sampler():
+            logger.info("Member %s (%s) joined room %s", member_id, req.name, room_id)
         
         return {
             "member_id": member_id,
@@ -160,55 +371,54 @@ async def join_room(room_id: str, req: JoinRoomRequest):
     except HTTPException as e:
         raise
     except Exception as e:
-        logger.error(f"Error joining room: {e}")
+        logger.error("Error joining room: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/rooms/{room_id}")
-async def get_room(room_id: str):
+async def get_room(room_id: str, request: Request,
+                   wait: float = Query(0, ge=0, le=LONG_POLL_MAX_SECONDS)):
     """
     Get room state (destination, members, expiry).
+
+    Comes with an ETag - send it back as If-None-Match and you get a 304
+    while nothing changed. Add ?wait=N (seconds) to long-poll: if your
+    copy is current the request is held until the room changes (200)
+    or N seconds pass (304).
     """
     try:
-        room = room_service.get_room(room_id)
-        if not room:
-            raise HTTPException(status_code=404, detail="Room not found")
-        
-        # Check expiry
-        if room_service.is_room_expired(room_id):
-            raise HTTPException(status_code=410, detail="Room has expired")
-        
-        members_data = []
-        for member in room.members.values():
-            status = room_service.get_member_status(member.last_updated)
-            members_data.append({
-                "member_id": member.member_id,
-                "name": member.name,
-                "initials": member.name[0].upper() if member.name else "?",
-                "last_location": {
-                    "lat": member.last_location[0],
-                    "lng": member.last_location[1]
-                } if member.last_location else None,
-                "last_updated": member.last_updated.isoformat() if member.last_updated else None,
-                "status": status,
-                "is_connected": member.is_connected
-            })
-        
-        return {
-            "room_id": room_id,
-            "destination": {
-                "name": room.destination_name,
-                "lat": room.destination_lat,
-                "lng": room.destination_lng
-            },
-            "members_count": len(room.members),
-            "members": members_data,
-            "expires_at": room.expires_at.isoformat(),
-            "host_member_id": room.host_member_id
-        }
+        if recorder:
+            room = room_service.get_room(room_id)
+            if room:
+                recorder.polled(room, wait)
+        if_none_match = request.headers.get("if-none-match")
+        deadline = time.monotonic() + wait
+        while True:
+            room = room_service.get_room(room_id)
+            if not room:
+                raise HTTPException(status_code=404, detail="Room not found")
+
+            # Check expiry
+            if room_service.is_room_expired(room_id):
+                raise HTTPException(status_code=410, detail="Room has expired")
+
+            # Client's copy is current - no rebuild needed to tell them so
+            etag = snapshot_cache.room_etag(room)
+            if etag is None or if_none_match != etag:
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+            await room_watchers.wait(room_id, remaining)
+
+        # Same cached bytes for every poller until the room changes
+        etag, body = snapshot_cache.room_document(room)
+        return Response(content=body, media_type="application/json",
+                        headers={"ETag": etag, "Cache-Control": "no-cache"})
     except HTTPException as e:
         raise
     except Exception as e:
-        logger.error(f"Error getting room: {e}")
+        logger.error("Error getting room: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/rooms/{room_id}/end")
@@ -230,27 +440,122 @@ async def end_room(room_id: str, req: EndRoomRequest):
         if not member or member.token != req.token:
             raise HTTPException(status_code=401, detail="Invalid token")
         
-        # Broadcast room end to all connected members
-        await connection_manager.broadcast_to_room(
-            room_id=room_id,
-            message=json.dumps({
-                "type": "ended",
-                "reason": "host_ended"
-            })
-        )
-        
-        # Remove room
-        room_service.remove_room(room_id)
+        # Broadcast room end to all connected members and remove room
+        await close_room(room_id, reason="host_ended")
         
-        logger.info(f"Room {room_id} ended by host {req.member_id}")
+        logger.info("Room %s ended by host %s", room_id, req.member_id)
         
         return {"status": "Room ended"}
     except HTTPException as e:
         raise
     except Exception as e:
-        logger.error(f"Error ending room: {e}")
+        logger.error("Error ending room: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/rooms/{room_id}/locations")
+async def post_locations(room_id: str, req: LocationBatchRequest):
+    """
+    Batched location ingest for clients that were backgrounded or offline.
+
+    Only the newest fix is applied (older ones are history by now),
+    and the room gets a single broadcast for the whole batch.
+    """
+    try:
+        room = room_service.get_room(room_id)
+        if not room:
+            raise HTTPException(status_code=404, detail="Room not found")
+
+        # Check if room is expired
+        if room_service.is_room_expired(room_id):
+            raise HTTPException(status_code=410, detail="Room has expired")
+
+        member = room.members.get(req.member_id)
+        if not member or member.token != req.token:
+            raise HTTPException(status_code=401, detail="Invalid token")
+
+        inbound_by_type["location_batch"].inc()
+        fixes = sorted(req.fixes, key=lambda fix: fix.ts)
+        if recorder:
+            recorder.batch(room, member, [(fix.ts / 1000, fix.lat, fix.lng) for fix in fixes])
+        newest = fixes[-1]
+        # Phone clocks drift - never let a fix claim to be from the future
+        now = now_ts()
+        taken_at = min(newest.ts / 1000, now)
+
+        # The older fixes are still worth keeping as history
+        for fix in fixes[:-1]:
+            room_service.record_fix(member, min(fix.ts / 1000, now), fix.lat, fix.lng)
+
+        # A fix that already arrived over the socket may be newer than the whole batch,
+        # and one that barely moved is dead-banded - neither counts as applied
+        newer = member.lat is None or member.last_updated is None or taken_at > member.last_updated
+        applied = newer and room_service.update_location(room, member, newest.lat, newest.lng, updated_at=taken_at)
+        if applied:
+            geo_engine.mark(room)
+            geofence_engine.mark(room)
+            broadcast_scheduler.mark_dirty(room_id)
+
+        return {
+            "accepted": len(req.fixes),
+            "applied": applied,
+            "report_interval_ms": report_interval_ms(
+                member.geo, MOVEMENT_THRESHOLD_METERS, REPORT_INTERVAL_MIN_MS, REPORT_INTERVAL_MAX_MS,
+                arrived=geofence_engine.arrived(member)
+            )
+        }
+    except HTTPException as e:
+        raise
+    except Exception as e:
+        logger.error("Error ingesting location batch: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/rooms/{room_id}/members/{member_id}/trail")
+async def get_member_trail(room_id: str, member_id: str, tolerance_m: float = Query(10.0, ge=0, le=10_000)):
+    """
+    Where a member has been - their recent fixes as a polyline,
+    Douglas-Peucker simplified to tolerance_m (0 = every point).
+    """
+    room = room_service.get_room(room_id)
+    if not room:
+        raise HTTPException(status_code=404, detail="Room not found")
+
+    member = room.members.get(member_id)
+    if not member:
+        raise HTTPException(status_code=404, detail="Member not found")
+
+    return Response(content=snapshot_cache.trail_document(room, member, tolerance_m), media_type="application/json")
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Prometheus text format - counters, histograms and gauges (services/metrics.py).
+    """
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/stats")
+async def get_stats():
+    """
+    Internal counters (snapshot cache hit/miss, delta stream, send queues).
+    """
+    return {
+        "snapshot_cache": snapshot_cache.stats(),
+        "delta_stream": delta_encoder.stats(),
+        "admission": admission.stats(),
+        "event_fanout": interest_fanout.stats(),
+        "geo": geo_engine.stats(),
+        "geofence": geofence_engine.stats(),
+        "long_poll": room_watchers.stats(),
+        "liveness": {**status_wheel.stats(), "status_changes": room_service.status_changes},
+        "movement": {"applied": room_service.fixes_applied, "deadbanded": room_service.fixes_deadbanded},
+        "expiry": {"pending": expiry_reaper.pending(), "rooms": store.room_count()},
+        "event_bus": event_bus.stats(),
+        "redis_writer": redis_writer.stats() if redis_writer else None,
+        "deflate": connection_manager.deflater.stats(),
+        "recorder": recorder.stats() if recorder else None,
+        "journal": store.journal.stats() if isinstance(store, MemoryStore) and store.journal else None,
+        "connections": connection_manager.connection_stats()
+    }
+
 # ============= WebSocket Endpoint =============
 
 @app.websocket("/ws/rooms/{room_id}")
@@ -258,7 +563,8 @@ async def websocket_endpoint(websocket: WebSocket, room_id: str):
     """
     WebSocket endpoint for real-time location sharing.
     
-    Query params: member_id, token
+    Query params: member_id, token, and resume ("epoch.seq" from the
+    previous socket) to get only the frames missed while reconnecting.
     """
     # Extract query params
     member_id = websocket.query_params.get("member_id")
@@ -279,58 +585,219 @@ async def websocket_endpoint(websocket: WebSocket, room_id: str):
         await websocket.close(code=1008, reason="Invalid token")
         return
     
-    # Accept connection
-    await websocket.accept()
-    await connection_manager.connect(room_id, member_id, websocket)
+    # Accept connection - binary / deflated wire format only if the client asked for it
+    protocol = negotiate(websocket.scope.get("subprotocols", []))
+    await websocket.accept(subprotocol=protocol)
     
-    logger.info(f"WebSocket connected: {member_id} in room {room_id}")
+    # Reconnect storm - tell the client when to come back (jittered) instead of taking it on now
+    retry_after = admission.try_admit()
+    if retry_after is not None:
+        retry_after_ms = int(retry_after * 1000)
+        await websocket.send_text(json.dumps({"type": "retry", "retry_after_ms": retry_after_ms}))
+        await websocket.close(code=1013, reason=f"retry_after_ms={retry_after_ms}")
+        return
+    
+    await connection_manager.connect(room_id, member_id, websocket, protocol=protocol)
+    connection = connection_manager.get_connection(room_id, member_id)
     
     # Mark member as connected
-    member.is_connected = True
+    room_service.set_connected(room, member, True)
+    
+    # Resuming socket: replay what it missed, to it alone. Event rooms keep
+    # per-socket streams that don't survive the socket, so those always get a keyframe.
+    missed = delta_encoder.resume(room, websocket.query_params.get("resume")) if room.mode == "standard" else None
+    connection_manager.send(connection, json.dumps({
+        "type": "session", "epoch": delta_encoder.epoch, "resumed": missed is not None
+    }), control=True)
+    if recorder:
+        recorder.connected(room, member, protocol, resumed=missed is not None)
+    if socket_log_sampler():
+        if missed is not None:
+            logger.info("WebSocket connected: %s in room %s (resumed, %d frames)", member_id, room_id, len(missed))
+        else:
+            logger.info("WebSocket connected: %s in room %s", member_id, room_id)
+    
+    if missed is not None:
+        for frame in missed:
+            connection_manager.send(connection, frame)
+        room_watchers.notify(room_id)  # is_connected changed - nothing for the other sockets
+    else:
+        # Keyframe for the new socket, everyone else catches up via the next delta
+        await send_keyframe(room, member_id)
+        broadcast_scheduler.mark_dirty(room_id)
+    member.report_interval_ms = None  # new socket - tell it how often to report
+    await advise_report_interval(room_id, member)
     
-    # Broadcast initial state
-    await broadcast_room_state(room_id)
+    # Every frame can end in a room broadcast - one client mustn't get to flood the loop
+    limiter = IngestLimiter(
+        rate_per_sec=WS_INGEST_RATE,
+        burst=WS_INGEST_BURST,
+        max_frame_bytes=WS_MAX_FRAME_BYTES,
+        max_violations=WS_INGEST_MAX_VIOLATIONS
+    )
+    disconnect_reason = "client"
     
     try:
         while True:
-            # Receive message from client
-            data = await websocket.receive_text()
-            message = json.loads(data)
+            # Receive message from client (JSON text, or a binary frame)
+            data = await websocket.receive()
+            if data["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(data.get("code", 1000))
             
+            # Size and rate are checked before parsing anything
+            payload = data.get("bytes")
+            if payload is None:
+                payload = data.get("text") or ""
+                # The limit is in bytes on the wire - only non-ASCII text needs encoding to count them
+                size = len(payload) if payload.isascii() else len(payload.encode())
+            else:
+                size = len(payload)
+            refused = limiter.check(size)
+            if refused:
+                inbound_rejected_by_reason[refused].inc()
+            if limiter.over_limit:
+                logger.warning("Closing %s in room %s: kept exceeding inbound limits", member_id, room_id)
+                disconnect_reason = "rate_limited"
+                await websocket.close(code=1008, reason="Rate limit exceeded")
+                raise WebSocketDisconnect(1008)
+            if refused:
+                continue
+            
+            if isinstance(payload, bytes):
+                message = decode_client_frame(payload)
+            else:
+                message = json.loads(payload)
+            
+            inbound_by_type.get(str(message.get("type")), inbound_by_type["other"]).inc()
             if message.get("type") == "location":
                 # Update member location
                 lat = message.get("lat")
                 lng = message.get("lng")
                 
                 if lat is not None and lng is not None:
-                    member.last_location = (lat, lng)
-                    member.last_updated = get_utc_now()
-                    logger.debug(f"Location update: {member_id} -> ({lat}, {lng})")
+                    # Nothing downstream (geo batch, geofences, journal, recorder) copes with junk
+                    if not valid_coordinates(lat, lng):
+                        inbound_rejected_by_reason[INVALID].inc()
+                        limiter.strike()  # counts towards the 1008 close like a refused frame
+                        continue
+                    if recorder:
+                        recorder.location(room, member, lat, lng)
+                    moved = room_service.update_location(room, member, lat, lng)
+                    await advise_report_interval(room_id, member)
+                    if not moved:
+                        continue  # jitter inside the dead-band - nothing to broadcast
+                    geo_engine.mark(room)
+                    geofence_engine.mark(room)
+                    if logger.isEnabledFor(logging.DEBUG) and fix_log_sampler():
+                        logger.debug("Location update: %s -> (%s, %s)", member_id, lat, lng)
             
             elif message.get("type") == "ping":
-                # Keep-alive
-                member.last_updated = get_utc_now()
+                # Keep-alive - only re-arms the liveness timer (a Stale -> Live flip broadcasts by itself)
+                room_service.touch_member(room, member)
+                if recorder:
+                    recorder.ping(room, member)
+                continue
+            
+            elif message.get("type") == "resync":
+                # Client spotted a seq gap - send it a fresh keyframe
+                if recorder:
+                    recorder.resync(room, member)
+                await send_keyframe(room, member_id)
+                continue
+            
+            elif message.get("type") == "viewport":
+                # Event rooms: what part of the map this socket wants members for
+                connection = connection_manager.get_connection(room_id, member_id)
+                if room.mode == "event" and connection:
+                    try:
+                        connection.interest = parse_interest(message)
+                    except (TypeError, ValueError) as e:
+                        logger.debug("Ignoring bad viewport from %s: %s", member_id, e)
+                        continue
+                    interest_fanout.refresh(room, connection)
+                    if recorder:
+                        recorder.viewport(room, member, connection.interest)
+                continue
             
-            # Broadcast updated state to all in room
-            await broadcast_room_state(room_id)
+            # Queue a (coalesced) state broadcast for the room
+            broadcast_scheduler.mark_dirty(room_id)
     
     except WebSocketDisconnect:
-        logger.info(f"WebSocket disconnected: {member_id}")
-        member.is_connected = False
-        connection_manager.disconnect(room_id, member_id)  # Synchronous method
-        
-        # Broadcast updated state
-        await broadcast_room_state(room_id)
+        if socket_log_sampler():
+            logger.info("WebSocket disconnected: %s", member_id)
+        connection_manager.disconnects.labels(disconnect_reason).inc()
+        socket_closed(room, member, connection)
     
     except Exception as e:
-        logger.error(f"WebSocket error: {e}")
-        connection_manager.disconnect(room_id, member_id)  # Synchronous method
+        logger.error("WebSocket error: %s", e)
+        connection_manager.disconnects.labels("error").inc()
+        socket_closed(room, member, connection)
 
 # ============= Helper Functions =============
 
+def socket_closed(room: Room, member: Member, connection: Connection):
+    """
+    Clean up after a member's socket ends. If a reconnect has already
+    replaced it, the member is still connected - only the old socket goes.
+    """
+    # Not for a room that just ended - that would bring back the aliases recorder.ended dropped
+    if recorder and store.local_room(room.room_id) is room:
+        recorder.disconnected(room, member)
+    current = connection_manager.get_connection(room.room_id, member.member_id)
+    connection_manager.disconnect(room.room_id, member.member_id, connection.websocket)
+    if current is not None and current is not connection:
+        return
+    room_service.set_connected(room, member, False)
+    # Broadcast updated state
+    broadcast_scheduler.mark_dirty(room.room_id)
+
+async def advise_report_interval(room_id: str, member: Member):
+    """
+    Tell a member's client how often to send fixes, when that changes.
+    Based on the speed/distance from the last geo tick (services.geo),
+    and whether they've arrived (services.geofence).
+    """
+    interval = report_interval_ms(member.geo, MOVEMENT_THRESHOLD_METERS, REPORT_INTERVAL_MIN_MS, REPORT_INTERVAL_MAX_MS,
+                                  arrived=geofence_engine.arrived(member))
+    if interval == member.report_interval_ms:
+        return
+    member.report_interval_ms = interval
+    await connection_manager.send_to_member(
+        room_id, member.member_id, json.dumps({"type": "advice", "report_interval_ms": interval}), control=True
+    )
+
+async def send_geofence_events(events: List[dict]):
+    """
+    Arrived/left events from a geofence tick - can cover several rooms.
+    Standard rooms see everyone's, event rooms only tell the member themselves.
+    """
+    for event in events:
+        room_id, member_id = event["room_id"], event["member_id"]
+        room = room_service.get_room(room_id)
+        if not room:
+            continue
+        message = json.dumps({"type": "geofence", **event})
+        if room.mode == "event":
+            await connection_manager.send_to_member(room_id, member_id, message, control=True)
+        else:
+            await connection_manager.broadcast_to_room(room_id=room_id, message=message, control=True)
+        # Arriving (or leaving again) changes how often they should report
+        member = room.members.get(member_id)
+        if member and event["fence"]["kind"] == "destination":
+            await advise_report_interval(room_id, member)
+
+async def send_keyframe(room: Room, member_id: str):
+    """Full state to one socket (join / resync) - filtered to its viewport in event rooms"""
+    if room.mode == "event":
+        connection = connection_manager.get_connection(room.room_id, member_id)
+        if connection:
+            connection_manager.send(connection, interest_fanout.keyframe(room, connection))
+        return
+    await connection_manager.send_to_member(room.room_id, member_id, delta_encoder.keyframe(room))
+
 async def broadcast_room_state(room_id: str):
     """
-    Broadcast current room state to all connected members.
+    Broadcast room changes (delta, or a periodic keyframe) to all connected members.
     """
     try:
         room = room_service.get_room(room_id)
@@ -339,63 +806,165 @@ async def broadcast_room_state(room_id: str):
         
         # Check if room expired
         if room_service.is_room_expired(room_id):
-            await connection_manager.broadcast_to_room(
-                room_id=room_id,
-                message=json.dumps({
-                    "type": "ended",
-                    "reason": "expired"
-                })
-            )
-            room_service.remove_room(room_id)
+            await close_room(room_id, reason="expired")
             return
         
-        # Build members state
-        members_data = []
-        for member in room.members.values():
-            status = room_service.get_member_status(member.last_updated)
-            members_data.append({
-                "member_id": member.member_id,
-                "name": member.name,
-                "initials": member.name[0].upper() if member.name else "?",
-                "last_location": {
-                    "lat": member.last_location[0],
-                    "lng": member.last_location[1]
-                } if member.last_location else None,
-                "last_updated_ago_secs": int((get_utc_now() - member.last_updated).total_seconds()) if member.last_updated else None,
-                "status": status
-            })
-        
-        state_message = {
-            "type": "state",
-            "room_id": room_id,
-            "destination": {
-                "name": room.destination_name,
-                "lat": room.destination_lat,
-                "lng": room.destination_lng
-            },
-            "expires_at": room.expires_at.isoformat(),
-            "members": members_data
-        }
+        # Distance/ETA and geofence checks for this room and any other room with
+        # new fixes in one array pass each, then the delta (or periodic keyframe) - serialized once, shared by every socket
+        started = time.perf_counter()
+        geo_engine.refresh(room)
+        events = geofence_engine.refresh(room)
+        if events:
+            await send_geofence_events(events)
+        if room.mode == "event":
+            # One delta per socket, each covering only what that socket can see
+            interest_fanout.broadcast(room)
+            broadcast_build_seconds.observe(time.perf_counter() - started)
+            room_watchers.notify(room_id)
+            return
+        frame = delta_encoder.next_frame(room)
+        broadcast_build_seconds.observe(time.perf_counter() - started)
+        room_watchers.notify(room_id)  # long-pollers re-check their ETag
+        if frame is None:
+            return
         
         await connection_manager.broadcast_to_room(
             room_id=room_id,
-            message=json.dumps(state_message)
+            message=frame
         )
     
     except Exception as e:
-        logger.error(f"Error broadcasting room state: {e}")
+        logger.error("Error broadcasting room state: %s", e)
+
+async def close_room(room_id: str, reason: str):
+    """
+    Tell connected members the room is over, then drop it everywhere
+    (store, pending broadcasts, open sockets, other workers).
+    """
+    await end_local_sessions(room_id, reason)
+    room_service.remove_room(room_id, reason=reason)
+
+async def end_local_sessions(room_id: str, reason: str):
+    """
+    Send "ended" to the sockets this process holds for a room and close them.
+    """
+    room = store.local_room(room_id)
+    if room:
+        room_service.untrack_room(room)
+        # Here rather than in close_room - rooms ended on another worker need their aliases dropped too
+        if recorder:
+            recorder.ended(room)
+    await connection_manager.broadcast_to_room(
+        room_id=room_id,
+        message=json.dumps({
+            "type": "ended",
+            "reason": reason
+        }),
+        control=True
+    )
+    connection_manager.close_room(room_id)
+    broadcast_scheduler.forget(room_id)
+    geo_engine.forget(room_id)
+    geofence_engine.forget(room_id)
+    room_watchers.notify(room_id)  # long-pollers get their 404
+
+async def expire_room(room_id: str):
+    """
+    Called by the expiry reaper when a room's deadline passes.
+    """
+    # Room may already be gone (host ended it) - nothing to do then
+    if not room_service.get_room(room_id) or not room_service.is_room_expired(room_id):
+        return
+    
+    await close_room(room_id, reason="expired")
+    logger.info("Room %s expired", room_id)
+
+async def handle_bus_event(event: dict):
+    """
+    Apply a change made on another worker and push it to our sockets.
+    """
+    kind = event.get("kind")
+    room_id = event.get("room_id")
+    
+    if kind == "member":
+        update = Member.from_dict(event["member"])
+        local = store.local_room(room_id)
+        existing = local.members.get(update.member_id) if local else None
+        before = (existing.name, existing.lat, existing.lng, existing.is_connected) if existing else None
+        room = store.apply_member(room_id, update)
+        if room:
+            member = room.members[update.member_id]
+            # Status flips broadcast through on_status_change
+            room_service.refresh_status(room, member)
+            if before == (member.name, member.lat, member.lng, member.is_connected):
+                return  # just a keep-alive - nothing to send
+            geo_engine.mark(room)
+            geofence_engine.mark(room)
+            if member.lat is not None and member.last_updated:
+                room_service.record_fix(member, member.last_updated, member.lat, member.lng)
+    elif kind == "room":
+        room = store.apply_room(room_id, event.get("host_member_id"))
+    elif kind == "room_removed":
+        await end_local_sessions(room_id, event.get("reason", "removed"))
+        store.evict(room_id)
+        return
+    else:
+        return
+    
+    if room:
+        broadcast_scheduler.mark_dirty(room_id)
+
+event_bus.set_handler(handle_bus_event)
+
+def track_room(room: Room):
+    """A room that didn't come in through create_room here (journal recovery, another worker)"""
+    expiry_reaper.track(room.room_id, room.expires_at)
+    room_service.track_room(room)
 
 # ============= Startup/Shutdown =============
 
 @app.on_event("startup")
 async def startup_event():
     logger.info("Tether backend started")
-    logger.info(f"CORS allowed origin: {FRONTEND_ORIGIN}")
+    logger.info("CORS allowed origin: %s", FRONTEND_ORIGIN)
+    
+    # Rebuild rooms from the journal before serving anything
+    if isinstance(store, MemoryStore) and store.journal:
+        started = time.perf_counter()
+        count = store.recover()
+        store.journal.start()
+        logger.info("Recovered %s rooms from journal in %.0f ms", count, (time.perf_counter() - started) * 1000)
+        # Their expiries go in right after startup, not before it (until then
+        # expiry is still checked per request). Statuses and timers: see on_load.
+        asyncio.get_running_loop().call_soon(lambda: expiry_reaper.track_many(
+            (room.expires_at, room.room_id) for room in list(store.rooms.values())))
+    
+    expiry_reaper.start()
+    status_wheel.start()
+    if redis_writer:
+        redis_writer.start()
+    event_bus.start()
+    loop_lag_monitor.start()
+    if recorder:
+        recorder.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Tether backend shutting down")
+    await loop_lag_monitor.stop()
+    await event_bus.stop()
+    if redis_writer:
+        await asyncio.to_thread(redis_writer.stop)
+    await expiry_reaper.stop()
+    await status_wheel.stop()
+    await broadcast_scheduler.stop()
+    await connection_manager.stop()
+    if isinstance(store, MemoryStore) and store.journal:
+        await asyncio.to_thread(store.journal.stop)
+    if recorder:
+        await asyncio.to_thread(recorder.stop)
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # The server itself won't buffer client messages over the limit (uvicorn --ws-max-size)
+    uvicorn.run(app, host="0.0.0.0", port=8000, ws_max_size=WS_MAX_FRAME_BYTES)
@@ -0,0 +1,53 @@
+import random
+import time
+from typing import Optional
+
+class AdmissionControl:
+    """
+    Token bucket for new WebSocket connections on this worker.
+
+    Normally invisible: burst connections can open at once, refilled at
+    rate_per_sec. During a reconnect storm (tower handoff, deploy) the
+    bucket runs dry and try_admit() returns how long the client should
+    wait instead. Rejections pile up in a backlog that drains at
+    rate_per_sec, and each hint is a random slot within it (backlog/rate
+    seconds), so rejected clients come back at the pace we can take them
+    rather than all together.
+    """
+
+    def __init__(self, rate_per_sec: float = 50, burst: int = 100, max_retry_seconds: float = 30):
+        self.rate_per_sec = rate_per_sec
+        self.burst = burst
+        self.max_retry_seconds = max_retry_seconds
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.backlog = 0.0  # rejected clients we expect back, drains at rate_per_sec
+        self.admitted = 0
+        self.rejected = 0
+
+    def try_admit(self) -> Optional[float]:
+        """None if the connection can go ahead, otherwise a retry hint in seconds"""
+        now = time.monotonic()
+        refill = (now - self.updated) * self.rate_per_sec
+        self.tokens = min(self.burst, self.tokens + refill)
+        self.backlog = max(self.backlog - refill, 0.0)
+        self.updated = now
+
+        if self.tokens >= 1:
+            self.tokens -= 1
+            self.admitted += 1
+            return None
+
+        self.rejected += 1
+        self.backlog += 1
+        # Time until the next token, plus a random slot among everyone waiting
+        wait = (1 - self.tokens) / self.rate_per_sec
+        return min(wait + random.uniform(0, self.backlog / self.rate_per_sec), self.max_retry_seconds)
+
+    def stats(self) -> dict:
+        return {
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "tokens": round(self.tokens, 1),
+            "backlog": round(self.backlog, 1)
+        }
@@ -0,0 +1,53 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Set
+
+class BroadcastScheduler:
+    """
+    Coalesces room broadcasts.
+
+    Instead of pushing a full state frame after every inbound message,
+    callers mark a room dirty and we flush it at most once per interval.
+    The first change after a quiet period goes out right away, anything
+    arriving during the cooldown gets folded into one trailing flush.
+    Rooms with no changes don't send anything.
+    """
+
+    def __init__(self, flush: Callable[[str], Awaitable[None]], interval_seconds: float = 0.5):
+        self.flush = flush
+        self.interval_seconds = interval_seconds
+        self._dirty: Set[str] = set()
+        self._tasks: Dict[str, asyncio.Task] = {}
+        # Structure: {room_id: flush task} - only rooms with pending or recent changes
+
+    def mark_dirty(self, room_id: str):
+        """Schedule a flush for this room (no-op if one is already pending)"""
+        self._dirty.add(room_id)
+        if room_id not in self._tasks:
+            self._tasks[room_id] = asyncio.create_task(self._run(room_id))
+
+    def forget(self, room_id: str):
+        """Drop any pending flush for a room that no longer exists"""
+        self._dirty.discard(room_id)
+        task = self._tasks.pop(room_id, None)
+        if task and task is not asyncio.current_task():
+            task.cancel()
+
+    async def stop(self):
+        """Cancel all pending flushes (used on shutdown)"""
+        tasks = list(self._tasks.values())
+        self._tasks.clear()
+        self._dirty.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, room_id: str):
+        try:
+            while room_id in self._dirty:
+                self._dirty.discard(room_id)
+                await self.flush(room_id)
+                # Cooldown - changes during this window get coalesced
+                await asyncio.sleep(self.interval_seconds)
+        finally:
+            if self._tasks.get(room_id) is asyncio.current_task():
+                del self._tasks[room_id]
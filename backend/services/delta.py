@@ -0,0 +1,129 @@
+import secrets
+from collections import deque
+from typing import List, Optional, Union
+from storage.memory import Room
+from services.snapshot import RoomSnapshotCache
+from services.wire import Frame, delta_frame
+
+class DeltaEncoder:
+    """
+    Turns room broadcasts into a delta stream.
+
+    Each broadcast frame gets the next room.seq. Normally it's a "delta"
+    carrying only members whose name/location/status changed since the
+    previous frame (plus ids of removed members). Every Nth frame is a
+    full "state" keyframe instead, so clients that silently lost a frame
+    converge without asking.
+
+    Clients track seq - if a delta's "prev" doesn't match the last seq
+    they saw, they send {"type": "resync"} and get a keyframe back.
+    Joining sockets get a keyframe straight away (see main.py).
+
+    Deltas come back as a wire.Frame so JSON and binary sockets each get
+    their own encoding, built once per frame. Keyframes are JSON for everyone,
+    and so are deltas that introduce a member (binary ones only carry indexes).
+
+    The last history_size frames stay on the room (room.recent_frames) so
+    a reconnecting client can resume: it hands back "epoch.seq" and gets
+    just the frames it missed instead of a keyframe. The epoch is random
+    per process - seqs from another worker or before a restart don't line
+    up with ours, so those tokens fall back to a keyframe.
+    """
+
+    def __init__(self, snapshot_cache: RoomSnapshotCache, keyframe_interval: int = 20, history_size: int = 64):
+        self.snapshot_cache = snapshot_cache
+        self.keyframe_interval = keyframe_interval
+        self.history_size = history_size
+        self.epoch = secrets.token_hex(4)
+        self.keyframes_sent = 0
+        self.deltas_sent = 0
+        self.resumes = 0
+        self.resume_misses = 0  # tokens too old / from elsewhere - got a keyframe instead
+
+    def next_frame(self, room: Room) -> Optional[Union[str, Frame]]:
+        """Build the next broadcast frame, or None if nothing changed"""
+        current = {}
+        changed = []
+        introduces = False
+        for member in room.members.values():
+            signature = (member.name, member.lat, member.lng, member.status, member.index)
+            current[member.member_id] = signature
+            sent = room.sent_members.get(member.member_id)
+            if sent != signature:
+                changed.append(member)
+                introduces = introduces or sent is None
+
+        removed = [
+            {"member_id": member_id, "idx": signature[4]}
+            for member_id, signature in room.sent_members.items() if member_id not in current
+        ]
+
+        if not changed and not removed:
+            return None
+
+        room.sent_members = current
+        room.seq += 1
+        room.deltas_since_keyframe += 1
+
+        if room.deltas_since_keyframe >= self.keyframe_interval:
+            room.deltas_since_keyframe = 0
+            self.keyframes_sent += 1
+            frame = self.snapshot_cache.state_frame(room)
+        else:
+            self.deltas_sent += 1
+            frame = delta_frame(
+                room.room_id,
+                room.seq,
+                room.seq - 1,
+                [self.snapshot_cache.member_view(member) for member in changed],
+                removed,
+                # Binary sockets have no name for a new index - JSON instead of a resync round trip
+                binary=not introduces
+            )
+
+        if room.recent_frames is None:
+            room.recent_frames = deque(maxlen=self.history_size)
+        room.recent_frames.append((room.seq, frame))
+        return frame
+
+    def keyframe(self, room: Room) -> str:
+        """Full state at the current seq (join / resync)"""
+        self.keyframes_sent += 1
+        return self.snapshot_cache.state_frame(room)
+
+    def resume(self, room: Room, token: Optional[str]) -> Optional[List[Union[str, Frame]]]:
+        """
+        Frames a reconnecting client missed since its "epoch.seq" token
+        (empty if none), or None if it needs a keyframe instead.
+        """
+        if not token:
+            return None
+        epoch, _, seq = token.partition(".")
+        try:
+            seq = int(seq)
+        except ValueError:
+            seq = -1
+
+        frames = room.recent_frames or ()
+        if epoch != self.epoch or not 0 <= seq <= room.seq or \
+                (seq < room.seq and (not frames or frames[0][0] > seq + 1)):
+            self.resume_misses += 1
+            return None
+
+        missed = [frame for frame_seq, frame in frames if frame_seq > seq]
+        # A keyframe in there makes everything before it moot
+        for i in range(len(missed) - 1, -1, -1):
+            if isinstance(missed[i], str):
+                missed = missed[i:]
+                break
+        self.resumes += 1
+        return missed
+
+    def stats(self) -> dict:
+        return {
+            "epoch": self.epoch,
+            "keyframes_sent": self.keyframes_sent,
+            "deltas_sent": self.deltas_sent,
+            "resumes": self.resumes,
+            "resume_misses": self.resume_misses
+        }
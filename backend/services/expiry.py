@@ -0,0 +1,75 @@
+import asyncio
+import heapq
+import logging
+from typing import Awaitable, Callable, Iterable, List, Optional, Tuple
+from utils.time import now_ts
+
+logger = logging.getLogger(__name__)
+
+class ExpiryReaper:
+    """
+    Evicts rooms when they expire, even if nobody touches them again.
+
+    Keeps a min-heap of (expires_at, room_id). The background task sleeps
+    until the earliest expiry, pops whatever is due and hands it to
+    on_expire - O(log n) per room, no scanning of the whole store.
+
+    Entries for rooms that were already ended are just skipped when they
+    come up (on_expire re-checks the room), so nothing needs removing early.
+    """
+
+    def __init__(self, on_expire: Callable[[str], Awaitable[None]], max_sleep_seconds: float = 60):
+        self.on_expire = on_expire
+        self.max_sleep_seconds = max_sleep_seconds
+        self._heap: List[Tuple[float, str]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def track(self, room_id: str, expires_at: float):
+        """Register a room's expiry time (epoch secs)"""
+        heapq.heappush(self._heap, (expires_at, room_id))
+
+        # New earliest deadline - wake the reaper so it re-plans its sleep
+        if self._wakeup and self._heap[0][1] == room_id:
+            self._wakeup.set()
+
+    def track_many(self, entries: Iterable[Tuple[float, str]]):
+        """track() for lots of (expires_at, room_id) at once (startup) - one heapify instead of a push each"""
+        self._heap.extend(entries)
+        heapq.heapify(self._heap)
+        if self._wakeup:
+            self._wakeup.set()
+
+    def pending(self) -> int:
+        return len(self._heap)
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            now = now_ts()
+
+            while self._heap and self._heap[0][0] < now:
+                _, room_id = heapq.heappop(self._heap)
+                try:
+                    await self.on_expire(room_id)
+                except Exception as e:
+                    logger.error("Error expiring room %s: %s", room_id, e)
+
+            timeout = self.max_sleep_seconds
+            if self._heap:
+                timeout = min(timeout, max(0.0, self._heap[0][0] - now_ts()))
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
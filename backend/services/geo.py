@@ -1,4 +1,23 @@
 import math
+from typing import Dict, Iterable, Optional
+import numpy as np
+from storage.memory import Room
+
+EARTH_RADIUS_M = 6_371_000
+
+def valid_coordinates(lat, lng) -> bool:
+    """
+    Real numbers inside the same bounds LocationFix uses. Client frames
+    are plain JSON, so "abc", true or NaN can show up as a coordinate -
+    check before anything stores or computes with them.
+    """
+    if type(lat) is float and type(lng) is float:
+        # The usual case - NaN fails every comparison and inf is out of bounds
+        return -90 <= lat <= 90 and -180 <= lng <= 180
+    for value in (lat, lng):
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            return False
+    return -90 <= lat <= 90 and -180 <= lng <= 180
 
 def haversine_distance(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
     """
@@ -21,3 +40,186 @@ def haversine_distance(lat1: float, lng1: float, lat2: float, lng2: float) -> fl
     c = 2 * math.asin(math.sqrt(a))
     
     return R * c
+
+def haversine_m(lat1, lng1, lat2, lng2) -> np.ndarray:
+    """Same formula over whole arrays (degrees in, meters out)"""
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    a = np.sin((phi2 - phi1) / 2) ** 2 + \
+        np.cos(phi1) * np.cos(phi2) * np.sin(np.radians(np.subtract(lng2, lng1)) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def bearing_deg(lat1, lng1, lat2, lng2) -> np.ndarray:
+    """Initial compass bearing from point 1 to point 2, 0-360 (0 = north)"""
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    d_lambda = np.radians(np.subtract(lng2, lng1))
+    y = np.sin(d_lambda) * np.cos(phi2)
+    x = np.cos(phi1) * np.sin(phi2) - np.sin(phi1) * np.cos(phi2) * np.cos(d_lambda)
+    return np.degrees(np.arctan2(y, x)) % 360
+
+# Beyond this the exact position matters less - report at half the rate
+FAR_FROM_DESTINATION_M = 5_000
+
+def report_interval_ms(geo: Optional[dict], movement_threshold_m: float, min_ms: int, max_ms: int,
+                       arrived: bool = False) -> int:
+    """
+    How often a member's client should send fixes, from its member.geo.
+
+    Reporting faster than it takes to leave the movement dead-band is
+    wasted (the server drops those fixes), so the interval is the time to
+    cover movement_threshold_m at the member's current speed. Stationary
+    members (no ETA) and members who have arrived (services.geofence)
+    report at max_ms. Rounded to 500 ms so small speed
+    changes don't cause a stream of new advice.
+    """
+    if arrived or not geo or geo["eta_secs"] is None or movement_threshold_m <= 0:
+        return max_ms
+
+    interval = movement_threshold_m / geo["speed_mps"] * 1000
+    if geo["distance_m"] > FAR_FROM_DESTINATION_M:
+        interval *= 2
+    interval = round(interval / 500) * 500
+    return int(min(max(interval, min_ms), max_ms))
+
+class GeoEngine:
+    """
+    Distance/bearing to the destination plus smoothed speed and ETA,
+    for every located member of one room or many, as array math.
+
+    update() runs once per broadcast tick (before the frame is built) and
+    leaves the result on member.geo, which member_view() ships as-is:
+        {"distance_m", "bearing_deg", "speed_mps", "eta_secs"}
+    Members without a new fix since the last tick keep their geo as is,
+    so only people who actually moved go through the math.
+
+    Rooms flush one at a time, so to get whole-array batches rooms with
+    new fixes are mark()ed as they come in, and refresh(room) - called
+    by whichever room flushes first - computes every marked room at once.
+    Per-call numpy overhead is then paid per tick, not per room. It's
+    still a fixed cost per call, so batches under batch_threshold members go
+    through plain math instead (same results, see benchmarks/bench_geo.py).
+
+    Speed is the distance covered between consecutive fixes, smoothed
+    with an exponential moving average so GPS jitter doesn't make the
+    ETA jump around. No ETA below min_speed_mps (parked / walking to the car).
+    """
+
+    def __init__(self, smoothing: float = 0.3, min_speed_mps: float = 0.5, max_speed_mps: float = 70.0,
+                 batch_threshold: int = 24):
+        self.smoothing = smoothing
+        self.min_speed_mps = min_speed_mps
+        self.max_speed_mps = max_speed_mps  # faster than this between fixes = GPS jump, ignore
+        self.batch_threshold = batch_threshold  # members per update() before numpy pays off
+        self.pending: Dict[str, Room] = {}
+        self.ticks = 0
+        self.members_computed = 0
+
+    def mark(self, room: Room):
+        """Room got a new fix - include it in the next batch"""
+        self.pending[room.room_id] = room
+
+    def forget(self, room_id: str):
+        self.pending.pop(room_id, None)
+
+    def refresh(self, room: Room) -> int:
+        """Bring room's geo up to date, along with every other marked room"""
+        self.pending[room.room_id] = room
+        rooms = list(self.pending.values())
+        self.pending.clear()
+        return self.update(rooms)
+
+    def update(self, rooms: Iterable[Room]) -> int:
+        """Recompute geo for members of rooms with a new fix, returns how many"""
+        entries = []  # (member, room, previous motion)
+        no_motion = (math.nan, math.nan, math.nan, 0.0)
+        for room in rooms:
+            for member in room.members.values():
+                ts = member.last_updated
+                if member.lat is None or ts is None or not valid_coordinates(member.lat, member.lng):
+                    member.geo = None  # one bad member mustn't sink the whole batch
+                    continue
+                prev = member.motion or no_motion
+                if prev[2] == ts:
+                    continue  # nothing new since last tick
+                entries.append((member, room, prev))
+
+        self.ticks += 1
+        if not entries:
+            return 0
+        if len(entries) < self.batch_threshold:
+            self._update_scalar(entries)
+        else:
+            self._update_batch(entries)
+        self.members_computed += len(entries)
+        return len(entries)
+
+    def _update_scalar(self, entries: list):
+        """update() one member at a time - cheaper than numpy for a handful of members"""
+        smoothing = self.smoothing
+        for member, room, (prev_lat, prev_lng, prev_ts, speed) in entries:
+            lat, lng, ts = member.lat, member.lng, member.last_updated
+            # haversine_m + bearing_deg, sharing the trig between them
+            phi1, phi2 = math.radians(lat), math.radians(room.destination_lat)
+            d_lambda = math.radians(room.destination_lng - lng)
+            cos_phi1, cos_phi2 = math.cos(phi1), math.cos(phi2)
+            a = math.sin((phi2 - phi1) / 2) ** 2 + cos_phi1 * cos_phi2 * math.sin(d_lambda / 2) ** 2
+            distance = 2 * EARTH_RADIUS_M * math.asin(math.sqrt(min(a, 1.0)))
+            bearing = math.degrees(math.atan2(
+                math.sin(d_lambda) * cos_phi2,
+                cos_phi1 * math.sin(phi2) - math.sin(phi1) * cos_phi2 * math.cos(d_lambda)
+            )) % 360
+
+            # First fix has no previous one (prev_ts is NaN, compares False)
+            if ts - prev_ts > 0:
+                step_speed = haversine_distance(prev_lat, prev_lng, lat, lng) * 1000 / (ts - prev_ts)
+                if step_speed <= self.max_speed_mps:
+                    speed = smoothing * step_speed + (1 - smoothing) * speed
+
+            member.motion = (lat, lng, ts, speed)
+            member.geo = {
+                "distance_m": round(distance, 1),
+                "bearing_deg": round(bearing, 1),
+                "speed_mps": round(speed, 2),
+                "eta_secs": round(distance / speed) if speed >= self.min_speed_mps else None
+            }
+
+    def _update_batch(self, entries: list):
+        """update() as array math over every member at once"""
+        flat = []  # 9 floats per member, one np.array() call
+        for member, room, prev in entries:
+            flat += (member.lat, member.lng, member.last_updated, room.destination_lat, room.destination_lng,
+                     prev[0], prev[1], prev[2], prev[3])
+        lat, lng, ts, dest_lat, dest_lng, prev_lat, prev_lng, prev_ts, prev_speed = \
+            np.array(flat, dtype=np.float64).reshape(-1, 9).T
+
+        distance = haversine_m(lat, lng, dest_lat, dest_lng)
+        bearing = bearing_deg(lat, lng, dest_lat, dest_lng)
+
+        # New fix since the last tick? (first fix has no previous one - NaN compares False)
+        dt = ts - prev_ts
+        moved = dt > 0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            step_speed = haversine_m(prev_lat, prev_lng, lat, lng) / dt
+        sample = moved & (step_speed <= self.max_speed_mps)
+        speed = np.where(sample, self.smoothing * step_speed + (1 - self.smoothing) * prev_speed, prev_speed)
+
+        moving = speed >= self.min_speed_mps
+        eta = np.where(moving, distance / np.where(moving, speed, 1.0), np.nan)
+
+        # Back to plain Python floats for JSON - rounding and tolist() are array-wide too.
+        # One flat list per column: a list per member would be a GC-tracked object each
+        members = [entry[0] for entry in entries]
+        columns = zip(members, lat.tolist(), lng.tolist(), ts.tolist(), speed.tolist(), distance.round(1).tolist(),
+                      bearing.round(1).tolist(), speed.round(2).tolist(), eta.round().tolist())
+        for member, m_lat, m_lng, m_ts, m_raw_speed, m_distance, m_bearing, m_speed, m_eta in columns:
+            member.motion = (m_lat, m_lng, m_ts, m_raw_speed)
+            member.geo = {
+                "distance_m": m_distance,
+                "bearing_deg": m_bearing,
+                "speed_mps": m_speed,
+                "eta_secs": None if m_eta != m_eta else int(m_eta)  # NaN != NaN
+            }
+
+    def stats(self) -> dict:
+        return {"ticks": self.ticks, "members_computed": self.members_computed, "pending_rooms": len(self.pending)}
@@ -0,0 +1,160 @@
+from typing import Dict, List, Tuple
+import numpy as np
+from storage.memory import Room, Member
+from storage.spatial import SpatialGrid
+from services.geo import haversine_m, valid_coordinates
+
+DESTINATION = "destination"
+MAX_FENCE_RADIUS_M = 2_000
+
+class GeofenceEngine:
+    """
+    Server-side arrival detection: destination + optional waypoints per room.
+
+    Every fence (room destination with arrival_radius_m, and each room
+    waypoint with its own radius) lives in one SpatialGrid keyed
+    "room_id/fence_id". Per tick, each member with a new fix looks up the
+    fences around it in the grid, all member/fence pairs go through one
+    haversine pass, and crossings come back as events:
+
+        {"room_id", "member_id", "event": "arrived" | "left",
+         "fence": {"id", "name", "kind": "destination" | "waypoint"}}
+
+    Leaving needs you to get exit_margin past the radius (at least
+    min_exit_margin_m), so GPS jitter at the edge doesn't flap.
+
+    Same batching as GeoEngine: mark() rooms as fixes arrive, refresh(room)
+    from whichever room flushes first checks all of them at once. The
+    state per member is member.geofence = (ts checked, frozenset of fence ids inside).
+    """
+
+    def __init__(self, arrival_radius_m: float = 100, exit_margin: float = 0.25, min_exit_margin_m: float = 20,
+                 cell_m: float = 2_500):
+        self.arrival_radius_m = arrival_radius_m
+        self.exit_margin = exit_margin
+        self.min_exit_margin_m = min_exit_margin_m
+        self.grid = SpatialGrid(cell_m)
+        # "room_id/fence_id" -> (room_id, fence_id, name, lat, lng, radius_m)
+        self.fences: Dict[str, tuple] = {}
+        self.room_fences: Dict[str, List[str]] = {}
+        self.reach_m = 0.0  # biggest exit radius - how far around a member to look
+        self.pending: Dict[str, Room] = {}
+        self.ticks = 0
+        self.members_checked = 0
+        self.arrivals = 0
+        self.departures = 0
+
+    def exit_radius(self, radius_m: float) -> float:
+        return radius_m + max(radius_m * self.exit_margin, self.min_exit_margin_m)
+
+    def track(self, room: Room):
+        """Index a room's fences (done lazily on its first tick too)"""
+        if room.room_id in self.room_fences:
+            return
+        fences = [(DESTINATION, room.destination_name, room.destination_lat, room.destination_lng, self.arrival_radius_m)]
+        fences += [(f"wp{i}", name, lat, lng, radius_m) for i, (name, lat, lng, radius_m) in enumerate(room.waypoints)]
+
+        keys = []
+        for fence_id, name, lat, lng, radius_m in fences:
+            key = f"{room.room_id}/{fence_id}"
+            self.fences[key] = (room.room_id, fence_id, name, lat, lng, radius_m)
+            self.grid.move(key, lat, lng)
+            self.reach_m = max(self.reach_m, self.exit_radius(radius_m))
+            keys.append(key)
+        self.room_fences[room.room_id] = keys
+
+    def forget(self, room_id: str):
+        self.pending.pop(room_id, None)
+        for key in self.room_fences.pop(room_id, ()):
+            self.fences.pop(key, None)
+            self.grid.remove(key)
+
+    def mark(self, room: Room):
+        """Room got a new fix - include it in the next batch"""
+        self.pending[room.room_id] = room
+
+    def refresh(self, room: Room) -> List[dict]:
+        """Check this room along with every other marked room, returns crossing events"""
+        self.pending[room.room_id] = room
+        rooms = list(self.pending.values())
+        self.pending.clear()
+        return self.update(rooms)
+
+    def update(self, rooms: List[Room]) -> List[dict]:
+        members: List[Tuple[str, Member, frozenset]] = []
+        pair_member = []  # index into members, per member/fence pair
+        pair_fence = []
+        flat = []  # member lat/lng, fence lat/lng, threshold - one np.array() call at the end
+        for room in rooms:
+            self.track(room)
+            for member in room.members.values():
+                if member.lat is None or not valid_coordinates(member.lat, member.lng):
+                    continue  # one bad member mustn't sink the whole batch
+                state = member.geofence
+                if state and state[0] == member.last_updated:
+                    continue  # nothing new since last tick
+                inside = state[1] if state else frozenset()
+                index = len(members)
+                members.append((room.room_id, member, inside))
+                for key in self.grid.nearby(member.lat, member.lng, self.reach_m):
+                    fence = self.fences[key]
+                    if fence[0] != room.room_id:
+                        continue
+                    radius_m = fence[5]
+                    pair_member.append(index)
+                    pair_fence.append(fence)
+                    flat += (member.lat, member.lng, fence[3], fence[4],
+                             self.exit_radius(radius_m) if fence[1] in inside else radius_m)
+
+        self.ticks += 1
+        if not members:
+            return []
+
+        now_inside = [set() for _ in members]
+        if flat:
+            lat, lng, fence_lat, fence_lng, threshold = np.array(flat, dtype=np.float64).reshape(-1, 5).T
+            hits = (haversine_m(lat, lng, fence_lat, fence_lng) <= threshold).tolist()
+            for index, fence, hit in zip(pair_member, pair_fence, hits):
+                if hit:
+                    now_inside[index].add(fence[1])
+
+        events = []
+        for (room_id, member, before), after in zip(members, now_inside):
+            after = frozenset(after)
+            member.geofence = (member.last_updated, after)
+            for fence_id in after - before:
+                self.arrivals += 1
+                events.append(self._event(room_id, member, "arrived", fence_id))
+            for fence_id in before - after:
+                self.departures += 1
+                events.append(self._event(room_id, member, "left", fence_id))
+
+        self.members_checked += len(members)
+        return events
+
+    def arrived(self, member: Member) -> bool:
+        """Inside the room's destination fence (as of the last tick)"""
+        return bool(member.geofence) and DESTINATION in member.geofence[1]
+
+    def stats(self) -> dict:
+        return {
+            "ticks": self.ticks,
+            "members_checked": self.members_checked,
+            "fences": len(self.fences),
+            "arrivals": self.arrivals,
+            "departures": self.departures,
+            "pending_rooms": len(self.pending)
+        }
+
+    def _event(self, room_id: str, member: Member, kind: str, fence_id: str) -> dict:
+        _, _, name, _, _, _ = self.fences[f"{room_id}/{fence_id}"]
+        return {
+            "room_id": room_id,
+            "member_id": member.member_id,
+            "event": kind,
+            "fence": {
+                "id": fence_id,
+                "name": name,
+                "kind": "destination" if fence_id == DESTINATION else "waypoint"
+            }
+        }
@@ -0,0 +1,55 @@
+import time
+from typing import Optional
+
+# Why a client frame was refused (also the metric label)
+TOO_LARGE = "too_large"
+RATE = "rate"
+INVALID = "invalid"  # parsed fine, but the content is unusable (e.g. a non-numeric coordinate)
+
+class IngestLimiter:
+    """
+    Per-socket limits on what a client may send us, checked before parsing.
+
+    Frames over max_frame_bytes are refused outright. The rest go through
+    a token bucket (burst frames at once, refilled at rate_per_sec), and
+    frames over it are dropped unparsed - a phone sending a fix every few
+    seconds never gets near it. Every refused frame is a violation;
+    violations leak away at one per second, so a client that briefly
+    overshoots just gets throttled, while one that keeps at it reaches
+    max_violations and should be disconnected (see over_limit).
+    """
+
+    def __init__(self, rate_per_sec: float = 20, burst: int = 40, max_frame_bytes: int = 4096,
+                 max_violations: int = 100):
+        self.rate_per_sec = rate_per_sec
+        self.burst = burst
+        self.max_frame_bytes = max_frame_bytes
+        self.max_violations = max_violations
+        self.tokens = float(burst)
+        self.violations = 0.0
+        self.updated = time.monotonic()
+
+    def check(self, size: int) -> Optional[str]:
+        """None if a frame of size bytes can be processed, otherwise why not (TOO_LARGE / RATE)"""
+        now = time.monotonic()
+        elapsed = now - self.updated
+        self.tokens = min(self.burst, self.tokens + elapsed * self.rate_per_sec)
+        self.violations = max(self.violations - elapsed, 0.0)
+        self.updated = now
+
+        if size > self.max_frame_bytes:
+            self.violations += 1
+            return TOO_LARGE
+        if self.tokens < 1:
+            self.violations += 1
+            return RATE
+        self.tokens -= 1
+        return None
+
+    def strike(self):
+        """A frame that got through but turned out to be unusable"""
+        self.violations += 1
+
+    @property
+    def over_limit(self) -> bool:
+        return self.violations >= self.max_violations
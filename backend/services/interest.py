@@ -0,0 +1,186 @@
+from typing import Dict, List, Optional
+from storage.memory import Room, Member
+from storage.spatial import SpatialGrid
+from services.snapshot import RoomSnapshotCache
+from services.wire import delta_frame
+from services.ws_manager import Connection, ConnectionManager
+from utils.time import now_ts
+
+MAX_VIEW_RADIUS_M = 50_000
+
+def parse_interest(message: dict) -> Optional[tuple]:
+    """
+    Viewport message -> interest tuple for Connection.interest.
+
+        {"type": "viewport", "bounds": [min_lat, min_lng, max_lat, max_lng]}
+        {"type": "viewport", "radius_m": 1500}                  around your own position
+        {"type": "viewport", "lat": .., "lng": .., "radius_m": 1500}
+        {"type": "viewport"}                                     back to the default radius
+
+    Raises ValueError/TypeError on anything else.
+    """
+    bounds = message.get("bounds")
+    if bounds is not None:
+        if not isinstance(bounds, list) or len(bounds) != 4:
+            raise ValueError("bounds must be [min_lat, min_lng, max_lat, max_lng]")
+        min_lat, min_lng, max_lat, max_lng = (float(value) for value in bounds)
+        if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lng <= max_lng <= 180):
+            raise ValueError("bounds out of range")
+        return ("bbox", min_lat, min_lng, max_lat, max_lng)
+
+    radius = message.get("radius_m")
+    if radius is None:
+        return None
+    radius = float(radius)
+    if not 0 < radius <= MAX_VIEW_RADIUS_M:
+        raise ValueError(f"radius_m must be in (0, {MAX_VIEW_RADIUS_M}]")
+
+    lat, lng = message.get("lat"), message.get("lng")
+    if lat is None and lng is None:
+        return ("radius", None, None, radius)
+    lat, lng = float(lat), float(lng)
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise ValueError("center out of range")
+    return ("radius", lat, lng, radius)
+
+class InterestFanout:
+    """
+    Broadcasts for event rooms - hundreds or thousands of members.
+
+    Instead of one delta for the whole room, each socket gets its own
+    delta covering only the members it can see (its viewport/radius,
+    capped at max_visible, plus the host and itself). Members found
+    through the room's SpatialGrid, so per-socket work depends on how
+    crowded the viewport is, not on how big the room is.
+
+    Per socket we remember what it was sent (Connection.seen) and run a
+    separate seq stream (Connection.seq), so the client side is the same
+    keyframe/delta/resync protocol as standard rooms. Members that leave
+    the view come through as "removed".
+    """
+
+    def __init__(self, snapshot_cache: RoomSnapshotCache, connection_manager: ConnectionManager,
+                 view_radius_m: float = 2000, max_visible: int = 200, cell_m: float = 500):
+        self.snapshot_cache = snapshot_cache
+        self.connection_manager = connection_manager
+        self.view_radius_m = view_radius_m  # when the client hasn't sent a viewport
+        self.max_visible = max_visible
+        self.cell_m = cell_m
+        self.keyframes_sent = 0
+        self.deltas_sent = 0
+        self.members_sent = 0
+
+    def grid(self, room: Room) -> SpatialGrid:
+        if room.spatial is None:
+            room.spatial = SpatialGrid(self.cell_m)
+            for member in room.members.values():
+                if member.lat is not None:
+                    room.spatial.move(member.member_id, member.lat, member.lng)
+        return room.spatial
+
+    def broadcast(self, room: Room) -> bool:
+        """One tick: update the grid from what changed, then a delta per socket. False if nothing changed."""
+        grid = self.grid(room)
+
+        current = {}
+        changed = False
+        for member in room.members.values():
+            signature = self._signature(member)
+            current[member.member_id] = signature
+            previous = room.sent_members.get(member.member_id)
+            if previous != signature:
+                changed = True
+                if member.lat is not None and (previous is None or previous[1:3] != signature[1:3]):
+                    grid.move(member.member_id, member.lat, member.lng)
+
+        for member_id in room.sent_members:
+            if member_id not in current:
+                grid.remove(member_id)
+                changed = True
+
+        if not changed:
+            return False
+
+        room.sent_members = current
+        room.seq += 1  # nothing is sent at this seq, but the REST snapshot keys on it
+
+        views: Dict[str, dict] = {}
+        for connection in self.connection_manager.room_connections(room.room_id):
+            self._update(room, connection, current, views)
+        return True
+
+    def refresh(self, room: Room, connection: Connection):
+        """Viewport changed - send this socket whoever came into / went out of view"""
+        self._update(room, connection, room.sent_members, {})
+
+    def keyframe(self, room: Room, connection: Connection) -> str:
+        """Full state for one socket (join / resync) - only the members it can see"""
+        now = now_ts()
+        members = [room.members[member_id] for member_id in self.visible(room, connection)]
+        connection.seen = {member.member_id: self._signature(member) for member in members}
+        self.keyframes_sent += 1
+        return self.snapshot_cache.state_frame_for(room, members, connection.seq, now)
+
+    def visible(self, room: Room, connection: Connection) -> List[str]:
+        grid = self.grid(room)
+        interest = connection.interest
+
+        if interest and interest[0] == "bbox":
+            member_ids = grid.within(*interest[1:], limit=self.max_visible)
+        else:
+            lat, lng, radius = interest[1:] if interest else (None, None, self.view_radius_m)
+            if lat is None:
+                me = room.members.get(connection.member_id)
+                lat, lng = (me.lat, me.lng) if me else (None, None)
+            member_ids = grid.nearby(lat, lng, radius, limit=self.max_visible) if lat is not None else []
+
+        # The grid can briefly hold members that just left (removed on the next tick)
+        member_ids = [member_id for member_id in member_ids if member_id in room.members]
+        for member_id in (room.host_member_id, connection.member_id):
+            if member_id and member_id in room.members and member_id not in member_ids:
+                member_ids.append(member_id)
+        return member_ids
+
+    def stats(self) -> dict:
+        return {
+            "keyframes_sent": self.keyframes_sent,
+            "deltas_sent": self.deltas_sent,
+            "members_sent": self.members_sent
+        }
+
+    def _update(self, room: Room, connection: Connection, current: Dict[str, tuple], views: Dict[str, dict]):
+        seen = connection.seen
+        next_seen = {}
+        changed = []
+        for member_id in self.visible(room, connection):
+            signature = current.get(member_id) or self._signature(room.members[member_id])
+            next_seen[member_id] = signature
+            if seen.get(member_id) != signature:
+                changed.append(member_id)
+
+        removed = [{"member_id": member_id, "idx": signature[4]}
+                   for member_id, signature in seen.items() if member_id not in next_seen]
+        if not changed and not removed:
+            return
+
+        # Binary deltas only carry indexes - someone new to this socket needs their name, so JSON
+        introduces = any(member_id not in seen for member_id in changed)
+
+        member_views = []
+        for member_id in changed:
+            view = views.get(member_id)
+            if view is None:
+                view = views[member_id] = self.snapshot_cache.member_view(room.members[member_id])
+            member_views.append(view)
+
+        connection.seen = next_seen
+        connection.seq += 1
+        self.deltas_sent += 1
+        self.members_sent += len(member_views)
+        self.connection_manager.send(connection, delta_frame(
+            room.room_id, connection.seq, connection.seq - 1, member_views, removed, binary=not introduces
+        ))
+
+    def _signature(self, member: Member) -> tuple:
+        # Same shape as DeltaEncoder's - (name, lat, lng, status, index)
+        return (member.name, member.lat, member.lng, member.status, member.index)
@@ -0,0 +1,51 @@
+import asyncio
+from typing import Dict, List
+
+class RoomWatchers:
+    """
+    Wakes long-polling GET /rooms/{room_id}?wait=N requests.
+
+    One asyncio.Event per room that has someone waiting, shared by all of
+    them. notify() is called after every room broadcast (and when a room
+    ends) - it wakes everyone and drops the event, so the next wait()
+    starts fresh. Waiters re-check the ETag themselves, a wakeup doesn't
+    promise the document changed.
+    """
+
+    def __init__(self):
+        # room_id -> [event, number of requests waiting on it]
+        self._rooms: Dict[str, List] = {}
+        self.waiting = 0
+        self.wakeups = 0
+
+    async def wait(self, room_id: str, timeout: float) -> bool:
+        """Block until the room is notified or timeout seconds pass - True if notified"""
+        entry = self._rooms.get(room_id)
+        if entry is None:
+            entry = self._rooms[room_id] = [asyncio.Event(), 0]
+        entry[1] += 1
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(entry[0].wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiting -= 1
+            entry[1] -= 1
+            # Last one to time out cleans up (notify already dropped it otherwise)
+            if entry[1] == 0 and self._rooms.get(room_id) is entry:
+                del self._rooms[room_id]
+
+    def notify(self, room_id: str):
+        entry = self._rooms.pop(room_id, None)
+        if entry is not None:
+            self.wakeups += 1
+            entry[0].set()
+
+    def stats(self) -> dict:
+        return {
+            "waiting": self.waiting,
+            "rooms": len(self._rooms),
+            "wakeups": self.wakeups
+        }
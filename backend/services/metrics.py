@@ -0,0 +1,176 @@
+import asyncio
+import math
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Recording happens on the event loop thread only, so every instrument is
+# just plain attribute arithmetic - no locks, no allocation per observation.
+# All the formatting work is deferred to render(), i.e. to the scraper.
+
+# Seconds - from "basically free" up to "the loop is in trouble"
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+# Recipients per broadcast
+FANOUT_BUCKETS = (1, 2, 3, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+def _format_value(value: float) -> str:
+    if isinstance(value, int):
+        return str(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+class Counter:
+    """
+    Monotonic counter. With labelnames, use .labels(...) to get the child
+    to increment (grab it once and keep it around on hot paths).
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), fn: Optional[Callable[[], float]] = None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.fn = fn  # read an existing counter at scrape time instead of inc()
+        self.value = 0
+        self._children: Dict[Tuple[str, ...], "Counter"] = {}
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def labels(self, *values: str) -> "Counter":
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = Counter(self.name, self.help)
+        return child
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        if self.labelnames:
+            return [(self.name, _format_labels(self.labelnames, values), child.value)
+                    for values, child in self._children.items()]
+        return [(self.name, "", self.fn() if self.fn else self.value)]
+
+class Gauge:
+    """Value that goes up and down - set() it, or pass fn to compute it at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, fn: Optional[Callable[[], float]] = None):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.value = 0
+
+    def set(self, value: float):
+        self.value = value
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        return [(self.name, "", self.fn() if self.fn else self.value)]
+
+class Histogram:
+    """
+    Fixed-bucket histogram. observe() is a bisect plus three additions;
+    counts are per bucket and only made cumulative when rendered.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), self.counts):
+            cumulative += count
+            samples.append((f"{self.name}_bucket", f'{{le="{_format_value(float(bound))}"}}', cumulative))
+        samples.append((f"{self.name}_sum", "", self.sum))
+        samples.append((f"{self.name}_count", "", self.count))
+        return samples
+
+class MetricsRegistry:
+    """
+    Holds instruments and renders them in the Prometheus text format (GET /metrics).
+
+    Components create their instruments through the registry they're
+    handed; with no registry they get a private one, which costs the same
+    to record into and is simply never scraped.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = (),
+                fn: Optional[Callable[[], float]] = None) -> Counter:
+        return self._register(Counter(name, help, labelnames, fn))
+
+    def gauge(self, name: str, help: str, fn: Optional[Callable[[], float]] = None) -> Gauge:
+        return self._register(Gauge(name, help, fn))
+
+    def histogram(self, name: str, help: str, buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        lines.append("")
+        return "\n".join(lines)
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+class LoopLagMonitor:
+    """
+    Measures event loop lag: sleeps for `interval` and records how much
+    later than that it actually woke up. Anything blocking the loop
+    (a slow handler, a big GC pause) shows up here first.
+    """
+
+    def __init__(self, metrics: MetricsRegistry, interval_seconds: float = 0.5):
+        self.interval_seconds = interval_seconds
+        self.last_lag = 0.0
+        self.lag = metrics.histogram("tether_event_loop_lag_seconds", "How late the event loop woke up from a timed sleep")
+        metrics.gauge("tether_event_loop_lag_last_seconds", "Most recent event loop lag sample", fn=lambda: self.last_lag)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval_seconds)
+            self.last_lag = max(0.0, loop.time() - started - self.interval_seconds)
+            self.lag.observe(self.last_lag)
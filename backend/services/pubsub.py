@@ -0,0 +1,122 @@
+import asyncio
+import json
+import logging
+import threading
+import uuid
+from typing import Awaitable, Callable, Optional
+from storage.redis_store import RedisWriter
+
+logger = logging.getLogger(__name__)
+
+EventHandler = Callable[[dict], Awaitable[None]]
+
+class LocalBus:
+    """
+    Single-process event bus - there are no other workers to tell,
+    so publishing is a no-op. Default for the in-memory store.
+    """
+
+    distributed = False  # lets publishers skip building events nobody will read
+
+    def __init__(self):
+        self.worker_id = uuid.uuid4().hex[:8]
+        self.handler: Optional[EventHandler] = None
+        self.published = 0
+        self.received = 0
+
+    def set_handler(self, handler: EventHandler):
+        self.handler = handler
+
+    def publish(self, event: dict):
+        pass
+
+    def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def stats(self) -> dict:
+        return {"worker_id": self.worker_id, "published": self.published, "received": self.received}
+
+class RedisBus(LocalBus):
+    """
+    Cross-worker event bus over Redis pub/sub.
+
+    Every room/member change is published on one channel; each worker
+    applies events from the others to its local room copies and
+    re-broadcasts to the sockets it holds. So a location update received
+    on worker A reaches sockets connected to worker B.
+
+    redis-py's pub/sub API is blocking, so a daemon thread listens and
+    hands events to the event loop, where a single consumer task applies
+    them in order. Publishing goes through a RedisWriter - share the
+    store's, so an event never overtakes the save it announces.
+    """
+
+    CHANNEL = "tether:events"
+    distributed = True
+
+    def __init__(self, client, channel: str = CHANNEL, writer: Optional[RedisWriter] = None):
+        super().__init__()
+        self.client = client
+        self.channel = channel
+        self.writer = writer or RedisWriter(client)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._consumer: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def publish(self, event: dict):
+        event["origin"] = self.worker_id
+        self.writer.submit("publish", self.channel, json.dumps(event))
+        self.published += 1
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._consumer = asyncio.create_task(self._consume())
+
+        pubsub = self.client.pubsub()
+        pubsub.subscribe(self.channel)
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._listen, args=(pubsub,), name="tether-bus", daemon=True)
+        self._thread.start()
+
+    async def stop(self):
+        self._stopping.set()
+        if self._thread:
+            await asyncio.get_running_loop().run_in_executor(None, self._thread.join)
+            self._thread = None
+        if self._consumer:
+            self._consumer.cancel()
+            await asyncio.gather(self._consumer, return_exceptions=True)
+            self._consumer = None
+
+    def _listen(self, pubsub):
+        try:
+            while not self._stopping.is_set():
+                message = pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if not message or message.get("type") != "message":
+                    continue
+
+                event = json.loads(message["data"])
+                if event.get("origin") == self.worker_id:
+                    continue  # our own change, already applied
+                self._loop.call_soon_threadsafe(self._queue.put_nowait, event)
+        except Exception as e:
+            logger.error("Event bus listener stopped: %s", e)
+        finally:
+            pubsub.close()
+
+    async def _consume(self):
+        while True:
+            event = await self._queue.get()
+            self.received += 1
+            if not self.handler:
+                continue
+            try:
+                await self.handler(event)
+            except Exception as e:
+                logger.error("Error handling bus event %s: %s", event.get('kind'), e)
@@ -0,0 +1,250 @@
+import logging
+import math
+import struct
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+from storage.memory import Member, Room
+from storage.spatial import METERS_PER_DEGREE
+
+logger = logging.getLogger(__name__)
+
+# Anonymized traffic capture for benchmarks/replay.py.
+#
+# File: header <4s B> (MAGIC, VERSION), then records back to back:
+#   <B I I I>  kind, ms since recording started, room alias, member alias
+#   followed by a fixed payload per kind (PAYLOADS below; BATCH adds
+#   `count` <I i i> fixes: age in ms before the record, east, north)
+#
+# Nothing identifying is kept: rooms and members are numbered in order of
+# appearance (names, ids and tokens are never written), positions are
+# decimeters east/north of the room's destination, time starts at 0.
+
+MAGIC = b"TTRC"
+VERSION = 1
+
+ROOM_CREATED = 1   # <B B>  mode (0 standard, 1 event), waypoint count
+JOINED = 2
+CONNECTED = 3      # <B>    protocol code | RESUMED
+DISCONNECTED = 4
+LOCATION = 5       # <i i>  dm east, dm north of the destination
+PING = 6
+RESYNC = 7
+VIEWPORT = 8       # <I>    radius in m (0 = back to the default)
+BATCH = 9          # <H>    fix count, then the fixes
+POLL = 10          # <H>    ?wait= in tenths of a second
+ENDED = 11
+
+KIND_NAMES = {
+    ROOM_CREATED: "room_created", JOINED: "joined", CONNECTED: "connected", DISCONNECTED: "disconnected",
+    LOCATION: "location", PING: "ping", RESYNC: "resync", VIEWPORT: "viewport", BATCH: "batch",
+    POLL: "poll", ENDED: "ended"
+}
+
+PROTOCOLS = (None, "tether.bin.v1", "tether.deflate")  # index = protocol code
+RESUMED = 0x80
+
+_HEADER = struct.Struct("<4sB")
+_RECORD = struct.Struct("<BIII")
+_FIX = struct.Struct("<Iii")
+PAYLOADS = {
+    ROOM_CREATED: struct.Struct("<BB"),
+    CONNECTED: struct.Struct("<B"),
+    LOCATION: struct.Struct("<ii"),
+    VIEWPORT: struct.Struct("<I"),
+    BATCH: struct.Struct("<H"),
+    POLL: struct.Struct("<H"),
+}
+_INT32 = 2 ** 31 - 1
+
+def _clamp(value: float) -> int:
+    return max(-_INT32, min(_INT32, round(value)))
+
+class TrafficRecorder:
+    """
+    Opt-in capture of what clients do (RECORD_TRAFFIC=path), so load
+    tests can replay real convoy traffic instead of a random walk.
+
+    The hooks only pack a few bytes and push them onto a deque; a writer
+    thread appends them to the file every flush_interval, same as the
+    journal. Aliases for a room and its members are dropped when it ends.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 0.5):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.events = 0
+        self.bytes_written = 0
+        self._pending: Deque[bytes] = deque()
+        # room_id -> (alias, destination lat, lng, meters per degree of longitude there)
+        self._rooms: Dict[str, Tuple[int, float, float, float]] = {}
+        self._members: Dict[str, int] = {}
+        self._room_members: Dict[str, List[str]] = {}
+        self._next_room = 0
+        self._next_member = 0
+        self._started = time.monotonic()
+        self._file = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    # ---------- hooks ----------
+
+    def room_created(self, room: Room):
+        mode = 1 if room.mode == "event" else 0
+        self._emit(ROOM_CREATED, room, None, PAYLOADS[ROOM_CREATED].pack(mode, min(len(room.waypoints), 255)))
+
+    def joined(self, room: Room, member: Member):
+        self._emit(JOINED, room, member)
+
+    def connected(self, room: Room, member: Member, protocol: Optional[str], resumed: bool):
+        code = PROTOCOLS.index(protocol) if protocol in PROTOCOLS else 0
+        self._emit(CONNECTED, room, member, PAYLOADS[CONNECTED].pack(code | (RESUMED if resumed else 0)))
+
+    def disconnected(self, room: Room, member: Member):
+        self._emit(DISCONNECTED, room, member)
+
+    def location(self, room: Room, member: Member, lat: float, lng: float):
+        self._emit(LOCATION, room, member, PAYLOADS[LOCATION].pack(*self._offset(room, lat, lng)))
+
+    def ping(self, room: Room, member: Member):
+        self._emit(PING, room, member)
+
+    def resync(self, room: Room, member: Member):
+        self._emit(RESYNC, room, member)
+
+    def viewport(self, room: Room, member: Member, interest: Optional[tuple]):
+        """Kept as a radius - a bbox becomes its half-diagonal"""
+        radius_m = 0.0
+        if interest and interest[0] == "bbox":
+            _, min_lat, min_lng, max_lat, max_lng = interest
+            scale = math.cos(math.radians((min_lat + max_lat) / 2))
+            radius_m = math.hypot(max_lat - min_lat, (max_lng - min_lng) * scale) / 2 * METERS_PER_DEGREE
+        elif interest:
+            radius_m = interest[-1]
+        self._emit(VIEWPORT, room, member, PAYLOADS[VIEWPORT].pack(min(int(radius_m), 2 ** 32 - 1)))
+
+    def batch(self, room: Room, member: Member, fixes: Sequence[Tuple[float, float, float]]):
+        """fixes are (ts epoch secs, lat, lng)"""
+        now = time.time()
+        fixes = fixes[:2 ** 16 - 1]
+        parts = [PAYLOADS[BATCH].pack(len(fixes))]
+        for ts, lat, lng in fixes:
+            age_ms = max(0, min(int((now - ts) * 1000), 2 ** 32 - 1))
+            parts.append(_FIX.pack(age_ms, *self._offset(room, lat, lng)))
+        self._emit(BATCH, room, member, b"".join(parts))
+
+    def polled(self, room: Room, wait: float):
+        self._emit(POLL, room, None, PAYLOADS[POLL].pack(min(int(wait * 10), 2 ** 16 - 1)))
+
+    def ended(self, room: Room):
+        self._emit(ENDED, room, None)
+        self._rooms.pop(room.room_id, None)
+        for member_id in self._room_members.pop(room.room_id, ()):
+            self._members.pop(member_id, None)
+
+    # ---------- lifecycle ----------
+
+    def start(self):
+        self._file = open(self.path, "wb")
+        self._file.write(_HEADER.pack(MAGIC, VERSION))
+        self._started = time.monotonic()
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="traffic-recorder", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread:
+            self._stopping.set()
+            self._thread.join()
+            self._thread = None
+        if self._file:
+            self._flush()
+            self._file.close()
+            self._file = None
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "events": self.events,
+            "bytes_written": self.bytes_written,
+            "pending": len(self._pending)
+        }
+
+    # ---------- internals ----------
+
+    def _room(self, room: Room) -> Tuple[int, float, float, float]:
+        entry = self._rooms.get(room.room_id)
+        if entry is None:
+            scale = METERS_PER_DEGREE * math.cos(math.radians(room.destination_lat))
+            entry = self._rooms[room.room_id] = (self._next_room, room.destination_lat, room.destination_lng, scale)
+            self._next_room += 1
+        return entry
+
+    def _member(self, room: Room, member: Member) -> int:
+        alias = self._members.get(member.member_id)
+        if alias is None:
+            alias = self._members[member.member_id] = self._next_member
+            self._next_member += 1
+            self._room_members.setdefault(room.room_id, []).append(member.member_id)
+        return alias
+
+    def _offset(self, room: Room, lat: float, lng: float) -> Tuple[int, int]:
+        _, origin_lat, origin_lng, lng_scale = self._room(room)
+        return _clamp((lng - origin_lng) * lng_scale * 10), _clamp((lat - origin_lat) * METERS_PER_DEGREE * 10)
+
+    def _emit(self, kind: int, room: Room, member: Optional[Member], payload: bytes = b""):
+        elapsed_ms = min(int((time.monotonic() - self._started) * 1000), 2 ** 32 - 1)
+        member_alias = self._member(room, member) if member else 0
+        self._pending.append(_RECORD.pack(kind, elapsed_ms, self._room(room)[0], member_alias) + payload)
+        self.events += 1
+
+    def _run(self):
+        while not self._stopping.wait(self.flush_interval):
+            try:
+                self._flush()
+            except Exception as e:
+                logger.error("Traffic recorder write failed: %s", e)
+
+    def _flush(self):
+        chunks = []
+        while self._pending:
+            chunks.append(self._pending.popleft())
+        if chunks:
+            data = b"".join(chunks)
+            self._file.write(data)
+            self._file.flush()
+            self.bytes_written += len(data)
+
+def read_log(path: str) -> Iterator[Tuple[int, float, int, int, tuple]]:
+    """(kind, seconds since start, room alias, member alias, payload fields) per record"""
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, version = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} isn't a tether traffic log (v{VERSION})")
+
+    offset = _HEADER.size
+    while offset + _RECORD.size <= len(data):
+        kind, elapsed_ms, room, member = _RECORD.unpack_from(data, offset)
+        offset += _RECORD.size
+        payload = PAYLOADS.get(kind)
+        fields: tuple = ()
+        if payload:
+            if offset + payload.size > len(data):
+                break  # cut off mid-record (server killed while writing)
+            fields = payload.unpack_from(data, offset)
+            offset += payload.size
+        if kind == BATCH:
+            count = fields[0]
+            if offset + count * _FIX.size > len(data):
+                break
+            fields = tuple(_FIX.unpack_from(data, offset + i * _FIX.size) for i in range(count))
+            offset += count * _FIX.size
+        yield kind, elapsed_ms / 1000, room, member, fields
+
+def from_offset(origin_lat: float, origin_lng: float, east_dm: int, north_dm: int) -> Tuple[float, float]:
+    """Recorded offset -> lat/lng around wherever the replay puts the room"""
+    lat = origin_lat + north_dm / 10 / METERS_PER_DEGREE
+    lng = origin_lng + east_dm / 10 / (METERS_PER_DEGREE * math.cos(math.radians(origin_lat)))
+    return lat, lng
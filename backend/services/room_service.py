@@ -1,7 +1,15 @@
-from datetime import datetime, timedelta
-from typing import Optional
-from storage.memory import Room, Member, MemoryStore
-from utils.time import get_utc_now
+from typing import Callable, Optional
+from storage.base import RoomStore
+from storage.memory import Room, Member
+from services.pubsub import LocalBus
+from services.geo import haversine_distance
+from storage.trail import Trail
+from services.timer_wheel import TimerWheel
+from utils.time import now_ts
+
+# Member status thresholds (seconds since last update)
+LIVE_THRESHOLD_SECS = 10
+STALE_THRESHOLD_SECS = 30
 
 class RoomService:
     """
@@ -9,20 +17,43 @@ class RoomService:
     
     Basically CRUD operations + some helper methods for checking
     if stuff is expired and calculating member status.
+    
+    Anything that changes a room or member should go through here so
+    the room version gets bumped, the store can write it through and
+    other workers hear about it on the bus.
+
+    member.status is stored, not recomputed per broadcast: every fix or
+    ping sets it and arms a status_wheel timer for the next 10 s / 30 s
+    crossing. When a status actually flips, on_status_change(room, member)
+    gets called (main.py marks just that room dirty).
     """
     
-    def __init__(self, store: MemoryStore, ttl_seconds: int = 10800):
+    def __init__(self, store: RoomStore, ttl_seconds: int = 10800, bus: Optional[LocalBus] = None,
+                 trail_capacity: int = 600, movement_threshold_m: float = 0.0,
+                 status_wheel: Optional[TimerWheel] = None,
+                 on_status_change: Optional[Callable[[Room, Member], None]] = None):
         self.store = store
         self.ttl_seconds = ttl_seconds
+        self.bus = bus or LocalBus()
+        self.trail_capacity = trail_capacity  # fixes kept per member
+        self.movement_threshold_m = movement_threshold_m  # smaller moves are GPS jitter
+        self.fixes_applied = 0
+        self.fixes_deadbanded = 0
+        self.status_wheel = status_wheel
+        self.on_status_change = on_status_change
+        self.status_changes = 0
+        if status_wheel is not None:
+            status_wheel.set_handler(self._status_due)
     
     def create_room(self, room_id: str, destination_name: str, destination_lat: float, 
-                    destination_lng: float, duration_minutes: Optional[int] = None) -> Room:
+                    destination_lng: float, duration_minutes: Optional[int] = None, mode: str = "standard",
+                    waypoints: tuple = ()) -> Room:
         """Create a new room"""
         if duration_minutes is None:
             duration_minutes = 180  # 3 hours default
         
-        now = get_utc_now()
-        expires_at = now + timedelta(minutes=duration_minutes)
+        now = now_ts()
+        expires_at = now + duration_minutes * 60
         
         room = Room(
             room_id=room_id,
@@ -30,7 +61,9 @@ class RoomService:
             destination_lat=destination_lat,
             destination_lng=destination_lng,
             created_at=now,
-            expires_at=expires_at
+            expires_at=expires_at,
+            mode=mode,
+            waypoints=waypoints
         )
         
         self.store.create_room(room)
@@ -40,16 +73,20 @@ class RoomService:
         """Get room by ID"""
         return self.store.get_room(room_id)
     
-    def remove_room(self, room_id: str):
+    def remove_room(self, room_id: str, reason: str = "removed"):
         """Remove room"""
+        room = self.store.get_room(room_id)
+        if room:
+            self.untrack_room(room)
         self.store.remove_room(room_id)
+        self.bus.publish({"kind": "room_removed", "room_id": room_id, "reason": reason})
     
     def is_room_expired(self, room_id: str) -> bool:
         """Check if room has expired"""
         room = self.store.get_room(room_id)
         if not room:
             return True
-        return get_utc_now() > room.expires_at
+        return now_ts() > room.expires_at
     
     def add_member(self, room_id: str, member_id: str, name: str, token: str):
         """Add member to room"""
@@ -57,24 +94,151 @@ class RoomService:
             member_id=member_id,
             name=name,
             token=token,
-            last_updated=get_utc_now()
+            last_updated=now_ts()
         )
         self.store.add_member(room_id, member)
+        self._publish_member(room_id, member)
+        room = self.store.get_room(room_id)
+        if room:
+            self.refresh_status(room, member)
     
     def remove_member(self, room_id: str, member_id: str):
         """Remove member from room"""
+        if self.status_wheel is not None:
+            self.status_wheel.cancel((room_id, member_id))
         self.store.remove_member(room_id, member_id)
     
-    def get_member_status(self, last_updated: Optional[datetime]) -> str:
-        """Get member status based on last update time"""
+    def set_host(self, room: Room, member_id: str):
+        """Make member the room host"""
+        room.host_member_id = member_id
+        room.touch()
+        self.store.save_room(room)
+        self.bus.publish({"kind": "room", "room_id": room.room_id, "host_member_id": member_id})
+    
+    def update_location(self, room: Room, member: Member, lat: float, lng: float,
+                        updated_at: Optional[float] = None) -> bool:
+        """
+        Record a location fix for a member (updated_at = epoch secs when it was taken, default now).
+
+        A fix within movement_threshold_m of the last one only refreshes
+        last_updated (so the member stays Live) - returns False, nothing
+        moved and there's nothing to broadcast. Like a ping, that leaves
+        the room untouched (see touch_member).
+        """
+        if member.lat is not None and self.movement_threshold_m > 0 and \
+                haversine_distance(member.lat, member.lng, lat, lng) * 1000 < self.movement_threshold_m:
+            self.fixes_deadbanded += 1
+            member.last_updated = updated_at or now_ts()
+            self._save_member(room, member)
+            self.refresh_status(room, member)
+            return False
+
+        self.fixes_applied += 1
+        member.lat = lat
+        member.lng = lng
+        member.last_updated = updated_at or now_ts()
+        self.record_fix(member, member.last_updated, lat, lng)
+        room.touch()
+        self._save_member(room, member)
+        self.refresh_status(room, member)
+        return True
+    
+    def record_fix(self, member: Member, ts: float, lat: float, lng: float):
+        """Add a fix to the member's trail only (history from batches / other workers)"""
+        if member.trail is None:
+            member.trail = Trail(self.trail_capacity)
+        member.trail.append(ts, lat, lng)
+    
+    def touch_member(self, room: Room, member: Member):
+        """
+        Keep-alive - refresh last update time without moving.
+
+        Only pushes the liveness timer back. The room isn't touched unless the
+        status flips (refresh_status does that), so pings cause no broadcast
+        and the cached REST doc keeps its ETag (its last_updated is filled in
+        per request, see RoomSnapshotCache.room_document).
+        """
+        member.last_updated = now_ts()
+        self._save_member(room, member)
+        self.refresh_status(room, member)
+    
+    def set_connected(self, room: Room, member: Member, is_connected: bool):
+        """Track whether member currently has a live socket"""
+        member.is_connected = is_connected
+        room.touch()
+        self._save_member(room, member)
+    
+    def get_member_status(self, last_updated: Optional[float], now: Optional[float] = None) -> str:
+        """Get member status based on last update time (epoch secs)"""
         if not last_updated:
             return "Offline"
         
-        elapsed = (get_utc_now() - last_updated).total_seconds()
+        elapsed = (now or now_ts()) - last_updated
         
-        if elapsed <= 10:
+        if elapsed <= LIVE_THRESHOLD_SECS:
             return "Live"
-        elif elapsed <= 30:
+        elif elapsed <= STALE_THRESHOLD_SECS:
             return "Stale"
         else:
             return "Offline"
+    
+    def refresh_status(self, room: Room, member: Member, now: Optional[float] = None, notify: bool = True) -> bool:
+        """
+        Set member.status from last_updated and arm the timer for its next
+        transition. True if the status changed (on_status_change is told, unless notify=False).
+        """
+        now = now or now_ts()
+        status = self.get_member_status(member.last_updated, now)
+
+        if self.status_wheel is not None:
+            key = (room.room_id, member.member_id)
+            due = self._next_transition(member.last_updated, now)
+            if due is None:
+                self.status_wheel.cancel(key)
+            else:
+                self.status_wheel.schedule(key, due, (room, member))
+
+        if status == member.status:
+            return False
+        member.status = status
+        self.status_changes += 1
+        room.touch()
+        if notify and self.on_status_change:
+            self.on_status_change(room, member)
+        return True
+
+    def track_room(self, room: Room):
+        """Statuses + timers for a room that showed up without going through here (journal, another worker)"""
+        now = now_ts()
+        for member in room.members.values():
+            self.refresh_status(room, member, now, notify=False)
+
+    def untrack_room(self, room: Room):
+        if self.status_wheel is not None:
+            for member_id in room.members:
+                self.status_wheel.cancel((room.room_id, member_id))
+
+    def _next_transition(self, last_updated: Optional[float], now: float) -> Optional[float]:
+        """When the status computed from last_updated next changes (None if never)"""
+        if not last_updated:
+            return None
+        for threshold in (LIVE_THRESHOLD_SECS, STALE_THRESHOLD_SECS):
+            # Status flips once elapsed is strictly past the threshold
+            at = last_updated + threshold + 1e-3
+            if at > now:
+                return at
+        return None
+
+    def _status_due(self, arg: tuple):
+        room, member = arg
+        if room.members.get(member.member_id) is member:
+            self.refresh_status(room, member)
+    
+    def _save_member(self, room: Room, member: Member):
+        self.store.save_member(room.room_id, member)
+        self._publish_member(room.room_id, member)
+    
+    def _publish_member(self, room_id: str, member: Member):
+        if not self.bus.distributed:
+            return
+        self.bus.publish({"kind": "member", "room_id": room_id, "member": member.to_dict(include_token=False)})
@@ -0,0 +1,203 @@
+import json
+import secrets
+from typing import Dict, Iterable, Optional, Tuple
+from storage.memory import Room, Member
+from services.room_service import RoomService
+from utils.time import now_ts, to_iso
+
+class RoomSnapshotCache:
+    """
+    Serialize-once room snapshots for the WebSocket and REST paths.
+
+    Encoded payloads live on the Room (room.snapshot_cache) keyed by
+    room.version, so every socket in a room and every GET /rooms poll
+    share the same string until something actually changes.
+    The WS state frame doubles as the delta stream keyframe (carries room.seq).
+
+    The WS state has last_updated_ago_secs, which depends on the clock,
+    so it's only reused within the same second. Member status is stored
+    and a flip touches the room, so it's covered by the version.
+    Member geo (distance/ETA) is refreshed on broadcast ticks, which bump
+    room.seq when anything moved - so both payloads key on seq too.
+
+    The REST doc also gets an ETag (epoch.version.seq) so conditional GETs
+    can be answered without touching the members at all. version and seq
+    restart from 0 in every process, so the random per-process epoch keeps
+    a tag from a restarted server (or another worker behind the same load
+    balancer) from matching a different document.
+    Its members' last_updated moves on pings and dead-banded fixes, which
+    don't touch the room - so the body is cached with a hole for each
+    last_updated, filled in on every 200. The tag is weak (W/) since two
+    bodies under it may differ in last_updated alone.
+    """
+
+    def __init__(self, room_service: RoomService):
+        self.room_service = room_service
+        self.epoch = secrets.token_hex(4)
+        # Stands in for last_updated while encoding the REST doc, split out after
+        self._hole = json.dumps(secrets.token_hex(8)).encode("utf-8")
+        self.hits: Dict[str, int] = {"state": 0, "rest": 0, "trail": 0}
+        self.misses: Dict[str, int] = {"state": 0, "rest": 0, "trail": 0}
+
+    def state_frame(self, room: Room) -> str:
+        """JSON "state" message (full keyframe) sent over WebSocket"""
+        now = now_ts()
+        key = (room.version, room.seq, int(now))
+
+        cached = room.snapshot_cache.get("state")
+        if cached and cached[0] == key:
+            self.hits["state"] += 1
+            return cached[1]
+
+        self.misses["state"] += 1
+        frame = self.state_frame_for(room, room.members.values(), room.seq, now)
+        room.snapshot_cache["state"] = (key, frame)
+        return frame
+
+    def state_frame_for(self, room: Room, members: Iterable[Member], seq: int, now: float) -> str:
+        """
+        Uncached "state" message for a given set of members and seq -
+        event room sockets each get their own (only members near their viewport).
+        """
+        members_data = []
+        for member in members:
+            view = self.member_view(member)
+            view["last_updated_ago_secs"] = int(now - member.last_updated) if member.last_updated else None
+            members_data.append(view)
+
+        return json.dumps({
+            "type": "state",
+            "room_id": room.room_id,
+            "mode": room.mode,
+            "seq": seq,
+            "members_count": len(room.members),
+            "destination": self._destination(room),
+            "expires_at": to_iso(room.expires_at),
+            "members": members_data
+        })
+
+    def room_etag(self, room: Room) -> Optional[str]:
+        """ETag of the current REST doc, None if it would have to be rebuilt first"""
+        cached = self._current_document(room)
+        return cached[3] if cached else None
+
+    def room_document(self, room: Room) -> Tuple[str, bytes]:
+        """ETag and encoded body for GET /rooms/{room_id}"""
+        cached = self._current_document(room)
+        if cached:
+            self.hits["rest"] += 1
+        else:
+            self.misses["rest"] += 1
+            cached = self._build_document(room)
+        key, parts, members, etag = cached
+
+        # Only last_updated is filled in per request - and only when one of them moved
+        stamps = tuple(member.last_updated for member in members)
+        filled = room.snapshot_cache.get("rest_body")
+        if filled and filled[0] == key and filled[1] == stamps:
+            return etag, filled[2]
+        body = [parts[0]]
+        for last_updated, part in zip(stamps, parts[1:]):
+            body.append(f'"{to_iso(last_updated)}"'.encode("utf-8") if last_updated else b"null")
+            body.append(part)
+        body = b"".join(body)
+        room.snapshot_cache["rest_body"] = (key, stamps, body)
+        return etag, body
+
+    def _build_document(self, room: Room) -> tuple:
+        members = list(room.members.values())
+        hole = self._hole.decode("utf-8")[1:-1]
+        members_data = []
+        for member in members:
+            view = self.member_view(member)
+            view["last_updated"] = hole
+            view["is_connected"] = member.is_connected
+            members_data.append(view)
+
+        body = json.dumps({
+            "room_id": room.room_id,
+            "mode": room.mode,
+            "destination": self._destination(room),
+            "waypoints": [{"id": f"wp{i}", "name": name, "lat": lat, "lng": lng, "radius_m": radius_m}
+                          for i, (name, lat, lng, radius_m) in enumerate(room.waypoints)],
+            "members_count": len(room.members),
+            "members": members_data,
+            "expires_at": to_iso(room.expires_at),
+            "host_member_id": room.host_member_id
+        }).encode("utf-8")
+        etag = f'W/"{self.epoch}.{room.version}.{room.seq}"'
+        cached = ((room.version, room.seq), body.split(self._hole), members, etag)
+        room.snapshot_cache["rest"] = cached
+        return cached
+
+    def trail_document(self, room: Room, member: Member, tolerance_m: float) -> bytes:
+        """
+        Encoded body for GET /rooms/{room_id}/members/{member_id}/trail.
+
+        Cached per (member, tolerance) until the trail gets a new point.
+        Only a handful of tolerances are kept per member - clients tend to
+        ask for the same one or two.
+        """
+        trail = member.trail
+        version = trail.version if trail else 0
+        key = f"trail:{member.member_id}"
+
+        cached = room.snapshot_cache.get(key)
+        if cached and cached[0] == version and tolerance_m in cached[1]:
+            self.hits["trail"] += 1
+            return cached[1][tolerance_m]
+
+        self.misses["trail"] += 1
+        points = trail.simplified(tolerance_m).tolist() if trail else []
+        body = json.dumps({
+            "member_id": member.member_id,
+            "tolerance_m": tolerance_m,
+            "total_points": len(trail) if trail else 0,
+            # [lat, lng, ts] oldest first
+            "points": [[lat, lng, ts] for ts, lat, lng in points]
+        }).encode("utf-8")
+
+        bodies = cached[1] if cached and cached[0] == version and len(cached[1]) < 4 else {}
+        bodies[tolerance_m] = body
+        room.snapshot_cache[key] = (version, bodies)
+        return body
+
+    def stats(self) -> dict:
+        """Hit/miss counters - how much serialization the cache is saving"""
+        stats = {}
+        for kind in self.hits:
+            total = self.hits[kind] + self.misses[kind]
+            stats[kind] = {
+                "hits": self.hits[kind],
+                "misses": self.misses[kind],
+                "hit_ratio": round(self.hits[kind] / total, 4) if total else None
+            }
+        return stats
+
+    def _current_document(self, room: Room) -> Optional[tuple]:
+        cached = room.snapshot_cache.get("rest")
+        if cached and cached[0] == (room.version, room.seq):
+            return cached
+        return None
+
+    def _destination(self, room: Room) -> dict:
+        return {
+            "name": room.destination_name,
+            "lat": room.destination_lat,
+            "lng": room.destination_lng
+        }
+
+    def member_view(self, member: Member) -> dict:
+        """Member fields shared by every payload (state, delta, REST)"""
+        return {
+            "member_id": member.member_id,
+            "idx": member.index,
+            "name": member.name,
+            "initials": member.name[0].upper() if member.name else "?",
+            "last_location": {
+                "lat": member.lat,
+                "lng": member.lng
+            } if member.lat is not None else None,
+            "status": member.status,
+            "geo": member.geo  # distance/bearing/speed/ETA to the destination, see services.geo
+        }
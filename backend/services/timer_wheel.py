@@ -0,0 +1,94 @@
+import asyncio
+import logging
+import math
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+from utils.time import now_ts
+
+logger = logging.getLogger(__name__)
+
+class TimerWheel:
+    """
+    Hashed timer wheel - lots of cheap one-shot timers, one asyncio task.
+
+    Time is cut into ticks of tick_seconds and the wheel has `slots`
+    buckets; a timer due at tick T sits in bucket T % slots. Each tick
+    the task pops the due timers out of one bucket, so schedule, cancel
+    and firing are all O(1) no matter how many timers are pending.
+    Timers further out than slots * tick_seconds just stay in their
+    bucket for extra turns.
+
+    One timer per key - scheduling an existing key moves it. Timers fire
+    on the first tick at or after their deadline (at most tick_seconds
+    late) by calling the handler with the timer's arg.
+    """
+
+    def __init__(self, tick_seconds: float = 0.25, slots: int = 512):
+        self.tick_seconds = tick_seconds
+        self._slots: List[Dict[Hashable, Tuple[int, Any]]] = [{} for _ in range(slots)]
+        self._where: Dict[Hashable, int] = {}  # key -> bucket index
+        self._handler: Optional[Callable[[Any], None]] = None
+        self._current = math.floor(now_ts() / tick_seconds)  # last tick processed
+        self._task: Optional[asyncio.Task] = None
+        self.fired = 0
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def set_handler(self, handler: Callable[[Any], None]):
+        self._handler = handler
+
+    def schedule(self, key: Hashable, deadline: float, arg: Any = None):
+        """(Re)arm the timer for key at deadline (epoch secs)"""
+        tick = max(math.ceil(deadline / self.tick_seconds), self._current + 1)
+        index = tick % len(self._slots)
+        old = self._where.get(key)
+        if old is not None and old != index:
+            del self._slots[old][key]
+        self._slots[index][key] = (tick, arg)
+        self._where[key] = index
+
+    def cancel(self, key: Hashable):
+        index = self._where.pop(key, None)
+        if index is not None:
+            del self._slots[index][key]
+
+    def start(self):
+        self._current = math.floor(now_ts() / self.tick_seconds)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def advance(self, now: float):
+        """Fire everything due up to now (the task calls this every tick)"""
+        target = math.floor(now / self.tick_seconds)
+        # After a long stall, one pass over the wheel covers every bucket
+        start = max(self._current + 1, target - len(self._slots) + 1)
+        for tick in range(start, target + 1):
+            bucket = self._slots[tick % len(self._slots)]
+            due = [key for key, (at, _) in bucket.items() if at <= target]
+            for key in due:
+                _, arg = bucket.pop(key)
+                del self._where[key]
+                self.fired += 1
+                try:
+                    self._handler(arg)
+                except Exception as e:
+                    logger.error("Timer handler failed: %s", e)
+        self._current = max(self._current, target)
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._where),
+            "fired": self.fired,
+            "tick_ms": self.tick_seconds * 1000
+        }
+
+    async def _run(self):
+        while True:
+            next_tick = (self._current + 1) * self.tick_seconds
+            await asyncio.sleep(max(next_tick - now_ts(), 0))
+            self.advance(now_ts())
@@ -0,0 +1,214 @@
+import json
+import struct
+import time
+import zlib
+from typing import Callable, List, Optional, Sequence, Tuple, Union
+
+# Opt-in binary format, negotiated via Sec-WebSocket-Protocol.
+# Clients that don't ask for it get the JSON protocol (the default).
+BINARY_PROTOCOL = "tether.bin.v1"
+# Same JSON as the default protocol, but frames over deflate_min_bytes arrive
+# as binary frames holding raw deflate (RFC 1951) - one compressor per message,
+# i.e. no context takeover, so every socket can be sent the same bytes.
+DEFLATE_PROTOCOL = "tether.deflate"
+SUBPROTOCOLS = (BINARY_PROTOCOL, DEFLATE_PROTOCOL)
+
+# Coordinates travel as int32 fixed point (1e-7 degrees, ~1 cm)
+COORD_SCALE = 10_000_000
+
+# Client -> server frames, first byte is the type
+CLIENT_LOCATION = 1  # <B i i>   type, lat, lng
+CLIENT_PING = 2      # <B>
+CLIENT_RESYNC = 3    # <B>
+
+# Server -> client frames
+SERVER_DELTA = 1
+# <B I I H H>  type, seq, prev, changed count, removed count
+# then per changed member <H B i i>  index, flags|status, lat, lng
+# then per removed member <H>        index
+# Keyframes stay JSON text frames (rare, and they carry names + the index table).
+
+STATUS_CODES = {"Offline": 0, "Stale": 1, "Live": 2}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+HAS_LOCATION = 0x80
+
+_LOCATION = struct.Struct("<Bii")
+_DELTA_HEADER = struct.Struct("<BIIHH")
+_DELTA_MEMBER = struct.Struct("<HBii")
+_INDEX = struct.Struct("<H")
+
+def negotiate(offered: Sequence[str]) -> Optional[str]:
+    """First subprotocol we speak out of what the client offered, None = plain JSON"""
+    for protocol in offered:
+        if protocol in SUBPROTOCOLS:
+            return protocol
+    return None
+
+class Deflater:
+    """
+    Compresses frames for tether.deflate sockets and keeps score.
+
+    Frames are compressed once and the bytes shared by every socket in
+    the room, so `saved_seconds` adds up the compression time each reuse
+    would have cost if every socket compressed for itself (which is what
+    transport-level permessage-deflate does).
+    """
+
+    def __init__(self, level: int = 6, min_bytes: int = 256):
+        self.level = level
+        self.min_bytes = min_bytes  # below this deflate costs more than it saves
+        self.compressed = 0
+        self.skipped = 0
+        self.reused = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.seconds = 0.0
+        self.saved_seconds = 0.0
+
+    def compress(self, text: str) -> Tuple[Union[str, bytes], float]:
+        """Raw deflate of text (or text itself if it's small) and the time it took"""
+        if len(text) < self.min_bytes:
+            self.skipped += 1
+            return text, 0.0
+
+        started = time.perf_counter()
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        data = compressor.compress(text.encode()) + compressor.flush()
+        elapsed = time.perf_counter() - started
+
+        self.compressed += 1
+        self.bytes_in += len(text)
+        self.bytes_out += len(data)
+        self.seconds += elapsed
+        return data, elapsed
+
+    def ratio(self) -> float:
+        """Compressed / original size of everything compressed so far"""
+        return self.bytes_out / self.bytes_in if self.bytes_in else 1.0
+
+    def stats(self) -> dict:
+        return {
+            "compressed": self.compressed,
+            "skipped": self.skipped,
+            "reused": self.reused,
+            "ratio": round(self.ratio(), 3),
+            "seconds": round(self.seconds, 6),
+            "saved_seconds": round(self.saved_seconds, 6)
+        }
+
+class Frame:
+    """
+    One broadcast frame, encoded lazily per wire format.
+
+    Built from already-captured data, so it doesn't matter when (or
+    whether) each encoding happens. Whichever writer task needs an
+    encoding first pays for it; every other socket reuses the result -
+    that includes the deflated JSON for tether.deflate sockets.
+    """
+
+    __slots__ = ("_encode_json", "_encode_binary", "_json", "_binary", "_deflated", "_deflate_seconds")
+
+    def __init__(self, encode_json: Callable[[], str], encode_binary: Optional[Callable[[], bytes]] = None):
+        self._encode_json = encode_json
+        self._encode_binary = encode_binary
+        self._json: Optional[str] = None
+        self._binary: Optional[bytes] = None
+        self._deflated: Optional[Union[str, bytes]] = None
+        self._deflate_seconds = 0.0
+
+    @classmethod
+    def text(cls, message: str) -> "Frame":
+        """Wrap an already-encoded JSON message (keyframes, control messages)"""
+        frame = cls(None)
+        frame._json = message
+        return frame
+
+    def deflated(self, deflater: Deflater) -> Union[str, bytes]:
+        """Payload for tether.deflate sockets - compressed by the first one to ask"""
+        if self._deflated is None:
+            self._deflated, self._deflate_seconds = deflater.compress(self.payload(None))
+        elif isinstance(self._deflated, bytes):
+            deflater.reused += 1
+            deflater.saved_seconds += self._deflate_seconds
+        return self._deflated
+
+    def payload(self, protocol: Optional[str]) -> Union[str, bytes]:
+        if protocol == BINARY_PROTOCOL and self._encode_binary:
+            if self._binary is None:
+                self._binary = self._encode_binary()
+            return self._binary
+
+        if self._json is None:
+            self._json = self._encode_json()
+        return self._json
+
+def delta_frame(room_id: str, seq: int, prev: int, members: List[dict], removed: List[dict],
+                binary: bool = True) -> Frame:
+    """
+    members/removed are member views (see RoomSnapshotCache.member_view).
+    binary=False keeps the frame JSON on every protocol - for frames that
+    introduce members the socket has no name/index for yet.
+    """
+    return Frame(
+        lambda: json.dumps({
+            "type": "delta",
+            "room_id": room_id,
+            "seq": seq,
+            "prev": prev,
+            "members": members,
+            "removed": [view["member_id"] for view in removed]
+        }),
+        (lambda: encode_delta(seq, prev, members, [view["idx"] for view in removed])) if binary else None
+    )
+
+def encode_delta(seq: int, prev: int, members: List[dict], removed: List[int]) -> bytes:
+    parts = [_DELTA_HEADER.pack(SERVER_DELTA, seq, prev, len(members), len(removed))]
+    for view in members:
+        location = view["last_location"]
+        flags = STATUS_CODES.get(view["status"], 0)
+        if location:
+            parts.append(_DELTA_MEMBER.pack(view["idx"], flags | HAS_LOCATION,
+                                            round(location["lat"] * COORD_SCALE),
+                                            round(location["lng"] * COORD_SCALE)))
+        else:
+            parts.append(_DELTA_MEMBER.pack(view["idx"], flags, 0, 0))
+    for index in removed:
+        parts.append(_INDEX.pack(index))
+    return b"".join(parts)
+
+def decode_delta(data: bytes) -> dict:
+    """Inverse of encode_delta (used by the benchmark and handy for debugging)"""
+    _, seq, prev, changed, removed = _DELTA_HEADER.unpack_from(data, 0)
+    offset = _DELTA_HEADER.size
+    members = []
+    for _ in range(changed):
+        index, flags, lat, lng = _DELTA_MEMBER.unpack_from(data, offset)
+        offset += _DELTA_MEMBER.size
+        members.append({
+            "idx": index,
+            "status": STATUS_NAMES[flags & ~HAS_LOCATION],
+            "last_location": {"lat": lat / COORD_SCALE, "lng": lng / COORD_SCALE} if flags & HAS_LOCATION else None
+        })
+    removed_indices = [_INDEX.unpack_from(data, offset + i * _INDEX.size)[0] for i in range(removed)]
+    return {"type": "delta", "seq": seq, "prev": prev, "members": members, "removed": removed_indices}
+
+def encode_location(lat: float, lng: float) -> bytes:
+    return _LOCATION.pack(CLIENT_LOCATION, round(lat * COORD_SCALE), round(lng * COORD_SCALE))
+
+def decode_client_frame(data: bytes) -> dict:
+    """
+    Binary client frame -> the same message dict the JSON path produces,
+    so the receive loop handles both the same way.
+    """
+    if not data:
+        raise ValueError("Empty frame")
+
+    kind = data[0]
+    if kind == CLIENT_LOCATION:
+        _, lat, lng = _LOCATION.unpack(data)
+        return {"type": "location", "lat": lat / COORD_SCALE, "lng": lng / COORD_SCALE}
+    if kind == CLIENT_PING:
+        return {"type": "ping"}
+    if kind == CLIENT_RESYNC:
+        return {"type": "resync"}
+    raise ValueError(f"Unknown frame type: {kind}")
@@ -1,50 +1,293 @@
-from typing import Dict, Set
+from typing import Deque, Dict, List, Optional, Set, Tuple, Union
+from collections import deque
 from fastapi import WebSocket
+import asyncio
 import json
+import time
+from services.metrics import FANOUT_BUCKETS, MetricsRegistry
+from services.wire import DEFLATE_PROTOCOL, Deflater, Frame
+
+# What to do when a connection's outbound queue is full
+OVERFLOW_POLICIES = ("drop_oldest", "latest_only", "disconnect")
+
+class Connection:
+    """
+    One socket plus its bounded outbound queue.
+
+    A dedicated writer task drains the queue, so a slow phone only
+    backs up its own queue instead of stalling the whole room. The
+    overflow policy only ever evicts room state (deltas, keyframes) -
+    control messages (session, advice, geofence, ended) always go out,
+    unless the queue is nothing but control messages: then new state is
+    dropped and one more control message disconnects the socket.
+    """
+
+    def __init__(self, room_id: str, member_id: str, websocket: WebSocket, manager: "ConnectionManager",
+                 protocol: Optional[str] = None):
+        self.room_id = room_id
+        self.member_id = member_id
+        self.websocket = websocket
+        self.manager = manager
+        self.protocol = protocol  # negotiated subprotocol, None = JSON
+        self.queue: Deque[Tuple[Union[str, Frame], float, bool]] = deque()  # (frame, enqueued at, control)
+        self.sent = 0
+        self.dropped = 0
+        self.overflows = 0  # overflows since the queue last drained
+        self.closing = False  # close the socket once the queue drains
+        # Event rooms only (services.interest): what this socket wants to see,
+        # what it was last sent per member, and its own frame sequence
+        self.interest: Optional[tuple] = None
+        self.seen: Dict[str, tuple] = {}
+        self.seq = 0
+        self._wakeup = asyncio.Event()
+        self.writer = asyncio.create_task(self._write_loop())
+
+    def finish(self):
+        """Deliver whatever is queued, then close the socket"""
+        self.closing = True
+        self._wakeup.set()
+
+    def enqueue(self, message: Union[str, Frame], control: bool = False) -> bool:
+        """Queue a frame. Returns False if this consumer should be disconnected."""
+        if len(self.queue) >= self.manager.max_queue_size:
+            self.overflows += 1
+            policy = self.manager.overflow_policy
+
+            if policy == "latest_only":
+                # No queued state is worth sending anymore - newest frame wins
+                kept = deque(entry for entry in self.queue if entry[2])
+                dropped = len(self.queue) - len(kept)
+                self.queue = kept
+            else:
+                dropped = 0
+                for i, entry in enumerate(self.queue):
+                    if not entry[2]:
+                        del self.queue[i]
+                        dropped = 1
+                        break
+            self.dropped += dropped
+            self.manager.frames_dropped.inc(dropped)
+            if policy == "disconnect" and self.overflows >= self.manager.disconnect_threshold:
+                return False
+
+            if len(self.queue) >= self.manager.max_queue_size:
+                # Nothing left to evict - all control messages. Still bounded:
+                # a state frame is dropped, a control message means they're not reading at all
+                if control:
+                    return False
+                self.dropped += 1
+                self.manager.frames_dropped.inc()
+                return True
+
+        self.queue.append((message, time.perf_counter(), control))
+        self._wakeup.set()
+        return True
+
+    async def _write_loop(self):
+        try:
+            while True:
+                while not self.queue:
+                    if self.closing:
+                        await self.websocket.close()
+                        return
+                    self.overflows = 0
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+
+                message, enqueued_at, _ = self.queue.popleft()
+                if self.protocol == DEFLATE_PROTOCOL:
+                    # Room frames come pre-compressed, one-off messages are compressed here
+                    deflater = self.manager.deflater
+                    message = message.deflated(deflater) if isinstance(message, Frame) else deflater.compress(message)[0]
+                elif isinstance(message, Frame):
+                    message = message.payload(self.protocol)
+                if isinstance(message, bytes):
+                    await self.websocket.send_bytes(message)
+                else:
+                    await self.websocket.send_text(message)
+                self.sent += 1
+                self.manager.send_delay.observe(time.perf_counter() - enqueued_at)
+                self.manager.bytes_sent.inc(len(message))
+        except Exception:
+            # Socket is gone - the receive loop will notice too
+            self.manager.send_failures.inc()
+            self.manager.disconnect(self.room_id, self.member_id, self.websocket)
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": len(self.queue),
+            "sent": self.sent,
+            "dropped": self.dropped
+        }
 
 class ConnectionManager:
     """
     Manages WebSocket connections per room.
-    
-    Structure is simple: {room_id: {member_id: websocket}}
+
+    Structure is simple: {room_id: {member_id: Connection}}
     When someone connects, add them. When they disconnect, remove them.
+
+    Sends never block the caller - frames go onto each connection's
+    bounded queue and per-connection writer tasks deliver them concurrently.
+    Fan-out size, queue-to-socket delay, drops and disconnects are recorded
+    into `metrics` (see services.metrics).
+
+    tether.deflate sockets get room frames compressed once by `deflater`
+    and share the bytes (see services.wire.Deflater).
     """
-    
-    def __init__(self):
-        self.active_connections: Dict[str, Dict[str, WebSocket]] = {}
-        # Structure: {room_id: {member_id: websocket}}
-    
-    async def connect(self, room_id: str, member_id: str, websocket: WebSocket):
+
+    def __init__(self, max_queue_size: int = 32, overflow_policy: str = "drop_oldest",
+                 disconnect_threshold: int = 100, metrics: Optional[MetricsRegistry] = None,
+                 deflater: Optional[Deflater] = None):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow_policy} (expected one of {OVERFLOW_POLICIES})")
+
+        self.active_connections: Dict[str, Dict[str, Connection]] = {}
+        # Structure: {room_id: {member_id: Connection}}
+        self.max_queue_size = max_queue_size
+        self.overflow_policy = overflow_policy
+        self.disconnect_threshold = disconnect_threshold
+        self.slow_consumer_disconnects = 0
+        self.deflater = deflater or Deflater()
+        self._closing: Set[asyncio.Task] = set()
+
+        metrics = metrics or MetricsRegistry()
+        self.fanout_size = metrics.histogram("tether_broadcast_fanout_size", "Sockets a room broadcast was queued for",
+                                             buckets=FANOUT_BUCKETS)
+        self.send_delay = metrics.histogram("tether_ws_send_delay_seconds",
+                                            "Time from queueing a frame to handing it to the socket")
+        self.bytes_sent = metrics.counter("tether_ws_sent_bytes_total", "Payload bytes written to sockets")
+        self.frames_dropped = metrics.counter("tether_ws_frames_dropped_total", "Frames dropped by the overflow policy")
+        self.send_failures = metrics.counter("tether_ws_send_failures_total", "Socket writes that failed")
+        self.disconnects = metrics.counter("tether_ws_disconnects_total", "Sockets removed, by reason", ["reason"])
+        metrics.gauge("tether_ws_connections", "Open sockets on this worker",
+                      fn=lambda: sum(len(connections) for connections in self.active_connections.values()))
+        deflater = self.deflater
+        metrics.counter("tether_ws_deflate_input_bytes_total", "JSON bytes compressed for tether.deflate sockets",
+                        fn=lambda: deflater.bytes_in)
+        metrics.counter("tether_ws_deflate_output_bytes_total", "Deflated bytes those compressed to",
+                        fn=lambda: deflater.bytes_out)
+        metrics.gauge("tether_ws_deflate_ratio", "Compressed / original size so far", fn=deflater.ratio)
+        metrics.counter("tether_ws_deflate_seconds_total", "Time spent compressing frames",
+                        fn=lambda: deflater.seconds)
+        metrics.counter("tether_ws_deflate_reused_total", "Sends that reused a frame compressed for another socket",
+                        fn=lambda: deflater.reused)
+        metrics.counter("tether_ws_deflate_saved_seconds_total",
+                        "Compression time those reuses would have cost compressing per socket",
+                        fn=lambda: deflater.saved_seconds)
+
+    async def connect(self, room_id: str, member_id: str, websocket: WebSocket, protocol: Optional[str] = None):
         """Register a new connection"""
         if room_id not in self.active_connections:
             self.active_connections[room_id] = {}
-        
-        self.active_connections[room_id][member_id] = websocket
-    
-    def disconnect(self, room_id: str, member_id: str):
-        """Remove a connection"""
+
+        # Reconnect from the same member replaces the old socket (1008 - the old
+        # client mustn't reconnect and kick the new one out in turn)
+        old = self.active_connections[room_id].get(member_id)
+        if old:
+            old.writer.cancel()
+            self.disconnects.labels("replaced").inc()
+            if old.websocket is not websocket:
+                self._close_soon(old.websocket, 1008, "Replaced by a newer connection")
+
+        self.active_connections[room_id][member_id] = Connection(room_id, member_id, websocket, self, protocol)
+
+    def disconnect(self, room_id: str, member_id: str, websocket: Optional[WebSocket] = None):
+        """
+        Remove a connection.
+
+        Pass the websocket to only remove it if it's still the current one
+        (a stale socket closing shouldn't kick out a fresh reconnect).
+        """
         if room_id in self.active_connections:
-            if member_id in self.active_connections[room_id]:
+            connection = self.active_connections[room_id].get(member_id)
+            if connection and (websocket is None or connection.websocket is websocket):
                 del self.active_connections[room_id][member_id]
-            
+                if connection.writer is not asyncio.current_task():
+                    connection.writer.cancel()
+
             # Clean up empty rooms
             if not self.active_connections[room_id]:
                 del self.active_connections[room_id]
-    
-    async def broadcast_to_room(self, room_id: str, message: str):
-        """Send message to all members in a room"""
+
+    def get_connection(self, room_id: str, member_id: str) -> Optional[Connection]:
+        return self.active_connections.get(room_id, {}).get(member_id)
+
+    def room_connections(self, room_id: str) -> List[Connection]:
+        return list(self.active_connections.get(room_id, {}).values())
+
+    def send(self, connection: Connection, message: Union[str, Frame], control: bool = False):
+        """
+        Queue a frame built for one specific connection (event room fan-out).
+        control=True for messages the overflow policy must never drop.
+        """
+        self._enqueue(connection, message, control)
+
+    async def send_to_member(self, room_id: str, member_id: str, message: str, control: bool = False):
+        """Send message to a single member's socket (keyframes on join/resync)"""
+        connection = self.active_connections.get(room_id, {}).get(member_id)
+        if connection:
+            self._enqueue(connection, message, control)
+
+    async def broadcast_to_room(self, room_id: str, message: Union[str, Frame], control: bool = False):
+        """Send message to all members in a room (str, or a Frame encoded per socket protocol)"""
         if room_id not in self.active_connections:
             return
-        
-        # Create list of disconnected members to remove
-        disconnected = []
-        
-        for member_id, websocket in self.active_connections[room_id].items():
-            try:
-                await websocket.send_text(message)
-            except Exception as e:
-                disconnected.append(member_id)
-        
-        # Remove disconnected members
-        for member_id in disconnected:
-            self.disconnect(room_id, member_id)
+
+        connections = list(self.active_connections[room_id].values())
+        if isinstance(message, str):
+            message = Frame.text(message)  # so tether.deflate sockets share one compressed copy
+        self.fanout_size.observe(len(connections))
+        for connection in connections:
+            self._enqueue(connection, message, control)
+
+    def close_room(self, room_id: str):
+        """Flush pending frames (e.g. "ended") to every socket in a room, then close them"""
+        connections = self.active_connections.pop(room_id, {})
+        for connection in connections.values():
+            connection.finish()
+            self._closing.add(connection.writer)
+            connection.writer.add_done_callback(self._closing.discard)
+
+    def connection_stats(self) -> dict:
+        """Per-connection queue depth / drop counts"""
+        return {
+            "overflow_policy": self.overflow_policy,
+            "max_queue_size": self.max_queue_size,
+            "slow_consumer_disconnects": self.slow_consumer_disconnects,
+            "rooms": {
+                room_id: {member_id: connection.stats() for member_id, connection in connections.items()}
+                for room_id, connections in self.active_connections.items()
+            }
+        }
+
+    async def stop(self):
+        """Cancel all writer tasks (used on shutdown)"""
+        tasks = [connection.writer for connections in self.active_connections.values()
+                 for connection in connections.values()]
+        tasks.extend(self._closing)
+        self.active_connections.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _enqueue(self, connection: Connection, message: Union[str, Frame], control: bool = False):
+        if connection.enqueue(message, control):
+            return
+
+        # Slow consumer over the threshold - drop it
+        self.slow_consumer_disconnects += 1
+        self.disconnects.labels("slow_consumer").inc()
+        self.disconnect(connection.room_id, connection.member_id, connection.websocket)
+        self._close_soon(connection.websocket, 1013, "Too slow, reconnect")
+
+    def _close_soon(self, websocket: WebSocket, code: int, reason: str):
+        task = asyncio.create_task(self._close(websocket, code, reason))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _close(self, websocket: WebSocket, code: int, reason: str):
+        try:
+            await websocket.close(code=code, reason=reason)
+        except Exception:
+            pass
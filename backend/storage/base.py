@@ -0,0 +1,94 @@
+from abc import ABC, abstractmethod
+from typing import Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from storage.memory import Room, Member
+
+class RoomStore(ABC):
+    """
+    What RoomService needs from storage.
+
+    Implementations hand out live Room/Member objects. Mutate them,
+    then call save_member/save_room so backends that keep data
+    somewhere else (Redis) can write the change through.
+
+    apply_member/apply_room/evict are for changes that happened on another
+    worker (delivered over the pub/sub bus) - they only touch this process's copy.
+    """
+
+    @abstractmethod
+    def create_room(self, room: "Room"):
+        ...
+
+    @abstractmethod
+    def get_room(self, room_id: str) -> Optional["Room"]:
+        ...
+
+    @abstractmethod
+    def remove_room(self, room_id: str):
+        ...
+
+    @abstractmethod
+    def add_member(self, room_id: str, member: "Member"):
+        ...
+
+    @abstractmethod
+    def remove_member(self, room_id: str, member_id: str):
+        ...
+
+    @abstractmethod
+    def get_member(self, room_id: str, member_id: str) -> Optional["Member"]:
+        ...
+
+    @abstractmethod
+    def save_member(self, room_id: str, member: "Member"):
+        """Persist changes made to a member object"""
+
+    @abstractmethod
+    def save_room(self, room: "Room"):
+        """Persist changes made to room fields (host etc.)"""
+
+    @abstractmethod
+    def local_room(self, room_id: str) -> Optional["Room"]:
+        """This process's copy of a room, without loading it from anywhere"""
+
+    @abstractmethod
+    def evict(self, room_id: str):
+        """Forget our copy of a room that was removed elsewhere"""
+
+    @abstractmethod
+    def room_count(self) -> int:
+        ...
+
+    def apply_member(self, room_id: str, member: "Member") -> Optional["Room"]:
+        """
+        Apply a member update from another worker. Returns the local room if we hold it.
+
+        Copies fields onto the existing object so references held by open sockets stay valid.
+        """
+        room = self.local_room(room_id)
+        if not room:
+            return None
+
+        existing = room.members.get(member.member_id)
+        if existing:
+            existing.name = member.name
+            if member.token:  # bus events leave the token out
+                existing.token = member.token
+            existing.lat = member.lat
+            existing.lng = member.lng
+            existing.last_updated = member.last_updated
+            existing.is_connected = member.is_connected
+        else:
+            room.members[member.member_id] = member
+            room.next_member_index = max(room.next_member_index, member.index + 1)
+        room.touch()
+        return room
+
+    def apply_room(self, room_id: str, host_member_id: Optional[str]) -> Optional["Room"]:
+        """Apply a room field change (host) from another worker"""
+        room = self.local_room(room_id)
+        if room:
+            room.host_member_id = host_member_id
+            room.touch()
+        return room
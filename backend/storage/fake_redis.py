@@ -0,0 +1,160 @@
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Union
+
+class FakeRedisServer:
+    """
+    Shared state behind one or more FakeRedis clients.
+
+    Point two clients (two "workers") at the same server to exercise
+    RedisStore + RedisBus locally without a real Redis.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hashes: Dict[str, Dict[str, str]] = {}
+        self.expires: Dict[str, float] = {}
+        self.subscribers: Dict[str, List["FakePubSub"]] = {}
+
+class FakeRedis:
+    """
+    In-process stand-in for redis.Redis(decode_responses=True).
+
+    Only covers the commands RedisStore/RedisBus use: hashes, hincrby, delete,
+    expireat, pub/sub and (non-transactional) pipelines. Expiry is lazy
+    (checked on access).
+    """
+
+    def __init__(self, server: Optional[FakeRedisServer] = None):
+        self.server = server or FakeRedisServer()
+
+    def hset(self, name: str, key: Optional[str] = None, value=None, mapping: Optional[dict] = None) -> int:
+        with self.server.lock:
+            h = self._hash(name, create=True)
+            items = dict(mapping or {})
+            if key is not None:
+                items[key] = value
+            added = 0
+            for k, v in items.items():
+                added += k not in h
+                h[k] = str(v)
+            return added
+
+    def hget(self, name: str, key: str) -> Optional[str]:
+        with self.server.lock:
+            return self._hash(name).get(key)
+
+    def hgetall(self, name: str) -> Dict[str, str]:
+        with self.server.lock:
+            return dict(self._hash(name))
+
+    def hincrby(self, name: str, key: str, amount: int = 1) -> int:
+        with self.server.lock:
+            h = self._hash(name, create=True)
+            value = int(h.get(key, 0)) + amount
+            h[key] = str(value)
+            return value
+
+    def hdel(self, name: str, *keys: str) -> int:
+        with self.server.lock:
+            h = self._hash(name)
+            removed = 0
+            for k in keys:
+                if k in h:
+                    del h[k]
+                    removed += 1
+            return removed
+
+    def delete(self, *names: str) -> int:
+        with self.server.lock:
+            removed = 0
+            for name in names:
+                if self.server.hashes.pop(name, None) is not None:
+                    removed += 1
+                self.server.expires.pop(name, None)
+            return removed
+
+    def exists(self, *names: str) -> int:
+        with self.server.lock:
+            return sum(1 for name in names if self._hash(name))
+
+    def expireat(self, name: str, when: Union[datetime, int, float]) -> bool:
+        with self.server.lock:
+            if name not in self.server.hashes:
+                return False
+            self.server.expires[name] = when.timestamp() if isinstance(when, datetime) else float(when)
+            return True
+
+    def publish(self, channel: str, message: str) -> int:
+        with self.server.lock:
+            subscribers = list(self.server.subscribers.get(channel, []))
+        for pubsub in subscribers:
+            pubsub.messages.put({"type": "message", "channel": channel, "data": message})
+        return len(subscribers)
+
+    def pubsub(self) -> "FakePubSub":
+        return FakePubSub(self.server)
+
+    def pipeline(self, transaction: bool = True) -> "FakePipeline":
+        return FakePipeline(self)
+
+    def _hash(self, name: str, create: bool = False) -> Dict[str, str]:
+        deadline = self.server.expires.get(name)
+        if deadline is not None and deadline <= time.time():
+            self.server.hashes.pop(name, None)
+            self.server.expires.pop(name, None)
+        if create:
+            return self.server.hashes.setdefault(name, {})
+        return self.server.hashes.get(name, {})
+
+class FakePipeline:
+    """Buffers commands until execute(), like redis-py's pipeline"""
+
+    def __init__(self, client: FakeRedis):
+        self.client = client
+        self.commands: List[tuple] = []
+
+    def __getattr__(self, command: str):
+        method = getattr(self.client, command)
+
+        def queue(*args, **kwargs):
+            self.commands.append((method, args, kwargs))
+            return self
+        return queue
+
+    def execute(self) -> list:
+        commands, self.commands = self.commands, []
+        return [method(*args, **kwargs) for method, args, kwargs in commands]
+
+class FakePubSub:
+    def __init__(self, server: FakeRedisServer):
+        self.server = server
+        self.messages: "queue.Queue[dict]" = queue.Queue()
+        self.channels: List[str] = []
+
+    def subscribe(self, *channels: str):
+        with self.server.lock:
+            for channel in channels:
+                self.server.subscribers.setdefault(channel, []).append(self)
+                self.channels.append(channel)
+        for channel in channels:
+            self.messages.put({"type": "subscribe", "channel": channel, "data": 1})
+
+    def get_message(self, ignore_subscribe_messages: bool = False, timeout: float = 0.0) -> Optional[dict]:
+        try:
+            message = self.messages.get(timeout=timeout) if timeout else self.messages.get_nowait()
+        except queue.Empty:
+            return None
+        if ignore_subscribe_messages and message["type"] != "message":
+            return None
+        return message
+
+    def close(self):
+        with self.server.lock:
+            for channel in self.channels:
+                subscribers = self.server.subscribers.get(channel, [])
+                if self in subscribers:
+                    subscribers.remove(self)
+        self.channels = []
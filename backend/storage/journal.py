@@ -0,0 +1,371 @@
+import gc
+import logging
+import marshal
+import os
+import struct
+import threading
+import time
+from collections import deque
+from itertools import islice, repeat
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+from storage.memory import Room, Member
+
+logger = logging.getLogger(__name__)
+
+# Record layouts (plain tuples so marshal can dump them fast):
+#   ("room", room_id, destination_name, lat, lng, created_ts, expires_ts, host_member_id, mode, waypoints)
+#   ("member", room_id, member_id, name, token, lat, lng, last_updated_ts, is_connected, index)
+#   ("host", room_id, host_member_id)
+#   ("member_removed", room_id, member_id)
+#   ("end", room_id)
+# Every record is a "set", so replaying a record twice is harmless.
+# journal.bin holds a length-prefixed list of records per writer batch
+# (older journals have one record per frame).
+#
+# The snapshot is column-wise rather than a tuple per room/member - one
+# list per field loads far faster and the objects can be built in bulk:
+#   {"format": 2,
+#    "rooms": [room_ids, names, lats, lngs, created, expires, hosts, modes, waypoints, member_counts, next_indexes],
+#    "members": [member_ids, names, tokens, lats, lngs, last_updated, indexes]}  (grouped by room, in room order)
+# Older snapshots are a list of (room record, [member records]).
+
+_LENGTH = struct.Struct("<I")
+SNAPSHOT_FORMAT = 2
+
+def _to_columns(entries: Iterable[Tuple[tuple, List[tuple]]]) -> dict:
+    """(room record, member records) pairs -> snapshot columns"""
+    rooms: List[list] = [[] for _ in range(11)]
+    members: List[list] = [[] for _ in range(7)]
+    for rec, member_recs in entries:
+        for column, value in zip(rooms, (
+                rec[1], rec[2], rec[3], rec[4], rec[5], rec[6], rec[7],
+                # Records written before event rooms / waypoints existed are shorter
+                rec[8] if len(rec) > 8 else "standard", rec[9] if len(rec) > 9 else (),
+                len(member_recs), max((m[9] for m in member_recs), default=-1) + 1)):
+            column.append(value)
+        for m in member_recs:
+            for column, value in zip(members, (m[2], m[3], m[4], m[5], m[6], m[7], m[9])):
+                column.append(value)
+    return {"format": SNAPSHOT_FORMAT, "rooms": rooms, "members": members}
+
+def _build_rooms(snapshot: dict) -> Dict[str, Room]:
+    """Snapshot columns -> live Room/Member objects, constructed in bulk"""
+    room_ids, names, lats, lngs, created, expires, hosts, modes, waypoints, counts, next_indexes = snapshot["rooms"]
+    member_ids, member_names, tokens, member_lats, member_lngs, updated, indexes = snapshot["members"]
+
+    # is_connected=False - nobody is connected right after a restart
+    members = iter(list(map(Member, member_ids, member_names, tokens, member_lats, member_lngs, updated,
+                            repeat(False, len(member_ids)), indexes)))
+    ids = iter(member_ids)
+    room_members = [dict(zip(islice(ids, count), islice(members, count))) for count in counts]
+    rooms = map(Room, room_ids, names, lats, lngs, created, expires, hosts, room_members, next_indexes, modes, waypoints)
+    return dict(zip(room_ids, rooms))
+
+def _shadow_from_columns(snapshot: dict) -> Dict[str, Tuple[tuple, Dict[str, tuple]]]:
+    """Snapshot columns -> the writer's shadow state (records again)"""
+    rooms = {}
+    members = zip(*snapshot["members"])
+    for room_id, name, lat, lng, created, expires, host, mode, waypoints, count, _ in zip(*snapshot["rooms"]):
+        rec = ("room", room_id, name, lat, lng, created, expires, host, mode, waypoints)
+        rooms[room_id] = (rec, {m[0]: ("member", room_id, m[0], m[1], m[2], m[3], m[4], m[5], False, m[6])
+                                for m in islice(members, count)})
+    return rooms
+
+class RoomJournal:
+    """
+    Write-ahead journal + snapshot so rooms survive restarts and deploys.
+
+    Files in `directory`:
+        snapshot.bin  - compact dump of every live room (marshal)
+        journal.bin   - records written since that snapshot, one length-prefixed
+                        marshal'd list per writer batch
+
+    log_*() only push a tuple onto a deque - the event loop never
+    touches the disk. A writer thread drains the deque in batches, fsyncs
+    every fsync_interval seconds, and keeps its own shadow copy of the
+    state built from the records. Compaction dumps that shadow copy into
+    a new snapshot and truncates the journal, again off the event loop.
+
+    Startup: recover() loads snapshot + replays the journal tail straight
+    into Room/Member objects. The shadow copy isn't needed until the first
+    compaction, so the writer thread builds it then (records written in the
+    meantime wait in a backlog) instead of startup paying for it twice.
+    """
+
+    def __init__(self, directory: str, fsync_interval: float = 1.0, batch_interval: float = 0.05,
+                 compact_records: int = 200_000, compact_interval: float = 600, compact_on_stop: bool = True):
+        self.directory = directory
+        self.fsync_interval = fsync_interval
+        self.batch_interval = batch_interval
+        self.compact_records = compact_records  # compact after this many records...
+        self.compact_interval = compact_interval  # ...or this many seconds, whichever first
+        self.compact_on_stop = compact_on_stop
+        self.snapshot_path = os.path.join(directory, "snapshot.bin")
+        self.journal_path = os.path.join(directory, "journal.bin")
+
+        self._pending: Deque[tuple] = deque()
+        # Shadow state, only touched by the writer thread after start():
+        # {room_id: (room record, {member_id: member record})}. None until
+        # built from _snapshot + _backlog (see _materialize)
+        self._rooms: Optional[Dict[str, Tuple[tuple, Dict[str, tuple]]]] = {}
+        self._snapshot: Optional[dict] = None
+        self._backlog: List[tuple] = []
+        self._records_since_snapshot = 0
+        self._file = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+        self.records_written = 0
+        self.fsyncs = 0
+        self.compactions = 0
+
+    def append(self, record: tuple):
+        """Queue a record (thread-safe, non-blocking)"""
+        self._pending.append(record)
+
+    def log_room(self, room: Room):
+        self.append(("room", room.room_id, room.destination_name, room.destination_lat, room.destination_lng,
+                     room.created_at, room.expires_at, room.host_member_id, room.mode, room.waypoints))
+
+    def log_member(self, room_id: str, member: Member):
+        self.append(("member", room_id, member.member_id, member.name, member.token, member.lat, member.lng,
+                     member.last_updated, member.is_connected, member.index))
+
+    def log_host(self, room_id: str, host_member_id: Optional[str]):
+        self.append(("host", room_id, host_member_id))
+
+    def log_member_removed(self, room_id: str, member_id: str):
+        self.append(("member_removed", room_id, member_id))
+
+    def log_end(self, room_id: str):
+        self.append(("end", room_id))
+
+    # ---------- recovery ----------
+
+    def recover(self) -> Dict[str, Room]:
+        """Rebuild rooms from snapshot + journal tail. Call before start()."""
+        os.makedirs(self.directory, exist_ok=True)
+
+        # Millions of small tuples/objects and none of them cyclic - the
+        # cyclic GC would just rescan them over and over while we load
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            rooms = self._recover()
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        # They live as long as their rooms - keep them out of later full collections too
+        gc.freeze()
+        return rooms
+
+    def _recover(self) -> Dict[str, Room]:
+        snapshot = None
+        if os.path.exists(self.snapshot_path):
+            # loads() on the whole buffer is much faster than load() on the file
+            with open(self.snapshot_path, "rb") as f:
+                snapshot = marshal.loads(f.read())
+            if isinstance(snapshot, list):
+                snapshot = _to_columns(snapshot)
+
+        tail: List[tuple] = []
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, "rb") as f:
+                tail = list(self._iter_records(f.read()))
+        self._records_since_snapshot = len(tail)
+
+        rooms = _build_rooms(snapshot) if snapshot else {}
+        self._replay(rooms, tail)
+
+        self._rooms = None
+        self._snapshot = snapshot
+        self._backlog = tail
+        return rooms
+
+    @staticmethod
+    def _replay(rooms: Dict[str, Room], records: List[tuple]):
+        """Apply journal records straight to live objects (recovery only)"""
+        for record in records:
+            kind = record[0]
+            if kind == "member":
+                room = rooms.get(record[1])
+                if room is not None:
+                    _, _, member_id, name, token, lat, lng, last_updated, _, index = record
+                    member = room.members.get(member_id)
+                    if member is None:
+                        room.members[member_id] = Member(member_id, name, token, lat, lng, last_updated, False, index)
+                    else:
+                        # Most of a journal tail is fixes for members we already have
+                        member.name, member.token, member.index = name, token, index
+                        member.lat, member.lng, member.last_updated = lat, lng, last_updated
+                    if index >= room.next_member_index:
+                        room.next_member_index = index + 1
+            elif kind == "room":
+                existing = rooms.get(record[1])
+                room = Room(record[1], record[2], record[3], record[4], record[5], record[6], record[7],
+                            mode=record[8] if len(record) > 8 else "standard",
+                            waypoints=record[9] if len(record) > 9 else ())
+                if existing is not None:
+                    room.members = existing.members
+                    room.next_member_index = existing.next_member_index
+                rooms[room.room_id] = room
+            elif kind == "host":
+                room = rooms.get(record[1])
+                if room is not None:
+                    room.host_member_id = record[2]
+            elif kind == "member_removed":
+                room = rooms.get(record[1])
+                if room is not None:
+                    room.members.pop(record[2], None)
+            elif kind == "end":
+                rooms.pop(record[1], None)
+
+    def _iter_records(self, data: bytes):
+        view = memoryview(data)
+        offset = 0
+        end = len(data)
+        while offset + _LENGTH.size <= end:
+            (length,) = _LENGTH.unpack_from(data, offset)
+            offset += _LENGTH.size
+            if offset + length > end:
+                logger.warning("Journal ends with a torn batch - ignoring it")
+                return
+            batch = marshal.loads(view[offset:offset + length])
+            if isinstance(batch, list):
+                yield from batch
+            else:
+                yield batch
+            offset += length
+
+    def _apply(self, record: tuple):
+        if self._rooms is None:
+            self._backlog.append(record)
+            return
+        kind = record[0]
+        room_id = record[1]
+        if kind == "room":
+            existing = self._rooms.get(room_id)
+            self._rooms[room_id] = (record, existing[1] if existing else {})
+        elif kind == "member":
+            entry = self._rooms.get(room_id)
+            if entry:
+                entry[1][record[2]] = record
+        elif kind == "host":
+            entry = self._rooms.get(room_id)
+            if entry:
+                rec = entry[0]
+                self._rooms[room_id] = (rec[:7] + (record[2],) + rec[8:], entry[1])
+        elif kind == "member_removed":
+            entry = self._rooms.get(room_id)
+            if entry:
+                entry[1].pop(record[2], None)
+        elif kind == "end":
+            self._rooms.pop(room_id, None)
+
+    # ---------- writer thread ----------
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._file = open(self.journal_path, "ab")
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="tether-journal", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Flush everything still queued, write a final snapshot and stop the writer"""
+        self._stopping.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "records_written": self.records_written,
+            "fsyncs": self.fsyncs,
+            "compactions": self.compactions,
+            # Shadow copy isn't built until the first compaction after a restart
+            "rooms": len(self._rooms) if self._rooms is not None else None
+        }
+
+    def _run(self):
+        last_fsync = last_compact = time.monotonic()
+        dirty = False
+        while True:
+            stopping = self._stopping.wait(self.batch_interval)
+            try:
+                dirty |= self._write_batch()
+
+                now = time.monotonic()
+                if dirty and (stopping or now - last_fsync >= self.fsync_interval):
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                    self.fsyncs += 1
+                    last_fsync = now
+                    dirty = False
+
+                if self._records_since_snapshot >= self.compact_records or \
+                        (self._records_since_snapshot and now - last_compact >= self.compact_interval):
+                    self._compact()
+                    last_compact = now
+            except Exception as e:
+                logger.error("Journal writer error: %s", e)
+
+            if stopping:
+                # Clean shutdown - leave a fresh snapshot so the next start is quick
+                try:
+                    if self.compact_on_stop and self._records_since_snapshot:
+                        self._compact()
+                except Exception as e:
+                    logger.error("Journal compaction on shutdown failed: %s", e)
+                self._file.close()
+                return
+
+    def _write_batch(self) -> bool:
+        if not self._pending:
+            return False
+
+        batch = []
+        while self._pending:
+            record = self._pending.popleft()
+            self._apply(record)
+            batch.append(record)
+
+        # One frame for the whole batch - recovery loads it in a single marshal call
+        data = marshal.dumps(batch)
+        self._file.write(_LENGTH.pack(len(data)) + data)
+        count = len(batch)
+        self.records_written += count
+        self._records_since_snapshot += count
+        return True
+
+    def _compact(self):
+        """Dump the shadow state as a new snapshot and start an empty journal"""
+        self._materialize()
+        now = time.time()
+        live = [(rec, list(members.values())) for rec, members in self._rooms.values() if rec[6] > now]
+        self._rooms = {rec[1]: (rec, {m[2]: m for m in members}) for rec, members in live}
+
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            marshal.dump(_to_columns(live), f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+        # Everything in the journal is now covered by the snapshot
+        if self._file:
+            self._file.close()
+        self._file = open(self.journal_path, "wb")
+        self._records_since_snapshot = 0
+        self.compactions += 1
+
+    def _materialize(self):
+        """Build the shadow state left unbuilt by recover() (writer thread)"""
+        if self._rooms is not None:
+            return
+        self._rooms = _shadow_from_columns(self._snapshot) if self._snapshot else {}
+        self._snapshot = None
+        backlog, self._backlog = self._backlog, []
+        for record in backlog:
+            self._apply(record)
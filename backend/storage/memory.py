@@ -1,60 +1,258 @@
-from typing import Dict, List, Optional
-from dataclasses import dataclass, field
-from datetime import datetime
+from typing import Callable, Deque, Dict, Optional, Set, TYPE_CHECKING
+from storage.base import RoomStore
+from utils.time import to_iso, from_iso
+
+if TYPE_CHECKING:
+    from storage.journal import RoomJournal
+    from storage.trail import Trail
+    from storage.spatial import SpatialGrid
+
+# "event" rooms hold hundreds/thousands of people and each socket only
+# gets the members near its viewport (services.interest)
+ROOM_MODES = ("standard", "event")
 
-@dataclass
 class Member:
-    member_id: str
-    name: str
-    token: str
-    last_location: Optional[tuple] = None  # (lat, lng)
-    last_updated: Optional[datetime] = None
-    is_connected: bool = False
-
-@dataclass
+    """
+    One person in a room.
+
+    Slotted (no per-instance __dict__) since there can be millions of these.
+    Timestamps are epoch floats and the position is two plain floats -
+    ISO strings / datetimes only appear when something gets serialized.
+    """
+
+    __slots__ = (
+        "member_id", "name", "token", "lat", "lng", "last_updated", "is_connected", "index",
+        # Derived per worker (services.geo, liveness timers...) - never stored or shipped between workers
+        "status", "geo", "motion", "report_interval_ms", "trail", "geofence"
+    )
+
+    # What __eq__ compares - the stored fields, not the derived per-worker ones
+    _STORED = ("member_id", "name", "token", "lat", "lng", "last_updated", "is_connected", "index")
+
+    def __init__(self, member_id: str, name: str, token: str, lat: Optional[float] = None,
+                 lng: Optional[float] = None, last_updated: Optional[float] = None,
+                 is_connected: bool = False, index: int = 0):
+        self.member_id = member_id
+        self.name = name
+        self.token = token
+        self.lat = lat  # None until the first fix
+        self.lng = lng
+        self.last_updated = last_updated  # epoch seconds
+        self.is_connected = is_connected
+        self.index = index  # small per-room number, stands in for member_id on the binary wire
+        # Live/Stale/Offline - kept current by RoomService.refresh_status and its timers
+        self.status = "Offline"
+        self.geo: Optional[dict] = None
+        self.motion: Optional[tuple] = None  # (lat, lng, ts, speed)
+        self.report_interval_ms: Optional[int] = None  # last advised to the client
+        # Recent fixes for the trail endpoint, allocated on the first fix (per worker, not journaled)
+        self.trail: Optional["Trail"] = None
+        self.geofence: Optional[tuple] = None  # (last_updated checked, frozenset of fence ids inside)
+
+    @property
+    def last_location(self) -> Optional[tuple]:
+        """(lat, lng) or None - allocates a tuple, hot paths read lat/lng directly"""
+        return (self.lat, self.lng) if self.lat is not None else None
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Member):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self._STORED)
+
+    def __repr__(self) -> str:
+        return f"Member({self.member_id!r}, {self.name!r}, lat={self.lat}, lng={self.lng}, last_updated={self.last_updated})"
+    
+    def to_dict(self, include_token: bool = True) -> dict:
+        """Plain dict for Redis / pub-sub (leave the token out of anything broadcast)"""
+        data = {
+            "member_id": self.member_id,
+            "name": self.name,
+            "last_location": [self.lat, self.lng] if self.lat is not None else None,
+            "last_updated": to_iso(self.last_updated) if self.last_updated is not None else None,
+            "is_connected": self.is_connected,
+            "index": self.index
+        }
+        if include_token:
+            data["token"] = self.token
+        return data
+    
+    @classmethod
+    def from_dict(cls, data: dict) -> "Member":
+        location = data.get("last_location")
+        return cls(
+            member_id=data["member_id"],
+            name=data["name"],
+            token=data.get("token", ""),
+            lat=location[0] if location else None,
+            lng=location[1] if location else None,
+            last_updated=from_iso(data["last_updated"]) if data.get("last_updated") else None,
+            is_connected=data.get("is_connected", False),
+            index=int(data.get("index", 0))
+        )
+
 class Room:
-    room_id: str
-    destination_name: str
-    destination_lat: float
-    destination_lng: float
-    created_at: datetime
-    expires_at: datetime
-    host_member_id: Optional[str] = None
-    members: Dict[str, Member] = field(default_factory=dict)
-
-class MemoryStore:
+    """
+    A room and its members. Slotted, epoch-float timestamps (see Member).
+    """
+
+    __slots__ = (
+        "room_id", "destination_name", "destination_lat", "destination_lng", "created_at", "expires_at",
+        "host_member_id", "members", "next_member_index", "version", "snapshot_cache",
+        "seq", "deltas_since_keyframe", "sent_members", "recent_frames", "mode", "spatial", "waypoints"
+    )
+
+    def __init__(self, room_id: str, destination_name: str, destination_lat: float, destination_lng: float,
+                 created_at: float, expires_at: float, host_member_id: Optional[str] = None,
+                 members: Optional[Dict[str, Member]] = None, next_member_index: int = 0, mode: str = "standard",
+                 waypoints: tuple = ()):
+        self.room_id = room_id
+        self.destination_name = destination_name
+        self.destination_lat = destination_lat
+        self.destination_lng = destination_lng
+        self.created_at = created_at  # epoch seconds
+        self.expires_at = expires_at
+        self.host_member_id = host_member_id
+        self.members: Dict[str, Member] = members if members is not None else {}
+        self.next_member_index = next_member_index
+        # Bumped on every member/room change - lets us reuse serialized snapshots
+        self.version = 0
+        self.snapshot_cache: Dict[str, tuple] = {}
+        # Delta stream state - seq of the last broadcast frame and what it carried per member
+        self.seq = 0
+        self.deltas_since_keyframe = 0
+        self.sent_members: Dict[str, tuple] = {}
+        # Last few broadcast frames as (seq, frame), for resuming sockets (services.delta)
+        self.recent_frames: Optional[Deque[tuple]] = None
+        self.mode = mode
+        # Event rooms: grid over member positions, built on first use (never stored)
+        self.spatial: Optional["SpatialGrid"] = None
+        # Extra geofences along the way - ((name, lat, lng, radius_m), ...)
+        self.waypoints = tuple(map(tuple, waypoints)) if waypoints else ()
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Room):
+            return NotImplemented
+        # Same fields the old dataclass compared - not the caches
+        return all(getattr(self, name) == getattr(other, name)
+                   for name in self.__slots__ if name not in ("snapshot_cache", "sent_members", "recent_frames", "spatial"))
+
+    def __repr__(self) -> str:
+        return f"Room({self.room_id!r}, {self.destination_name!r}, members={len(self.members)}, expires_at={self.expires_at})"
+    
+    def touch(self):
+        """Mark room as changed (invalidates cached snapshots)"""
+        self.version += 1
+    
+    def to_dict(self) -> dict:
+        """Room fields (without members) as a plain dict"""
+        return {
+            "room_id": self.room_id,
+            "destination_name": self.destination_name,
+            "destination_lat": self.destination_lat,
+            "destination_lng": self.destination_lng,
+            "created_at": to_iso(self.created_at),
+            "expires_at": to_iso(self.expires_at),
+            "host_member_id": self.host_member_id,
+            "mode": self.mode,
+            "waypoints": [list(waypoint) for waypoint in self.waypoints]
+        }
+    
+    @classmethod
+    def from_dict(cls, data: dict) -> "Room":
+        return cls(
+            room_id=data["room_id"],
+            destination_name=data["destination_name"],
+            destination_lat=float(data["destination_lat"]),
+            destination_lng=float(data["destination_lng"]),
+            created_at=from_iso(data["created_at"]),
+            expires_at=from_iso(data["expires_at"]),
+            host_member_id=data.get("host_member_id") or None,
+            mode=data.get("mode") or "standard",
+            waypoints=data.get("waypoints") or ()
+        )
+
+class MemoryStore(RoomStore):
     """
     In-memory storage for rooms and members.
     
-    Yeah, I know - everything disappears when the server restarts.
-    That's intentional for the MVP. Add Postgres or Redis later if needed.
+    Everything disappears when the server restarts, unless you give it a
+    RoomJournal - then every mutation is journaled (off the event loop)
+    and recover() rebuilds the rooms on startup.
+    Use RedisStore for multiple workers.
     """
     
-    def __init__(self):
+    def __init__(self, journal: Optional["RoomJournal"] = None,
+                 on_load: Optional[Callable[[Room], None]] = None):
         self.rooms: Dict[str, Room] = {}
+        self.journal = journal
+        self.on_load = on_load  # called the first time a recovered room is fetched
+        self._not_loaded: Set[str] = set()
+    
+    def recover(self) -> int:
+        """Load rooms from the journal (startup only). Returns room count."""
+        if self.journal:
+            self.rooms = self.journal.recover()
+            if self.on_load:
+                self._not_loaded = set(self.rooms)
+        return len(self.rooms)
     
     def create_room(self, room: Room):
         self.rooms[room.room_id] = room
+        if self.journal:
+            self.journal.log_room(room)
     
     def get_room(self, room_id: str) -> Optional[Room]:
-        return self.rooms.get(room_id)
+        room = self.rooms.get(room_id)
+        if room and room_id in self._not_loaded:
+            self._not_loaded.discard(room_id)
+            self.on_load(room)
+        return room
     
     def remove_room(self, room_id: str):
         if room_id in self.rooms:
             del self.rooms[room_id]
+            self._not_loaded.discard(room_id)
+            if self.journal:
+                self.journal.log_end(room_id)
     
     def add_member(self, room_id: str, member: Member):
         room = self.get_room(room_id)
         if room:
+            member.index = room.next_member_index
+            room.next_member_index += 1
             room.members[member.member_id] = member
+            room.touch()
+            if self.journal:
+                self.journal.log_member(room_id, member)
     
     def remove_member(self, room_id: str, member_id: str):
         room = self.get_room(room_id)
         if room and member_id in room.members:
             del room.members[member_id]
+            room.touch()
+            if self.journal:
+                self.journal.log_member_removed(room_id, member_id)
     
     def get_member(self, room_id: str, member_id: str) -> Optional[Member]:
         room = self.get_room(room_id)
         if room:
             return room.members.get(member_id)
         return None
+    
+    def save_member(self, room_id: str, member: Member):
+        # Objects are live in memory - only the journal needs to hear about it
+        if self.journal:
+            self.journal.log_member(room_id, member)
+    
+    def save_room(self, room: Room):
+        if self.journal:
+            self.journal.log_host(room.room_id, room.host_member_id)
+    
+    def local_room(self, room_id: str) -> Optional[Room]:
+        return self.rooms.get(room_id)
+    
+    def evict(self, room_id: str):
+        self.remove_room(room_id)
+    
+    def room_count(self) -> int:
+        return len(self.rooms)
@@ -0,0 +1,215 @@
+import json
+import logging
+import math
+import threading
+from collections import deque
+from typing import Callable, Deque, Dict, Optional
+from storage.base import RoomStore
+from storage.memory import Room, Member
+
+logger = logging.getLogger(__name__)
+
+class RedisWriter:
+    """
+    Sends Redis writes from a background thread, so the event loop never
+    waits on a round trip for a fix or a ping.
+
+    submit() just appends the command to a deque (same idea as the
+    journal); the thread sends whatever has piled up as one pipeline, in
+    submission order - so when RedisStore and RedisBus share a writer, a
+    member is saved before the event announcing it goes out. Before
+    start() and after stop() commands run inline.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.commands_sent = 0
+        self.batches = 0
+        self.errors = 0
+        self._pending: Deque[tuple] = deque()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, command: str, *args, **kwargs):
+        """Queue client.<command>(*args, **kwargs) - fire and forget"""
+        if self._thread is None:
+            getattr(self.client, command)(*args, **kwargs)
+            return
+        self._pending.append((command, args, kwargs))
+        self._wakeup.set()
+
+    def start(self):
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="tether-redis-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Send everything still queued, then stop the thread"""
+        if self._thread:
+            self._stopping.set()
+            self._wakeup.set()
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "commands_sent": self.commands_sent,
+            "batches": self.batches,
+            "errors": self.errors
+        }
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            try:
+                self._flush()
+            except Exception as e:
+                self.errors += 1
+                logger.error("Redis writer error: %s", e)
+            if self._stopping.is_set() and not self._pending:
+                return
+
+    def _flush(self):
+        if not self._pending:
+            return
+        pipe = self.client.pipeline(transaction=False)
+        count = 0
+        while self._pending:
+            command, args, kwargs = self._pending.popleft()
+            getattr(pipe, command)(*args, **kwargs)
+            count += 1
+        pipe.execute()
+        self.commands_sent += count
+        self.batches += 1
+
+class RedisStore(RoomStore):
+    """
+    Redis-backed storage so several uvicorn workers can share rooms.
+
+    Layout (all keys expire with the room):
+        tether:room:{room_id}          hash of room fields
+        tether:room:{room_id}:members  hash of member_id -> member JSON
+
+    Each worker keeps its own copy of rooms it has touched (self.rooms)
+    so sockets, snapshot caches and delta state work on local objects.
+    Writes go through to Redis; changes made by other workers arrive
+    via the pub/sub bus and are applied with apply_member/apply_room/evict.
+
+    Works with anything speaking the redis-py client API - a real
+    redis.Redis(decode_responses=True) in production, FakeRedis locally.
+    Member saves, removals and TTL refreshes go through a RedisWriter
+    (off the event loop once it's started). Reads, room creation and the
+    member index counter stay synchronous - they're rare, and the caller
+    needs the answer.
+    """
+
+    PREFIX = "tether:room:"
+
+    def __init__(self, client, on_load: Optional[Callable[[Room], None]] = None,
+                 writer: Optional[RedisWriter] = None):
+        self.client = client
+        self.on_load = on_load  # called when a room is pulled in from Redis
+        self.writer = writer or RedisWriter(client)
+        self.rooms: Dict[str, Room] = {}
+
+    def create_room(self, room: Room):
+        self.client.hset(self._room_key(room.room_id), mapping=self._room_fields(room))
+        self.client.expireat(self._room_key(room.room_id), math.ceil(room.expires_at))
+        self.rooms[room.room_id] = room
+
+    def get_room(self, room_id: str) -> Optional[Room]:
+        room = self.rooms.get(room_id)
+        if room:
+            return room
+
+        # Created (or last updated) on another worker - load it
+        fields = self.client.hgetall(self._room_key(room_id))
+        if not fields:
+            return None
+
+        fields["waypoints"] = json.loads(fields.get("waypoints") or "[]")
+        room = Room.from_dict(fields)
+        room.next_member_index = int(fields.get("next_member_index", 0))
+        for raw in self.client.hgetall(self._members_key(room_id)).values():
+            member = Member.from_dict(json.loads(raw))
+            room.members[member.member_id] = member
+
+        self.rooms[room_id] = room
+        if self.on_load:
+            self.on_load(room)
+        return room
+
+    def remove_room(self, room_id: str):
+        # Queued, so it lands after any member saves still waiting in the writer
+        self.writer.submit("delete", self._room_key(room_id), self._members_key(room_id))
+        self.rooms.pop(room_id, None)
+
+    def add_member(self, room_id: str, member: Member):
+        room = self.get_room(room_id)
+        if room:
+            # Counter lives in Redis so workers never hand out the same index
+            member.index = self.client.hincrby(self._room_key(room_id), "next_member_index", 1) - 1
+            room.next_member_index = member.index + 1
+            room.members[member.member_id] = member
+            room.touch()
+            self.save_member(room_id, member)
+            self.writer.submit("expireat", self._members_key(room_id), math.ceil(room.expires_at))
+
+    def remove_member(self, room_id: str, member_id: str):
+        room = self.get_room(room_id)
+        if room and member_id in room.members:
+            del room.members[member_id]
+            room.touch()
+            self.writer.submit("hdel", self._members_key(room_id), member_id)
+
+    def get_member(self, room_id: str, member_id: str) -> Optional[Member]:
+        room = self.get_room(room_id)
+        if room:
+            return room.members.get(member_id)
+        return None
+
+    def save_member(self, room_id: str, member: Member):
+        if room_id not in self.rooms:
+            return  # room was removed - don't resurrect its keys
+        self.writer.submit("hset", self._members_key(room_id), member.member_id, json.dumps(member.to_dict()))
+
+    def save_room(self, room: Room):
+        # Not the index counter - that one's only ever bumped atomically in add_member
+        self.writer.submit("hset", self._room_key(room.room_id), mapping=self._room_fields(room))
+
+    def apply_member(self, room_id: str, member: Member) -> Optional[Room]:
+        # Bus events carry no token - a member we haven't seen yet gets it from
+        # the saved copy (the origin's writer saved it before publishing)
+        room = self.local_room(room_id)
+        if room and not member.token and member.member_id not in room.members:
+            raw = self.client.hget(self._members_key(room_id), member.member_id)
+            if raw:
+                member.token = json.loads(raw)["token"]
+        return super().apply_member(room_id, member)
+
+    def local_room(self, room_id: str) -> Optional[Room]:
+        # Rooms we don't hold yet load fresh from Redis on demand
+        return self.rooms.get(room_id)
+
+    def evict(self, room_id: str):
+        self.rooms.pop(room_id, None)
+
+    def room_count(self) -> int:
+        return len(self.rooms)
+
+    def _room_key(self, room_id: str) -> str:
+        return f"{self.PREFIX}{room_id}"
+
+    def _members_key(self, room_id: str) -> str:
+        return f"{self.PREFIX}{room_id}:members"
+
+    def _room_fields(self, room: Room) -> dict:
+        fields = room.to_dict()
+        # Redis hashes can't hold None
+        fields["host_member_id"] = fields["host_member_id"] or ""
+        # ...or lists
+        fields["waypoints"] = json.dumps(fields["waypoints"])
+        return fields
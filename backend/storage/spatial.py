@@ -0,0 +1,125 @@
+import math
+from typing import Callable, Dict, List, Optional, Tuple
+
+METERS_PER_DEGREE = 111_320
+
+class SpatialGrid:
+    """
+    Uniform lat/lng grid over member positions, for event rooms.
+
+    Cells are cell_m tall (and cell_m wide at the equator, narrower
+    towards the poles - good enough for "who's near this viewport").
+    Each cell maps member_id -> (lat, lng), so a query only touches the
+    cells it overlaps and does an exact bounds check on what's in them.
+
+    Queries with a limit scan cells in rings outward from the center and
+    stop once they have enough members, so a crowded viewport costs about
+    `limit` members, not everyone in it. When a query would scan more
+    cells than are occupied (zoomed way out) it walks the occupied cells
+    instead.
+    """
+
+    def __init__(self, cell_m: float = 500):
+        self.cell_deg = cell_m / METERS_PER_DEGREE
+        self.cells: Dict[Tuple[int, int], Dict[str, Tuple[float, float]]] = {}
+        self.positions: Dict[str, Tuple[int, int]] = {}  # member_id -> cell
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg)
+
+    def move(self, member_id: str, lat: float, lng: float):
+        cell = self._cell(lat, lng)
+        old = self.positions.get(member_id)
+        if old is not None and old != cell:
+            self._discard(old, member_id)
+        self.cells.setdefault(cell, {})[member_id] = (lat, lng)
+        self.positions[member_id] = cell
+
+    def remove(self, member_id: str):
+        cell = self.positions.pop(member_id, None)
+        if cell is not None:
+            self._discard(cell, member_id)
+
+    def within(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float,
+               limit: Optional[int] = None) -> List[str]:
+        """Members inside the box - roughly the `limit` closest to its center if there are more"""
+        def inside(lat: float, lng: float) -> bool:
+            return min_lat <= lat <= max_lat and min_lng <= lng <= max_lng
+
+        return self._query(min_lat, min_lng, max_lat, max_lng,
+                           (min_lat + max_lat) / 2, (min_lng + max_lng) / 2, inside, limit)
+
+    def nearby(self, lat: float, lng: float, radius_m: float, limit: Optional[int] = None) -> List[str]:
+        """Members within radius_m of a point - roughly the `limit` closest if there are more"""
+        dlat = radius_m / METERS_PER_DEGREE
+        scale = max(math.cos(math.radians(lat)), 0.01)
+        dlng = dlat / scale
+        max_sq = dlat * dlat
+
+        # Equirectangular distance is plenty at viewport scale
+        def inside(m_lat: float, m_lng: float) -> bool:
+            d_lat, d_lng = m_lat - lat, (m_lng - lng) * scale
+            return d_lat * d_lat + d_lng * d_lng <= max_sq
+
+        return self._query(lat - dlat, lng - dlng, lat + dlat, lng + dlng, lat, lng, inside, limit)
+
+    def _query(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float,
+               center_lat: float, center_lng: float, inside: Callable[[float, float], bool],
+               limit: Optional[int]) -> List[str]:
+        x0, y0 = self._cell(min_lat, min_lng)
+        x1, y1 = self._cell(max_lat, max_lng)
+        found = []
+
+        def collect(members: Dict[str, Tuple[float, float]]):
+            for member_id, (lat, lng) in members.items():
+                if inside(lat, lng):
+                    found.append((member_id, lat, lng))
+
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(self.cells):
+            # Zoomed way out - cheaper to walk the occupied cells
+            for (x, y), members in self.cells.items():
+                if x0 <= x <= x1 and y0 <= y <= y1:
+                    collect(members)
+        else:
+            # Nearest cells first, in square rings around the center - once a
+            # ring brings us to `limit`, whatever lies further out would be cut anyway
+            cx, cy = self._cell(center_lat, center_lng)
+            for ring in range(max(cx - x0, x1 - cx, cy - y0, y1 - cy) + 1):
+                for cell in self._ring(cx, cy, ring):
+                    if x0 <= cell[0] <= x1 and y0 <= cell[1] <= y1:
+                        members = self.cells.get(cell)
+                        if members:
+                            collect(members)
+                if limit is not None and len(found) >= limit:
+                    break
+
+        if limit is not None and len(found) > limit:
+            found = self._closest(found, center_lat, center_lng, limit)
+        return [member_id for member_id, _, _ in found]
+
+    @staticmethod
+    def _ring(cx: int, cy: int, ring: int):
+        if ring == 0:
+            yield cx, cy
+            return
+        for x in range(cx - ring, cx + ring + 1):
+            yield x, cy - ring
+            yield x, cy + ring
+        for y in range(cy - ring + 1, cy + ring):
+            yield cx - ring, y
+            yield cx + ring, y
+
+    def _closest(self, found: list, lat: float, lng: float, limit: int) -> list:
+        scale = math.cos(math.radians(lat))
+        found.sort(key=lambda item: (item[1] - lat) ** 2 + ((item[2] - lng) * scale) ** 2)
+        return found[:limit]
+
+    def _discard(self, cell: Tuple[int, int], member_id: str):
+        members = self.cells.get(cell)
+        if members is not None:
+            members.pop(member_id, None)
+            if not members:
+                del self.cells[cell]
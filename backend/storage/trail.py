@@ -0,0 +1,104 @@
+import math
+import numpy as np
+
+EARTH_RADIUS_M = 6_371_000
+
+class Trail:
+    """
+    Fixed-capacity location history for one member.
+
+    A preallocated (capacity, 3) float64 array of (ts, lat, lng) used as
+    a ring buffer - 24 bytes per point, no per-point Python objects, and
+    memory per member never grows past capacity * 24 bytes. Once full the
+    oldest point gets overwritten.
+
+    `version` bumps on every append so callers can cache anything derived
+    from the trail (see RoomSnapshotCache.trail_document).
+    """
+
+    __slots__ = ("points", "start", "size", "version")
+
+    def __init__(self, capacity: int):
+        self.points = np.empty((capacity, 3), dtype=np.float64)
+        self.start = 0  # index of the oldest point
+        self.size = 0
+        self.version = 0
+
+    @property
+    def capacity(self) -> int:
+        return len(self.points)
+
+    def append(self, ts: float, lat: float, lng: float) -> bool:
+        """
+        Add a fix. Out-of-order fixes and repeats of the last position
+        (keep-alives, bus echoes) are skipped - returns whether it was stored.
+        """
+        if self.size:
+            last = self.points[(self.start + self.size - 1) % self.capacity]
+            if ts <= last[0] or (lat == last[1] and lng == last[2]):
+                return False
+
+        if self.size < self.capacity:
+            self.points[(self.start + self.size) % self.capacity] = (ts, lat, lng)
+            self.size += 1
+        else:
+            self.points[self.start] = (ts, lat, lng)
+            self.start = (self.start + 1) % self.capacity
+        self.version += 1
+        return True
+
+    def ordered(self) -> np.ndarray:
+        """Points oldest -> newest, shape (size, 3)"""
+        end = self.start + self.size
+        if end <= self.capacity:
+            return self.points[self.start:end]
+        return np.concatenate((self.points[self.start:], self.points[:end - self.capacity]))
+
+    def simplified(self, tolerance_m: float) -> np.ndarray:
+        """Douglas-Peucker simplified points (same (n, 3) layout)"""
+        points = self.ordered()
+        if tolerance_m <= 0 or len(points) < 3:
+            return points
+        return points[douglas_peucker(_to_meters(points[:, 1], points[:, 2]), tolerance_m)]
+
+    def __len__(self) -> int:
+        return self.size
+
+def _to_meters(lat: np.ndarray, lng: np.ndarray) -> np.ndarray:
+    """Equirectangular projection around the trail's first point - fine at trail scale"""
+    scale = math.radians(1) * EARTH_RADIUS_M
+    x = (lng - lng[0]) * scale * math.cos(math.radians(lat[0]))
+    y = (lat - lat[0]) * scale
+    return np.column_stack((x, y))
+
+def douglas_peucker(xy: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Boolean mask of the points to keep.
+
+    Iterative (no recursion limit on long trails); the distances for each
+    segment's interior points are computed in one array op.
+    """
+    keep = np.zeros(len(xy), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(xy) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+
+        origin = xy[first]
+        direction = xy[last] - origin
+        offsets = xy[first + 1:last] - origin
+        length = math.hypot(direction[0], direction[1])
+        if length == 0:
+            distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        else:
+            distances = np.abs(direction[0] * offsets[:, 1] - direction[1] * offsets[:, 0]) / length
+
+        farthest = int(distances.argmax())
+        if distances[farthest] > tolerance:
+            split = first + 1 + farthest
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return keep
@@ -0,0 +1,78 @@
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+FORMAT = "%(levelname)s:%(name)s:%(message)s"
+
+_listener: Optional[QueueListener] = None
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    Hands records to the listener thread as they are. The stock
+    QueueHandler formats in the calling thread (it's built to pickle
+    records across processes), and that's the work we want off the loop.
+    Log args should be immutable (str, numbers) - they're read later.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+def setup_logging(level: str = "INFO") -> QueueListener:
+    """
+    Root logger -> queue -> stderr on a background thread.
+
+    Logging calls on the event loop just append to a queue; formatting
+    and the write happen on the listener thread. Safe to call again
+    (module reloads) - the previous listener is flushed and replaced.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+    else:
+        atexit.register(_stop)
+
+    stream = logging.StreamHandler()
+    stream.setFormatter(logging.Formatter(FORMAT))
+    records: queue.SimpleQueue = queue.SimpleQueue()
+
+    root = logging.getLogger()
+    for handler in [h for h in root.handlers if isinstance(h, _DeferredQueueHandler)]:
+        root.removeHandler(handler)
+    root.addHandler(_DeferredQueueHandler(records))
+    root.setLevel(level.upper())
+
+    _listener = QueueListener(records, stream, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+def _stop():
+    """Flush whatever is still queued on exit"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+class LogSampler:
+    """
+    Lets `rate` (0..1) of the calls through, evenly spaced - for log lines
+    that fire per fix or per socket. rate=1 logs everything, 0.01 every
+    hundredth. Check it after the level, so skipped lines cost nothing:
+
+        if logger.isEnabledFor(logging.DEBUG) and sampler():
+            logger.debug("...", ...)
+    """
+
+    def __init__(self, rate: float = 1.0):
+        self.rate = rate
+        self.suppressed = 0
+        self._credit = 0.0
+
+    def __call__(self) -> bool:
+        self._credit += self.rate
+        if self._credit >= 1:
+            self._credit -= 1
+            return True
+        self.suppressed += 1
+        return False
@@ -1,5 +1,18 @@
+import time
 from datetime import datetime, timezone
 
 def get_utc_now() -> datetime:
     """Get current UTC timestamp with timezone info"""
     return datetime.now(timezone.utc)
+
+def now_ts() -> float:
+    """Current time as epoch seconds - what rooms and members store"""
+    return time.time()
+
+def to_iso(ts: float) -> str:
+    """Epoch seconds -> ISO 8601 UTC string (serialization only)"""
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat()
+
+def from_iso(value: str) -> float:
+    """ISO 8601 string -> epoch seconds"""
+    return datetime.fromisoformat(value).timestamp()
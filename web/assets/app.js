@@ -29,7 +29,9 @@ const CONFIG = {
         stale: 30                             // Yellow if 11-30 secs, red after that
     },
     DEMO_MODE_INTERVAL: 2000,                 // Update demo location every 2 sec
-    DEMO_RADIUS_KM: 5                         // Move in a 5km circle around destination
+    DEMO_RADIUS_KM: 5,                        // Move in a 5km circle around destination
+    BINARY_WIRE: false,                       // Ask for the compact binary protocol (tether.bin.v1)
+    DEFLATE_WIRE: true                        // Otherwise ask for deflated JSON frames (tether.deflate) if the browser can inflate
 };
 
 console.log('📍 Tether Config:', CONFIG.API_BASE);
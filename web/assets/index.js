@@ -7,6 +7,7 @@ async function createRoom() {
         const lat = parseFloat(document.getElementById('destLat').value);
         const lng = parseFloat(document.getElementById('destLng').value);
         const duration = parseInt(document.getElementById('duration').value) || 180;
+        const mode = document.getElementById('eventMode').checked ? 'event' : 'standard';
 
         console.log('Creating room:', { name, lat, lng, duration });
 
@@ -23,7 +24,8 @@ async function createRoom() {
                 destination_name: name,
                 destination_lat: lat,
                 destination_lng: lng,
-                duration_minutes: duration
+                duration_minutes: duration,
+                mode: mode
             })
         });
 
@@ -159,7 +161,28 @@ let map = null;
 let markers = {};
 let destMarker = null;
 let ws = null;
+let lastSeq = null;     // seq of the last state/delta frame applied
+let sessionEpoch = null; // server's seq numbering - "epoch.lastSeq" resumes after a reconnect
+let reconnectAttempts = 0;
+let reconnectTimer = null;
+let roomMembers = {};   // member_id -> latest member view (keyframe + deltas)
+let resyncRequested = false;
+let membersByIndex = {}; // idx -> member_id, binary deltas only carry the idx
+let viewportTimer = null;  // event rooms: debounce for viewport updates while panning
+
+// Binary wire format (see backend/services/wire.py)
+const BINARY_PROTOCOL = 'tether.bin.v1';
+const DEFLATE_PROTOCOL = 'tether.deflate';  // JSON, big frames arrive as raw deflate binary frames
+const COORD_SCALE = 1e7;
+const STATUS_NAMES = ['Offline', 'Stale', 'Live'];
 let locationInterval = null;
+let lowPowerTracking = false;  // after the server says we arrived - coarser, cached fixes
+let bufferedFixes = [];  // fixes taken while the socket was down, uploaded in one batch
+let reportIntervalMs = CONFIG.LOCATION_UPDATE_INTERVAL;  // server adjusts this with "advice" messages
+let lastReportAt = 0;
+let pendingReport = null;  // newest fix held back by the reporting interval
+let reportTimer = null;
+const MAX_BUFFERED_FIXES = 500;
 let demoMode = false;
 let demoSimulator = null;
 let routingControls = {};
@@ -312,6 +335,12 @@ function initializeMap() {
         }).addTo(map);
         destMarker.bindPopup(`<b>${destination.name}</b><br>📍 Destination`);
         
+        // Event rooms: follow the map with our viewport (debounced while panning)
+        map.on('moveend', () => {
+            clearTimeout(viewportTimer);
+            viewportTimer = setTimeout(sendViewport, 300);
+        });
+        
         // Smooth invalidateSize for proper rendering
         setTimeout(() => {
             map.invalidateSize();
@@ -328,39 +357,58 @@ function connectWebSocket(roomCode, memberId, token) {
     try {
         const wsProtocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
         const wsHost = CONFIG.API_BASE.replace('http://', '').replace('https://', '');
-        const wsUrl = `${wsProtocol}//${wsHost}/ws/rooms/${roomCode}?member_id=${memberId}&token=${token}`;
+        let wsUrl = `${wsProtocol}//${wsHost}/ws/rooms/${roomCode}?member_id=${memberId}&token=${token}`;
+        if (sessionEpoch !== null && lastSeq !== null) {
+            // Reconnecting - only ask for what we missed
+            wsUrl += `&resume=${sessionEpoch}.${lastSeq}`;
+        }
         
         console.log('🔌 Connecting WebSocket:', wsUrl);
         
-        ws = new WebSocket(wsUrl);
+        const protocols = [];
+        if (CONFIG.BINARY_WIRE) {
+            protocols.push(BINARY_PROTOCOL);
+        } else if (CONFIG.DEFLATE_WIRE && 'DecompressionStream' in window) {
+            protocols.push(DEFLATE_PROTOCOL);
+        }
+        const socket = new WebSocket(wsUrl, protocols);
+        ws = socket;
+        ws.binaryType = 'arraybuffer';
+        // Inflating is async - chain every message so they're still handled in arrival order
+        let inbound = Promise.resolve();
 
         ws.onopen = () => {
             console.log('✅ WebSocket connected');
+            flushBufferedFixes();
+            sendViewport();
         };
 
         ws.onmessage = (event) => {
-            try {
-                const data = JSON.parse(event.data);
-                
-                if (data.type === 'state') {
-                    // Update room state
-                    updateRoomState(data);
-                } else if (data.type === 'ended') {
-                    alert('Room has ended: ' + data.reason);
-                    leaveRoom();
-                }
-                
-            } catch (error) {
-                console.error('❌ Error processing WebSocket message:', error);
+            if (event.data instanceof ArrayBuffer && socket.protocol === DEFLATE_PROTOCOL) {
+                inbound = inbound
+                    .then(() => inflateText(event.data))
+                    .then((text) => { if (ws === socket) handleServerMessage(text); })
+                    .catch((error) => console.error('❌ Error inflating WebSocket message:', error));
+                return;
             }
+            // Keep order behind any frame still inflating
+            inbound = inbound.then(() => { if (ws === socket) handleServerMessage(event.data); });
         };
 
         ws.onerror = (error) => {
             console.error('❌ WebSocket error:', error);
         };
 
-        ws.onclose = () => {
-            console.log('⚠️ WebSocket closed');
+        ws.onclose = (event) => {
+            console.log('⚠️ WebSocket closed', event.code, event.reason);
+            // After whatever is still inflating (e.g. "ended")
+            inbound = inbound.then(() => {
+                // leaveRoom() / a newer socket took over - nothing to do
+                if (ws !== socket || !currentRoom) return;
+                ws = null;
+                if (event.code === 1008) return;  // bad token / room gone, retrying won't help
+                scheduleReconnect(roomCode, memberId, token, event);
+            });
         };
 
     } catch (error) {
@@ -368,10 +416,156 @@ function connectWebSocket(roomCode, memberId, token) {
     }
 }
 
+function scheduleReconnect(roomCode, memberId, token, closeEvent) {
+    // Server is pacing a reconnect storm - it says when to come back (already jittered)
+    const hint = closeEvent.code === 1013 && /retry_after_ms=(\d+)/.exec(closeEvent.reason || '');
+    // Otherwise exponential backoff with full jitter, 1s .. 30s
+    const delay = hint
+        ? parseInt(hint[1], 10)
+        : Math.random() * Math.min(30000, 1000 * 2 ** reconnectAttempts);
+    reconnectAttempts++;
+    console.log(`🔌 Reconnecting in ${Math.round(delay)} ms`);
+    clearTimeout(reconnectTimer);
+    reconnectTimer = setTimeout(() => {
+        reconnectTimer = null;
+        if (currentRoom && !ws) {
+            connectWebSocket(roomCode, memberId, token);
+        }
+    }, delay);
+}
+
+function handleServerMessage(message) {
+    try {
+        if (message instanceof ArrayBuffer) {
+            applyBinaryDelta(message);
+            return;
+        }
+        const data = JSON.parse(message);
+
+        if (data.type === 'session') {
+            // Admitted - if resumed, the frames we missed follow, otherwise a keyframe
+            sessionEpoch = data.epoch;
+            reconnectAttempts = 0;
+            if (data.resumed) {
+                console.log('🔁 Session resumed at seq', lastSeq);
+            }
+        } else if (data.type === 'state') {
+            // Keyframe - replace everything we know
+            applyKeyframe(data);
+        } else if (data.type === 'delta') {
+            applyDelta(data);
+        } else if (data.type === 'advice') {
+            // Server says how often it wants fixes (slower when parked / far away)
+            console.log('🔋 Reporting interval:', data.report_interval_ms, 'ms');
+            reportIntervalMs = data.report_interval_ms;
+        } else if (data.type === 'geofence') {
+            handleGeofenceEvent(data);
+        } else if (data.type === 'ended') {
+            alert('Room has ended: ' + data.reason);
+            leaveRoom();
+        }
+
+    } catch (error) {
+        console.error('❌ Error processing WebSocket message:', error);
+    }
+}
+
+async function inflateText(buffer) {
+    // tether.deflate: raw deflate, one stream per message (no context takeover)
+    const stream = new Blob([buffer]).stream().pipeThrough(new DecompressionStream('deflate-raw'));
+    return new Response(stream).text();
+}
+
+function applyKeyframe(state) {
+    lastSeq = state.seq;
+    resyncRequested = false;
+    if (state.members_count !== undefined) {
+        currentRoom.members_count = state.members_count;
+    }
+    // Event rooms only send who's near us - drop markers for anyone not in the keyframe
+    const keep = new Set(state.members.map(member => member.member_id));
+    for (const memberId of Object.keys(roomMembers)) {
+        if (!keep.has(memberId)) {
+            removeMemberMarker(memberId);
+        }
+    }
+    roomMembers = {};
+    membersByIndex = {};
+    for (const member of state.members) {
+        roomMembers[member.member_id] = member;
+        membersByIndex[member.idx] = member.member_id;
+    }
+    updateRoomState(state);
+}
+
+function applyDelta(delta) {
+    if (lastSeq === null || delta.prev !== lastSeq) {
+        // Missed a frame - ask the server for a fresh keyframe (once)
+        if (!resyncRequested && ws && ws.readyState === WebSocket.OPEN) {
+            console.warn('⚠️ Sequence gap, requesting resync', lastSeq, delta.prev);
+            ws.send(JSON.stringify({ type: 'resync' }));  // server takes JSON on either protocol
+            resyncRequested = true;
+        }
+        return;
+    }
+    
+    lastSeq = delta.seq;
+    for (const member of delta.members) {
+        roomMembers[member.member_id] = member;
+        membersByIndex[member.idx] = member.member_id;
+    }
+    for (const memberId of delta.removed) {
+        delete roomMembers[memberId];
+        removeMemberMarker(memberId);  // left the room, or (event rooms) left our view
+    }
+    updateRoomState({ members: Object.values(roomMembers) });
+}
+
+function applyBinaryDelta(buffer) {
+    // <B I I H H> header, then <H B i i> per changed member, then <H> per removed one
+    const view = new DataView(buffer);
+    const seq = view.getUint32(1, true);
+    const prev = view.getUint32(5, true);
+    const changedCount = view.getUint16(9, true);
+    const removedCount = view.getUint16(11, true);
+
+    const members = [];
+    let offset = 13;
+    for (let i = 0; i < changedCount; i++, offset += 11) {
+        const idx = view.getUint16(offset, true);
+        const flags = view.getUint8(offset + 2);
+        const memberId = membersByIndex[idx];
+        if (memberId === undefined) {
+            // Someone we haven't seen in a keyframe yet (no name) - treat it as a gap
+            return applyDelta({ seq, prev: null, members: [], removed: [] });
+        }
+        members.push({
+            ...roomMembers[memberId],
+            geo: null,  // not on the binary wire - the list falls back to a local estimate
+            status: STATUS_NAMES[flags & 0x7f],
+            last_location: flags & 0x80 ? {
+                lat: view.getInt32(offset + 3, true) / COORD_SCALE,
+                lng: view.getInt32(offset + 7, true) / COORD_SCALE
+            } : null
+        });
+    }
+
+    const removed = [];
+    for (let i = 0; i < removedCount; i++, offset += 2) {
+        const memberId = membersByIndex[view.getUint16(offset, true)];
+        if (memberId !== undefined) {
+            removed.push(memberId);
+        }
+    }
+
+    applyDelta({ seq, prev, members, removed });
+}
+
 function updateRoomState(state) {
     try {
-        // Update member count
-        document.getElementById('memberCount').textContent = `${state.members.length} ${state.members.length === 1 ? 'member' : 'members'}`;
+        // Update member count (event rooms only send nearby members - show the room total)
+        const count = currentRoom.mode === 'event' ? currentRoom.members_count : state.members.length;
+        document.getElementById('memberCount').textContent = `${count} ${count === 1 ? 'member' : 'members'}`;
         
         // Store updated member data
         if (!currentRoom.members) {
@@ -407,6 +601,37 @@ function updateRoomState(state) {
     }
 }
 
+function removeMemberMarker(memberId) {
+    if (memberId === currentMemberId) {
+        return;
+    }
+    if (markers[memberId] && map) {
+        map.removeLayer(markers[memberId]);
+    }
+    delete markers[memberId];
+    if (currentRoom && currentRoom.members) {
+        delete currentRoom.members[memberId];
+    }
+}
+
+function sendViewport() {
+    // Event rooms: tell the server which part of the map we're looking at,
+    // it only sends members inside it (plus the host)
+    if (!currentRoom || currentRoom.mode !== 'event' || !map || !ws || ws.readyState !== WebSocket.OPEN) {
+        return;
+    }
+    const bounds = map.getBounds();
+    ws.send(JSON.stringify({
+        type: 'viewport',
+        bounds: [
+            Math.max(bounds.getSouth(), -90),
+            Math.max(bounds.getWest(), -180),
+            Math.min(bounds.getNorth(), 90),
+            Math.min(bounds.getEast(), 180)
+        ]
+    }));
+}
+
 function updateMemberMarker(memberId, memberName, initials, location, status) {
     try {
         // Special handling for current user with heading indicator
@@ -509,7 +734,9 @@ function updateRidersList(members) {
         
         if (member.last_location) {
             locationText = `${member.last_location.lat.toFixed(4)}, ${member.last_location.lng.toFixed(4)}`;
-            const distance = haversineDistance(
+            // Server sends distance + ETA from the member's smoothed speed (member.geo);
+            // binary deltas don't carry it, so fall back to a local estimate
+            const distance = member.geo ? member.geo.distance_m / 1000 : haversineDistance(
                 member.last_location.lat,
                 member.last_location.lng,
                 currentRoom.destination.lat,
@@ -517,10 +744,11 @@ function updateRidersList(members) {
             );
             distanceText = `${distance.toFixed(2)} km`;
             
-            // Calculate ETA assuming average speed of 30 km/h
+            // No server ETA while they're barely moving - assume an average 30 km/h
             const avgSpeed = 30; // km/h
-            const etaHours = distance / avgSpeed;
-            const etaMinutes = Math.round(etaHours * 60);
+            const etaMinutes = member.geo && member.geo.eta_secs !== null
+                ? Math.round(member.geo.eta_secs / 60)
+                : Math.round(distance / avgSpeed * 60);
             
             if (etaMinutes < 1) {
                 etaText = '<div>⏱️ ETA: < 1 min</div>';
@@ -596,23 +824,7 @@ function startLocationTracking() {
             
             // Start watching position
             console.log('👀 Starting position watch...');
-            locationInterval = navigator.geolocation.watchPosition(
-                (pos) => {
-                    const lat = pos.coords.latitude;
-                    const lng = pos.coords.longitude;
-                    console.log('📍 Location update:', lat.toFixed(6), lng.toFixed(6));
-                    sendLocationUpdate(lat, lng, pos.coords.heading, pos.coords.speed);
-                },
-                (error) => {
-                    console.warn('⚠️ Geolocation error:', error.message, 'Code:', error.code);
-                    handleLocationError(error);
-                },
-                { 
-                    enableHighAccuracy: true, 
-                    maximumAge: 0, 
-                    timeout: 10000  // Increased timeout for mobile
-                }
-            );
+            watchLocation();
         },
         (error) => {
             console.warn('⚠️ Geolocation permission denied or error:', error.message, 'Code:', error.code);
@@ -626,6 +838,56 @@ function startLocationTracking() {
     );
 }
 
+function watchLocation() {
+    // Low power once we've arrived: no GPS lock needed, cached fixes are fine
+    locationInterval = navigator.geolocation.watchPosition(
+        (pos) => {
+            const lat = pos.coords.latitude;
+            const lng = pos.coords.longitude;
+            console.log('📍 Location update:', lat.toFixed(6), lng.toFixed(6));
+            sendLocationUpdate(lat, lng, pos.coords.heading, pos.coords.speed);
+        },
+        (error) => {
+            console.warn('⚠️ Geolocation error:', error.message, 'Code:', error.code);
+            handleLocationError(error);
+        },
+        {
+            enableHighAccuracy: !lowPowerTracking,
+            maximumAge: lowPowerTracking ? 30000 : 0,
+            timeout: 10000  // Increased timeout for mobile
+        }
+    );
+}
+
+function setLowPowerTracking(enabled) {
+    if (lowPowerTracking === enabled) return;
+    lowPowerTracking = enabled;
+    console.log(enabled ? '🔋 Arrived - low power location tracking' : '📍 High accuracy location tracking');
+    // Demo mode uses a timer, not a position watch
+    if (locationInterval !== null && !demoMode && navigator.geolocation) {
+        navigator.geolocation.clearWatch(locationInterval);
+        watchLocation();
+    }
+}
+
+function handleGeofenceEvent(data) {
+    // Server-side arrival detection for the destination and room waypoints
+    const member = roomMembers[data.member_id];
+    const who = data.member_id === currentMemberId ? 'You' : (member ? member.name : 'Someone');
+    console.log(`🚩 ${who} ${data.event} ${data.fence.name} (${data.fence.kind})`);
+
+    if (data.member_id !== currentMemberId || data.fence.kind !== 'destination') return;
+    if (data.event === 'arrived') {
+        setLowPowerTracking(true);
+        if (navigationActive) {
+            showArrivalNotification();
+            stopNavigation();
+        }
+    } else {
+        setLowPowerTracking(false);
+    }
+}
+
 function handleLocationError(error) {
     let message = '';
     
@@ -698,17 +960,60 @@ function startDemoMode() {
     }, 3000);
 }
 
-function sendLocationUpdate(lat, lng, heading, speed) {
-    if (!ws || ws.readyState !== WebSocket.OPEN) {
-        console.warn('⚠️ WebSocket not ready');
+async function flushBufferedFixes() {
+    if (!bufferedFixes.length || !currentRoom || !currentMemberId) {
         return;
     }
 
+    const fixes = bufferedFixes;
+    bufferedFixes = [];
     try {
-        // Store heading and speed
-        currentHeading = heading || 0;
-        currentSpeed = speed || 0;
-        
+        const response = await fetch(`${CONFIG.API_BASE}/rooms/${currentRoom.room_id}/locations`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ member_id: currentMemberId, token: currentToken, fixes }),
+            keepalive: true
+        });
+        if (!response.ok && response.status >= 500) {
+            bufferedFixes = fixes.concat(bufferedFixes).slice(-MAX_BUFFERED_FIXES);  // try again later
+        }
+    } catch (error) {
+        console.warn('⚠️ Could not upload buffered fixes:', error);
+        bufferedFixes = fixes.concat(bufferedFixes).slice(-MAX_BUFFERED_FIXES);
+    }
+}
+
+// Coming back to the foreground / regaining signal - upload what we collected
+document.addEventListener('visibilitychange', () => {
+    if (document.visibilityState === 'visible') {
+        flushBufferedFixes();
+    }
+});
+window.addEventListener('online', flushBufferedFixes);
+
+function transmitPendingReport() {
+    clearTimeout(reportTimer);
+    reportTimer = null;
+    // Nothing new from the GPS (parked)? Repeat the last fix as a keep-alive -
+    // the server dead-bands it, it just keeps us Live
+    const fix = pendingReport || lastKnownLocation;
+    if (!fix || !ws || ws.readyState !== WebSocket.OPEN) {
+        return;
+    }
+
+    const { lat, lng } = fix;
+    pendingReport = null;
+    lastReportAt = Date.now();
+    reportTimer = setTimeout(transmitPendingReport, reportIntervalMs);
+
+    if (ws.protocol === BINARY_PROTOCOL) {
+        // <B i i> type 1, lat, lng as 1e-7 degree fixed point
+        const frame = new DataView(new ArrayBuffer(9));
+        frame.setUint8(0, 1);
+        frame.setInt32(1, Math.round(lat * COORD_SCALE), true);
+        frame.setInt32(5, Math.round(lng * COORD_SCALE), true);
+        ws.send(frame.buffer);
+    } else {
         ws.send(JSON.stringify({
             type: 'location',
             lat: lat,
@@ -717,6 +1022,33 @@ function sendLocationUpdate(lat, lng, heading, speed) {
             speed: currentSpeed,
             ts: Date.now()
         }));
+    }
+}
+
+function sendLocationUpdate(lat, lng, heading, speed) {
+    if (!ws || ws.readyState !== WebSocket.OPEN) {
+        // Keep it for the batch upload instead of dropping it
+        bufferedFixes.push({ lat, lng, ts: Date.now() });
+        if (bufferedFixes.length > MAX_BUFFERED_FIXES) {
+            bufferedFixes.shift();
+        }
+        return;
+    }
+
+    try {
+        // Store heading and speed
+        currentHeading = heading || 0;
+        currentSpeed = speed || 0;
+        
+        // Only report as often as the server advised - hold the newest fix
+        // and send it when the interval is up
+        pendingReport = { lat, lng };
+        const wait = lastReportAt + reportIntervalMs - Date.now();
+        if (wait <= 0) {
+            transmitPendingReport();
+        } else if (!reportTimer) {
+            reportTimer = setTimeout(transmitPendingReport, wait);
+        }
         
         // Store location for navigation - CRITICAL!
         const isFirstLocation = !lastKnownLocation;
@@ -1458,6 +1790,7 @@ function leaveRoom() {
         clearInterval(locationInterval);
         locationInterval = null;
     }
+    lowPowerTracking = false;
     if (userLocationMarker && map) {
         map.removeLayer(userLocationMarker);
         userLocationMarker = null;
@@ -1474,8 +1807,25 @@ function leaveRoom() {
     
     // Reset state
     currentRoom = null;
+    lastSeq = null;
+    sessionEpoch = null;
+    reconnectAttempts = 0;
+    clearTimeout(reconnectTimer);
+    reconnectTimer = null;
+    roomMembers = {};
+    membersByIndex = {};
+    resyncRequested = false;
+    clearTimeout(viewportTimer);
+    viewportTimer = null;
     currentMemberId = null;
     currentToken = null;
+    bufferedFixes = [];
+    reportIntervalMs = CONFIG.LOCATION_UPDATE_INTERVAL;
+    pendingReport = null;
+    if (reportTimer) {
+        clearTimeout(reportTimer);
+        reportTimer = null;
+    }
     markers = {};
     routingControls = {};
     demoMode = false;